@@ -0,0 +1,300 @@
+# bench_blink.py
+"""
+Blink 입금 / 출금 부하 벤치마크 (로컬 대역 서버 사용, 실제 Blink 로는 요청하지 않음).
+- 입금: create_invoice → 결제 완료 확인까지 (DepositWatcher 처럼 주기마다 check_payments 일괄 조회)
+- 출금: pay_invoice
+- 작업별 p50 / p99 지연, HTTP 요청 수, 오류, 이벤트 루프 지연(lag)을 출력한다.
+
+대역 서버(blink_standin)는 별도 스레드의 이벤트 루프에서 띄우므로 측정 대상 루프와 섞이지 않는다.
+--url 을 주면 이미 떠 있는 대역 서버(python blink_standin.py ...)를 사용한다.
+속도 제한 / 타임아웃 / 폴링 주기 등은 config 의 환경 변수를 그대로 따른다. (--rate 로 덮어쓰기)
+
+    python bench_blink.py --deposits 2000 --withdrawals 1000 --latency 0.05 --settle-after 3
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from blink_standin import BlinkStandIn
+
+
+class _StandInThread(threading.Thread):
+    """대역 서버를 자체 이벤트 루프로 돌리는 스레드"""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(name="blink-standin", daemon=True)
+        self.standin = BlinkStandIn(**kwargs)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+
+    def run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self.standin.start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self.standin.stop())
+        self._loop.close()
+
+    def start_and_wait(self) -> str:
+        self.start()
+        self._ready.wait()
+        return self.standin.http_url
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self.join()
+
+
+class _Recorder:
+    """작업별 지연(ms)과 오류 수 집계"""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Counter[str] = Counter()
+        self.statuses: Counter[str] = Counter()
+
+    def add(self, name: str, started: float) -> None:
+        self.latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+    def error(self, name: str, e: BaseException) -> None:
+        self.errors[f"{name}: {type(e).__name__}"] += 1
+
+
+class _DepositPoller:
+    """DepositWatcher 와 같은 방식: 주기마다 대기중 인보이스를 batch_size 개씩 묶어서 조회"""
+
+    def __init__(self, recorder: _Recorder, interval: float, batch_size: int) -> None:
+        self._recorder = recorder
+        self._interval = interval
+        self._batch_size = max(1, batch_size)
+        self._waiting: Dict[str, "asyncio.Future[None]"] = {}
+
+    def wait_paid(self, payment_request: str) -> "asyncio.Future[None]":
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiting[payment_request] = future
+        return future
+
+    async def run(self) -> None:
+        from blink_client_rr import PAID_STATUSES, BlinkError, check_payments
+
+        while True:
+            await asyncio.sleep(self._interval)
+            for request, future in list(self._waiting.items()):
+                if future.done():
+                    del self._waiting[request]
+            requests = list(self._waiting)
+            batches = [
+                requests[i:i + self._batch_size]
+                for i in range(0, len(requests), self._batch_size)
+            ]
+
+            async def poll(batch: List[str]) -> None:
+                started = time.perf_counter()
+                try:
+                    statuses = await check_payments(batch)
+                except BlinkError as e:
+                    self._recorder.error("check_payments", e)
+                    return
+                self._recorder.add("check_payments", started)
+                for request, status in statuses.items():
+                    if status not in PAID_STATUSES:
+                        continue
+                    future = self._waiting.pop(request, None)
+                    if future is not None and not future.done():
+                        future.set_result(None)
+
+            await asyncio.gather(*(poll(batch) for batch in batches))
+
+
+async def _measure_loop_lag(samples: List[float], interval: float = 0.01) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval) * 1000)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """nearest-rank 백분위수"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    # 환경 변수(BLINK_API_URL 등)를 정한 뒤에 불러와야 대역 서버로 요청한다.
+    from blink_client_rr import BlinkError, blink_stats, close_session, create_invoice, pay_invoice
+    from config import DEPOSIT_POLL_BATCH_SIZE, DEPOSIT_POLL_INTERVAL, DEPOSIT_TIMEOUT_SECONDS
+
+    recorder = _Recorder()
+    poller = _DepositPoller(recorder, DEPOSIT_POLL_INTERVAL, DEPOSIT_POLL_BATCH_SIZE)
+    lag: List[float] = []
+
+    async def deposit(i: int) -> None:
+        await asyncio.sleep(random.uniform(0, args.ramp))
+        started = time.perf_counter()
+        try:
+            invoice = await create_invoice(args.amount, f"bench deposit {i}")
+        except BlinkError as e:
+            recorder.error("create_invoice", e)
+            return
+        recorder.add("create_invoice", started)
+        try:
+            await asyncio.wait_for(
+                poller.wait_paid(invoice["payment_request"]), DEPOSIT_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError as e:
+            recorder.error("deposit", e)
+            return
+        recorder.add("deposit (생성→결제 확인)", started)
+
+    async def withdraw(i: int) -> None:
+        await asyncio.sleep(random.uniform(0, args.ramp))
+        started = time.perf_counter()
+        try:
+            result = await pay_invoice(f"lnbcrt{args.amount}bench{i}{os.urandom(8).hex()}")
+        except BlinkError as e:
+            recorder.error("pay_invoice", e)
+            return
+        recorder.add("pay_invoice", started)
+        recorder.statuses[str(result.get("status"))] += 1
+
+    background = [
+        asyncio.create_task(poller.run()),
+        asyncio.create_task(_measure_loop_lag(lag)),
+    ]
+    flows = [deposit(i) for i in range(args.deposits)]
+    flows += [withdraw(i) for i in range(args.withdrawals)]
+    random.shuffle(flows)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*flows)
+    finally:
+        elapsed = time.perf_counter() - started
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await close_session()
+
+    return {
+        "elapsed": elapsed,
+        "recorder": recorder,
+        "lag": lag,
+        "blink": blink_stats(),
+    }
+
+
+def _report(
+    args: argparse.Namespace,
+    result: Dict[str, Any],
+    standin: Optional[BlinkStandIn],
+) -> None:
+    recorder: _Recorder = result["recorder"]
+    print(
+        f"[bench] 입금 {args.deposits}건 / 출금 {args.withdrawals}건, "
+        f"소요 {result['elapsed']:.2f}s"
+    )
+    print(f"{'작업':<28}{'건수':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for name, values in recorder.latencies.items():
+        print(
+            f"{name:<28}{len(values):>8}{_percentile(values, 0.5):>10.1f}"
+            f"{_percentile(values, 0.99):>10.1f}{max(values):>10.1f}"
+        )
+
+    if standin is not None:
+        counts = ", ".join(f"{op}={n}" for op, n in sorted(standin.requests.items()))
+        print(f"HTTP 요청 (대역 서버): {counts} / 주입한 503: {standin.injected_errors}")
+
+    scheduler = result["blink"]["scheduler"]
+    waits = ", ".join(
+        f"{name} {w['granted']}회 "
+        f"(평균 대기 {w['avg_wait_ms']:.1f}ms, 최대 {w['max_wait_ms']:.1f}ms)"
+        for name, w in scheduler["waits"].items()
+    )
+    print(f"클라이언트 요청: {waits}")
+    print(
+        f"서킷 브레이커: {result['blink']['breaker']} / 바로 거절 {result['blink']['rejected']}회"
+    )
+    if recorder.statuses:
+        print("출금 결과:", dict(recorder.statuses))
+    if recorder.errors:
+        print("오류:", dict(recorder.errors))
+
+    lag: List[float] = result["lag"]
+    print(
+        f"이벤트 루프 지연: p50 {_percentile(lag, 0.5):.1f}ms / "
+        f"p99 {_percentile(lag, 0.99):.1f}ms / max {max(lag, default=0.0):.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Blink 입금 / 출금 부하 벤치마크")
+    parser.add_argument("--deposits", type=int, default=1000)
+    parser.add_argument("--withdrawals", type=int, default=500)
+    parser.add_argument("--amount", type=int, default=1000, help="건당 금액(sats)")
+    parser.add_argument(
+        "--ramp", type=float, default=0.0, help="시작 시각을 이 시간(초)에 고르게 분산"
+    )
+    parser.add_argument(
+        "--url", default=None, help="이미 떠 있는 대역 서버 주소 (없으면 직접 띄움)"
+    )
+    parser.add_argument("--latency", type=float, default=0.02, help="대역 서버 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--settle-after", type=float, default=1.0, help="입금 자동 결제까지(초)")
+    parser.add_argument("--settle-jitter", type=float, default=1.0)
+    parser.add_argument(
+        "--rate", type=float, default=None, help="BLINK_RATE_PER_SEC 덮어쓰기 (0=무제한)"
+    )
+    parser.add_argument("--burst", type=int, default=None, help="BLINK_RATE_BURST 덮어쓰기")
+    parser.add_argument("--verbose", action="store_true", help="DEBUG 로그(요청별 로그 포함) 출력")
+    args = parser.parse_args()
+
+    server: Optional[_StandInThread] = None
+    url = args.url
+    if url is None:
+        server = _StandInThread(
+            latency=args.latency,
+            latency_jitter=args.jitter,
+            error_rate=args.error_rate,
+            settle_after=args.settle_after,
+            settle_jitter=args.settle_jitter,
+        )
+        url = server.start_and_wait()
+
+    # .env 의 실제 키가 대역 서버로 가지 않도록 항상 덮어쓴다.
+    os.environ["BLINK_API_URL"] = url
+    os.environ["BLINK_API_KEY"] = "standin"
+    os.environ["BLINK_WALLET_ID"] = "standin-wallet"
+    if args.rate is not None:
+        os.environ["BLINK_RATE_PER_SEC"] = str(args.rate)
+    if args.burst is not None:
+        os.environ["BLINK_RATE_BURST"] = str(args.burst)
+
+    # config 를 읽는 모듈은 환경 변수를 정한 뒤에 불러온다.
+    from log import setup_logging, shutdown_logging
+
+    # 기본은 오류만 출력 (주입한 503 등으로 경고가 쏟아지면 측정을 방해한다)
+    setup_logging("DEBUG" if args.verbose else "ERROR")
+    try:
+        result = asyncio.run(_run(args))
+    finally:
+        if server is not None:
+            server.stop()
+        shutdown_logging()
+    _report(args, result, server.standin if server is not None else None)
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
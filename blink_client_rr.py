@@ -1,18 +1,241 @@
+import asyncio
+import heapq
+import itertools
+import logging
 import os
-from typing import Any, Dict, Optional, List, TypedDict
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, List, Tuple, TypedDict
 
 import aiohttp
 from dotenv import load_dotenv
 
+from config import (
+    BLINK_BREAKER_COOLDOWN_SEC,
+    BLINK_BREAKER_THRESHOLD,
+    BLINK_HTTP_CONNECT_TIMEOUT,
+    BLINK_HTTP_KEEPALIVE_SEC,
+    BLINK_HTTP_POOL_SIZE,
+    BLINK_HTTP_TIMEOUT,
+    BLINK_RATE_BURST,
+    BLINK_RATE_PER_SEC,
+    BLINK_RETRY_ATTEMPTS,
+    BLINK_RETRY_BASE_SEC,
+    BLINK_RETRY_MAX_SEC,
+    BLINK_TIMEOUT_INVOICE_CREATE,
+    BLINK_TIMEOUT_PAYMENT_SEND,
+    BLINK_TIMEOUT_PAYMENT_STATUS,
+    BLINK_WS_RECONNECT_MAX_SEC,
+    BLINK_WS_URL,
+)
+from log import get_logger
+
 load_dotenv()
 
 BLINK_API_URL = os.getenv("BLINK_API_URL", "https://api.blink.sv/graphql")
 BLINK_API_KEY = os.getenv("BLINK_API_KEY")
 BLINK_WALLET_ID = os.getenv("BLINK_WALLET_ID")
 
+logger = get_logger("blink")
+
+# lnInvoicePaymentStatus 에서 결제 완료로 보는 상태값
+PAID_STATUSES = ("PAID", "SETTLED", "SUCCESS")
+
 
 class BlinkError(Exception):
-    pass
+    # 디스코드 사용자에게 그대로 보여줄 수 있는 안내 문구
+    user_message = "⚠️ Blink 처리 중 오류가 발생했습니다. 잠시 후 다시 시도해주세요."
+
+
+class BlinkPaymentRejected(BlinkError):
+    """lnInvoicePaymentSend 가 errors 로 거절 → 결제가 시도되지 않았음이 확실한 경우"""
+
+
+class BlinkTransientError(BlinkError):
+    """시간 초과 / 연결 오류 / HTTP 5xx·429: 잠시 뒤 다시 시도하면 될 수 있는 오류"""
+
+
+class BlinkNotSent(BlinkTransientError):
+    """요청을 Blink 로 보내기 전에 포기한 경우 (대기열 / 제한 시간 초과) → 결제가 시도되지 않았음이 확실"""
+
+
+class BlinkUnavailable(BlinkError):
+    """서킷 브레이커가 열려 있어 요청을 보내지 않고 바로 거절한 경우"""
+
+    user_message = (
+        "⚠️ 현재 결제 서버(Blink)가 응답하지 않아 잠시 이용할 수 없습니다.\n"
+        "잠시 후 다시 시도해주세요."
+    )
+
+
+# 요청 우선순위 (숫자가 작을수록 먼저 보낸다)
+PRIORITY_PAYMENT = 0
+PRIORITY_INVOICE = 1
+PRIORITY_POLL = 2
+PRIORITY_NAMES = {PRIORITY_PAYMENT: "payment", PRIORITY_INVOICE: "invoice", PRIORITY_POLL: "poll"}
+
+# 작업(operation)별 전체 제한 시간(초), 재시도 가능 여부, 우선순위
+# lnInvoicePaymentSend 는 결제가 됐는지 모르는 상태에서 다시 보내면 안 되므로 재시도하지 않는다.
+# (출금 워커가 잠시 뒤 같은 인보이스로 다시 보내고, 이미 결제된 건은 ALREADY_PAID 응답으로 확인한다)
+# (lnInvoiceCreate 는 다시 보내도 쓰이지 않는 인보이스가 하나 더 생길 뿐이라 재시도 허용)
+OPERATIONS: Dict[str, Tuple[float, bool, int]] = {
+    "lnInvoiceCreate": (BLINK_TIMEOUT_INVOICE_CREATE, True, PRIORITY_INVOICE),
+    "lnInvoicePaymentStatus": (BLINK_TIMEOUT_PAYMENT_STATUS, True, PRIORITY_POLL),
+    "lnInvoicePaymentSend": (BLINK_TIMEOUT_PAYMENT_SEND, False, PRIORITY_PAYMENT),
+    "walletBalance": (BLINK_TIMEOUT_PAYMENT_STATUS, True, PRIORITY_POLL),
+}
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 threshold 번 쌓이면 cooldown 동안 요청을 바로 거절한다. (OPEN)
+    cooldown 이 지나면 시험 요청 1개만 보내고(HALF_OPEN), 성공하면 다시 CLOSED.
+    Blink 가 응답은 한 경우(GraphQL 오류, 4xx)는 실패로 세지 않는다.
+    시험 요청이 결과 없이 끝나면(취소 등) release_probe() 로 자리를 돌려놓아야 한다.
+    """
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.failures = 0            # 연속 실패 횟수
+        self.opened_at: Optional[float] = None
+        self.rejected = 0            # OPEN 상태에서 바로 거절한 요청 수
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "CLOSED"
+        if asyncio.get_running_loop().time() - self.opened_at >= self.cooldown:
+            return "HALF_OPEN"
+        return "OPEN"
+
+    def before_request(self) -> bool:
+        """요청을 보내도 되면 시험 요청(HALF_OPEN)인지 여부를 반환, OPEN 이면 BlinkUnavailable"""
+        state = self.state
+        if state == "CLOSED":
+            return False
+        if state == "HALF_OPEN" and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        raise BlinkUnavailable("Blink 서킷 브레이커 OPEN: 요청을 보내지 않았습니다.")
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """요청을 보내지 못하고 포기한 경우: 시험 요청 자리를 돌려놓는다."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning("서킷 브레이커 OPEN", extra={"failures": self.failures})
+            self.opened_at = asyncio.get_running_loop().time()
+        self._probing = False
+
+
+class RequestScheduler:
+    """
+    토큰 버킷 + 우선순위 대기열.
+    - 초당 rate 개씩 토큰이 차고(최대 burst 개), 요청 1번에 토큰 1개를 쓴다.
+    - 토큰이 없으면 우선순위(→ 들어온 순서) 대로 줄을 세우고, 토큰이 차는 대로 앞에서부터 보낸다.
+      입금 폭주로 상태 조회가 쌓여도 결제 / 인보이스 생성이 먼저 나간다.
+    - 대기 중 취소된 요청(제한 시간 초과 등)은 토큰을 쓰지 않고 건너뛴다.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated: Optional[float] = None
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional["asyncio.Task[None]"] = None
+        # 우선순위별 (통과 수, 대기 합계 초, 최대 대기 초)
+        self._granted: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self._wait_total: Dict[int, float] = {p: 0.0 for p in PRIORITY_NAMES}
+        self._wait_max: Dict[int, float] = {p: 0.0 for p in PRIORITY_NAMES}
+
+    async def acquire(self, priority: int) -> None:
+        """요청 1번을 보낼 차례가 될 때까지 기다린다."""
+        if self.rate <= 0:
+            self._record(priority, 0.0)
+            return
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            self._record(priority, 0.0)
+            return
+
+        future: "asyncio.Future[None]" = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch(), name="blink-scheduler")
+        started = loop.time()
+        await future
+        self._record(priority, loop.time() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        waits = {}
+        for priority, name in PRIORITY_NAMES.items():
+            granted = self._granted[priority]
+            waits[name] = {
+                "granted": granted,
+                "avg_wait_ms": self._wait_total[priority] / granted * 1000 if granted else 0.0,
+                "max_wait_ms": self._wait_max[priority] * 1000,
+            }
+        return {"queued": queued, "waits": waits, "tokens": self._tokens}
+
+    # ---------------- 내부 ----------------
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _record(self, priority: int, waited: float) -> None:
+        if priority not in self._granted:
+            return
+        self._granted[priority] += 1
+        self._wait_total[priority] += waited
+        if waited > self._wait_max[priority]:
+            self._wait_max[priority] = waited
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            self._refill(loop.time())
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # 기다리다 취소된 요청
+            self._tokens -= 1
+            future.set_result(None)
+
+
+_breaker = CircuitBreaker(BLINK_BREAKER_THRESHOLD, BLINK_BREAKER_COOLDOWN_SEC)
+_scheduler = RequestScheduler(BLINK_RATE_PER_SEC, BLINK_RATE_BURST)
+
+
+def blink_stats() -> Dict[str, Any]:
+    return {
+        "breaker": _breaker.state,
+        "failures": _breaker.failures,
+        "rejected": _breaker.rejected,
+        "scheduler": _scheduler.stats(),
+    }
 
 
 class GraphQLError(TypedDict, total=False):
@@ -21,19 +244,66 @@ class GraphQLError(TypedDict, total=False):
     locations: List[Dict[str, int]]
 
 
+# ─────────────────────────────────────────────
+# 공유 HTTP 세션 (keep-alive 커넥션 풀)
+# ─────────────────────────────────────────────
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """
+    모듈 전역 ClientSession 을 반환 (처음 호출될 때 생성).
+    커넥션을 재사용하므로 매 요청마다 TCP / TLS 핸드셰이크를 하지 않는다.
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        return _session
+    async with _session_lock:
+        if _session is None or _session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=BLINK_HTTP_POOL_SIZE,
+                limit_per_host=BLINK_HTTP_POOL_SIZE,
+                keepalive_timeout=BLINK_HTTP_KEEPALIVE_SEC,
+                ttl_dns_cache=300,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=BLINK_HTTP_TIMEOUT,
+                sock_connect=BLINK_HTTP_CONNECT_TIMEOUT,
+            )
+            _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+
+async def close_session() -> None:
+    """봇 종료 시 호출: 공유 세션과 커넥션 풀 정리"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
 async def _blink_request(
     query: str,
     variables: Optional[Dict[str, Any]] = None,
+    operation: str = "",
 ) -> Dict[str, Any]:
     """
     Blink GraphQL API 호출 공통 함수.
+    - operation 별 제한 시간(재시도 포함)과 재시도 여부는 OPERATIONS 를 따른다.
+    - 재시도는 일시적인 오류(BlinkTransientError)에만, 지터를 섞은 지수 백오프로 한다.
+    - 서킷 브레이커가 열려 있으면 보내지 않고 BlinkUnavailable 을 던진다.
+    - 매 시도마다 속도 제한(_scheduler)을 거친다. 토큰을 기다린 시간도 제한 시간에 포함된다.
     """
     if not BLINK_API_KEY or not BLINK_WALLET_ID:
-        print(
-            "[Blink] 환경 변수 누락:",
-            "BLINK_API_URL=", BLINK_API_URL,
-            "BLINK_API_KEY 설정됨=", bool(BLINK_API_KEY),
-            "BLINK_WALLET_ID 설정됨=", bool(BLINK_WALLET_ID),
+        logger.error(
+            "환경 변수 누락",
+            extra={
+                "api_url": BLINK_API_URL,
+                "api_key_set": bool(BLINK_API_KEY),
+                "wallet_id_set": bool(BLINK_WALLET_ID),
+            },
         )
         raise BlinkError("BLINK_API_KEY 또는 BLINK_WALLET_ID 가 설정되지 않았습니다.")
 
@@ -46,11 +316,84 @@ async def _blink_request(
     if variables is not None:
         payload["variables"] = variables
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(BLINK_API_URL, json=payload, headers=headers) as resp:
+    timeout, retryable, priority = OPERATIONS.get(
+        operation, (BLINK_HTTP_TIMEOUT, False, PRIORITY_INVOICE)
+    )
+    attempts = BLINK_RETRY_ATTEMPTS if retryable else 1
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    attempt = 0
+    while True:
+        attempt += 1
+        probe = _breaker.before_request()
+        recorded = False
+        try:
+            try:
+                await asyncio.wait_for(_scheduler.acquire(priority), deadline - loop.time())
+            except asyncio.TimeoutError:
+                raise BlinkNotSent("Blink 요청 대기열에서 제한 시간 초과") from None
+            try:
+                data = await _post(payload, headers, deadline - loop.time(), operation, attempt)
+            except BlinkTransientError:
+                _breaker.record_failure()
+                recorded = True
+                backoff = random.uniform(
+                    0, min(BLINK_RETRY_MAX_SEC, BLINK_RETRY_BASE_SEC * 2 ** (attempt - 1))
+                )
+                if attempt >= attempts or loop.time() + backoff >= deadline:
+                    raise
+                await asyncio.sleep(backoff)
+                continue
+            except BlinkError:
+                # Blink 가 응답은 했음 (4xx / 잘못된 응답) → 장애로 보지 않는다.
+                _breaker.record_success()
+                recorded = True
+                raise
+            _breaker.record_success()
+            recorded = True
+            break
+        finally:
+            # 대기열 시간 초과 / 취소 / 예상 못한 예외로 결과를 남기지 못한 시험 요청은
+            # 자리를 돌려놓는다. (그대로 두면 HALF_OPEN 에서 영영 요청을 보내지 못한다)
+            if probe and not recorded:
+                _breaker.release_probe()
+
+    errors: Optional[List[GraphQLError]] = data.get("errors")  # type: ignore[assignment]
+    if errors:
+        raise BlinkError(f"Blink GraphQL errors: {errors}")
+
+    result: Dict[str, Any] = data.get("data", {})
+    return result
+
+
+async def _post(
+    payload: Dict[str, Any],
+    headers: Dict[str, str],
+    timeout: float,
+    operation: str = "",
+    attempt: int = 1,
+) -> Dict[str, Any]:
+    """HTTP 요청 1회. 일시적인 오류는 BlinkTransientError 로 구분해서 던진다."""
+    if timeout <= 0:
+        raise BlinkNotSent("Blink 요청 제한 시간 초과")
+
+    session = await _get_session()
+    started = time.perf_counter()
+    status: Any = "error"
+    text = ""
+    try:
+        async with session.post(
+            BLINK_API_URL,
+            json=payload,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout, sock_connect=BLINK_HTTP_CONNECT_TIMEOUT),
+        ) as resp:
+            status = resp.status
             text = await resp.text()
-            print(f"[Blink] 응답 <- status={resp.status}, body={text}")
 
+            if resp.status >= 500 or resp.status == 429:
+                raise BlinkTransientError(f"Blink HTTP error {resp.status}: {text}")
             if resp.status >= 400:
                 raise BlinkError(f"Blink HTTP error {resp.status}: {text}")
 
@@ -58,28 +401,53 @@ async def _blink_request(
                 data: Dict[str, Any] = await resp.json()
             except Exception as e:
                 raise BlinkError(f"Blink JSON decode error: {e}, body={text}")
-
-    errors: Optional[List[GraphQLError]] = data.get("errors")  # type: ignore[assignment]
-    if errors:
-        raise BlinkError(f"Blink GraphQL errors: {errors}")
-
-    result: Dict[str, Any] = data.get("data", {})
-    return result
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise BlinkTransientError(f"Blink 요청 시간 초과 ({timeout:.1f}s)")
+    except aiohttp.ClientError as e:
+        status = "connection_error"
+        raise BlinkTransientError(f"Blink 연결 오류: {e}")
+    finally:
+        _log_request(operation, status, started, attempt, text)
+    return data
+
+
+def _log_request(operation: str, status: Any, started: float, attempt: int, body: str) -> None:
+    """요청 1회 결과 로그. 정상 응답은 DEBUG, 그 외는 WARNING (응답 본문은 앞부분만)"""
+    level = logging.DEBUG if status == 200 else logging.WARNING
+    if not logger.isEnabledFor(level):
+        return
+    fields: Dict[str, Any] = {
+        "operation": operation,
+        "status": status,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if attempt > 1:
+        fields["attempt"] = attempt
+    if level != logging.DEBUG and body:
+        fields["body"] = body[:200]
+    if operation == "lnInvoicePaymentStatus":
+        # 결제 상태 조회는 몇 초마다 반복되므로 같은 결과는 샘플링해서 남긴다.
+        fields["sample_key"] = f"blink:{operation}:{status}"
+    logger.log(level, "blink request", extra=fields)
 
 
 # ─────────────────────────────────────────────
 # 인보이스 생성
 # ─────────────────────────────────────────────
 
-async def create_invoice(amount_sats: int, memo: str) -> Dict[str, Any]:
+async def create_invoice(
+    amount_sats: int,
+    memo: str,
+    expires_in_minutes: Optional[int] = None,
+) -> Dict[str, Any]:
     """
     Blink lnInvoiceCreate: 새 인보이스 생성.
+    expires_in_minutes 를 주면 인보이스 만료 시간(분)을 지정한다. (없으면 Blink 기본값)
     """
     if amount_sats <= 0:
         raise BlinkError("amount_sats must be > 0")
 
-    print(f"[Blink] 인보이스 생성 요청: amount={amount_sats}, memo={memo}")
-
     query = """
     mutation lnInvoiceCreate($input: LnInvoiceCreateInput!) {
       lnInvoiceCreate(input: $input) {
@@ -102,8 +470,10 @@ async def create_invoice(amount_sats: int, memo: str) -> Dict[str, Any]:
             "memo": memo,
         }
     }
+    if expires_in_minutes is not None:
+        variables["input"]["expiresIn"] = expires_in_minutes
 
-    data = await _blink_request(query, variables)
+    data = await _blink_request(query, variables, operation="lnInvoiceCreate")
     ln_data: Dict[str, Any] = data.get("lnInvoiceCreate", {})
     errors = ln_data.get("errors")
     invoice = ln_data.get("invoice")
@@ -120,6 +490,11 @@ async def create_invoice(amount_sats: int, memo: str) -> Dict[str, Any]:
     if not payment_hash or not payment_request or satoshis is None:
         raise BlinkError(f"Blink lnInvoiceCreate invalid invoice: {invoice}")
 
+    logger.info(
+        "인보이스 생성",
+        extra={"amount_sats": int(satoshis), "payment_hash": payment_hash},
+    )
+
     return {
         "payment_hash": payment_hash,
         "payment_request": payment_request,
@@ -157,25 +532,64 @@ async def check_payment(payment_request: str) -> bool:
         }
     }
 
-    print(f"[Blink] 결제 상태 조회: paymentRequest={payment_request[:60]}...")
     try:
-        data = await _blink_request(query, variables)
+        data = await _blink_request(query, variables, operation="lnInvoicePaymentStatus")
     except BlinkError as e:
         # 상태 조회 실패 시에는 예외를 밖으로 터뜨리지 말고 False 반환
-        print("[Blink] lnInvoicePaymentStatus 호출 중 BlinkError:", e)
+        logger.warning(
+            "결제 상태 조회 실패",
+            extra={"error": str(e), "sample_key": "blink:check_payment:error"},
+        )
         return False
 
-    print("[Blink] lnInvoicePaymentStatus raw:", data)
-
     status_data: Dict[str, Any] = data.get("lnInvoicePaymentStatus", {})
     errors: Optional[List[Dict[str, Any]]] = status_data.get("errors")
     if errors:
-        print(f"[Blink] lnInvoicePaymentStatus errors: {errors}")
+        logger.warning(
+            "결제 상태 조회 errors",
+            extra={"errors": errors, "sample_key": "blink:check_payment:errors"},
+        )
         return False
 
-    status = status_data.get("status")
-    print(f"[Blink] 결제 상태: {status}")
-    return status in ("PAID", "SETTLED", "SUCCESS")
+    return status_data.get("status") in PAID_STATUSES
+
+
+async def check_payments(payment_requests: List[str]) -> Dict[str, Optional[str]]:
+    """
+    여러 인보이스의 결제 상태를 GraphQL 요청 1번으로 조회.
+    lnInvoicePaymentStatus 필드를 별칭(p0, p1, ...)으로 여러 번 넣는다.
+    반환: paymentRequest -> status (조회 실패한 항목은 None)
+    요청 자체가 실패하면 BlinkError 를 그대로 던진다. (호출 측에서 다음 주기에 재시도)
+    """
+    if not payment_requests:
+        return {}
+
+    params: List[str] = []
+    fields: List[str] = []
+    variables: Dict[str, Any] = {}
+    for i, payment_request in enumerate(payment_requests):
+        params.append(f"$i{i}: LnInvoicePaymentStatusInput!")
+        fields.append(
+            f"p{i}: lnInvoicePaymentStatus(input: $i{i}) {{ status errors {{ message }} }}"
+        )
+        variables[f"i{i}"] = {"paymentRequest": payment_request}
+
+    query = (
+        f"query lnInvoicePaymentStatusBatch({', '.join(params)}) {{\n  "
+        + "\n  ".join(fields)
+        + "\n}"
+    )
+
+    data = await _blink_request(query, variables, operation="lnInvoicePaymentStatus")
+
+    statuses: Dict[str, Optional[str]] = {}
+    for i, payment_request in enumerate(payment_requests):
+        status_data: Dict[str, Any] = data.get(f"p{i}") or {}
+        if status_data.get("errors"):
+            statuses[payment_request] = None
+        else:
+            statuses[payment_request] = status_data.get("status")
+    return statuses
 
 
 # ─────────────────────────────────────────────
@@ -189,8 +603,6 @@ async def pay_invoice(bolt11: str, memo: str = "") -> Dict[str, Any]:
     if not bolt11:
         raise BlinkError("bolt11 is empty")
 
-    print(f"[Blink] 인보이스 지불 요청: memo={memo}")
-
     query = """
     mutation lnInvoicePaymentSend($input: LnInvoicePaymentSendInput!) {
       lnInvoicePaymentSend(input: $input) {
@@ -210,13 +622,273 @@ async def pay_invoice(bolt11: str, memo: str = "") -> Dict[str, Any]:
         }
     }
 
-    data = await _blink_request(query, variables)
+    data = await _blink_request(query, variables, operation="lnInvoicePaymentSend")
     pay_data: Dict[str, Any] = data.get("lnInvoicePaymentSend", {})
     errors = pay_data.get("errors")
     status = pay_data.get("status")
 
     if errors:
-        raise BlinkError(f"Blink lnInvoicePaymentSend errors: {errors}")
+        raise BlinkPaymentRejected(f"Blink lnInvoicePaymentSend errors: {errors}")
 
-    print(f"[Blink] 인보이스 지불 상태: {status}")
+    logger.info("인보이스 지불", extra={"status": status})
     return {"success": status in ("SUCCESS", "PAID", "SETTLED"), "status": status}
+
+
+# ─────────────────────────────────────────────
+# 지갑 잔액 (대사용)
+# ─────────────────────────────────────────────
+
+async def get_wallet_balance() -> int:
+    """
+    BLINK_WALLET_ID 지갑의 현재 잔액(sats).
+    지갑을 찾지 못했거나 BTC 지갑이 아니면 BlinkError.
+    """
+    query = """
+    query walletBalance {
+      me {
+        defaultAccount {
+          wallets {
+            id
+            walletCurrency
+            balance
+          }
+        }
+      }
+    }
+    """
+
+    data = await _blink_request(query, operation="walletBalance")
+    account: Dict[str, Any] = (data.get("me") or {}).get("defaultAccount") or {}
+    for wallet in account.get("wallets") or []:
+        if wallet.get("id") != BLINK_WALLET_ID:
+            continue
+        if wallet.get("walletCurrency") != "BTC":
+            raise BlinkError(f"BLINK_WALLET_ID 가 BTC 지갑이 아닙니다: {wallet.get('walletCurrency')}")
+        return int(wallet["balance"])
+    raise BlinkError("Blink 계정에서 BLINK_WALLET_ID 지갑을 찾지 못했습니다.")
+
+
+# ─────────────────────────────────────────────
+# websocket 구독 (graphql-transport-ws)
+# ─────────────────────────────────────────────
+
+SubscriptionCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+ReconnectCallback = Callable[[], Awaitable[None]]
+
+MY_UPDATES_SUBSCRIPTION = """
+subscription myUpdates {
+  myUpdates {
+    errors {
+      message
+    }
+    update {
+      ... on LnUpdate {
+        paymentHash
+        status
+      }
+    }
+  }
+}
+"""
+
+LN_INVOICE_STATUS_SUBSCRIPTION = """
+subscription lnInvoicePaymentStatus($input: LnInvoicePaymentStatusInput!) {
+  lnInvoicePaymentStatus(input: $input) {
+    status
+    errors {
+      message
+    }
+  }
+}
+"""
+
+
+class BlinkSubscriber:
+    """
+    Blink GraphQL 구독 클라이언트.
+    - 공유 HTTP 세션으로 websocket 을 열고 graphql-transport-ws 프로토콜을 사용한다.
+    - 연결이 끊기면 지수 백오프(+지터)로 재접속하고, 등록된 구독을 전부 다시 보낸다.
+    - 재접속 직후에는 on_reconnect 콜백을 호출한다. (끊긴 동안 놓친 이벤트 보충용)
+    """
+
+    def __init__(
+        self,
+        url: str = BLINK_WS_URL,
+        *,
+        max_reconnect_delay: float = BLINK_WS_RECONNECT_MAX_SEC,
+        name: str = "blink-ws",
+    ) -> None:
+        self._url = url
+        self._max_reconnect_delay = max_reconnect_delay
+        self._name = name
+        self._subs: Dict[str, Tuple[str, Optional[Dict[str, Any]], SubscriptionCallback]] = {}
+        self._ids = itertools.count(1)
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._ready = False
+        self._reconnect_listeners: List[ReconnectCallback] = []
+        self._task: Optional[asyncio.Task[Any]] = None
+        self.connects = 0       # 연결(재접속 포함) 성공 횟수
+
+    @property
+    def connected(self) -> bool:
+        """connection_ack 까지 받은 상태인지"""
+        return self._ready and self._ws is not None and not self._ws.closed
+
+    def add_reconnect_listener(self, callback: ReconnectCallback) -> None:
+        self._reconnect_listeners.append(callback)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self._name)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        self._ready = False
+
+    async def subscribe(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]],
+        on_data: SubscriptionCallback,
+    ) -> str:
+        """구독 등록 후 구독 ID 반환 (연결 전이면 연결되는 즉시 전송)"""
+        sub_id = str(next(self._ids))
+        self._subs[sub_id] = (query, variables, on_data)
+        if self.connected:
+            await self._send_subscribe(sub_id)
+        return sub_id
+
+    async def unsubscribe(self, sub_id: str) -> None:
+        if self._subs.pop(sub_id, None) is None:
+            return
+        if self.connected:
+            await self._send({"id": sub_id, "type": "complete"})
+
+    async def subscribe_my_updates(self, on_update: SubscriptionCallback) -> str:
+        """지갑의 모든 LnUpdate(paymentHash, status) 구독"""
+
+        async def handle(data: Dict[str, Any]) -> None:
+            my_updates: Dict[str, Any] = data.get("myUpdates") or {}
+            if my_updates.get("errors"):
+                logger.warning(
+                    "myUpdates errors", extra={"ws": self._name, "errors": my_updates["errors"]}
+                )
+                return
+            update = my_updates.get("update")
+            if update:
+                await on_update(update)
+
+        return await self.subscribe(MY_UPDATES_SUBSCRIPTION, None, handle)
+
+    async def subscribe_invoice_status(
+        self,
+        payment_request: str,
+        on_status: Callable[[Optional[str]], Awaitable[None]],
+    ) -> str:
+        """인보이스 1건의 결제 상태 구독"""
+
+        async def handle(data: Dict[str, Any]) -> None:
+            status_data: Dict[str, Any] = data.get("lnInvoicePaymentStatus") or {}
+            await on_status(None if status_data.get("errors") else status_data.get("status"))
+
+        return await self.subscribe(
+            LN_INVOICE_STATUS_SUBSCRIPTION,
+            {"input": {"paymentRequest": payment_request}},
+            handle,
+        )
+
+    # ---------------- 내부 ----------------
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.send_json(message)
+
+    async def _send_subscribe(self, sub_id: str) -> None:
+        query, variables, _ = self._subs[sub_id]
+        payload: Dict[str, Any] = {"query": query}
+        if variables is not None:
+            payload["variables"] = variables
+        await self._send({"id": sub_id, "type": "subscribe", "payload": payload})
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                await self._connect_and_listen()
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("websocket 연결 끊김", extra={"ws": self._name, "error": str(e)})
+            finally:
+                self._ready = False
+                self._ws = None
+
+            # 재접속 폭주를 막기 위해 지수 백오프 + 지터
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, self._max_reconnect_delay)
+
+    async def _connect_and_listen(self) -> None:
+        session = await _get_session()
+        async with session.ws_connect(
+            self._url,
+            protocols=("graphql-transport-ws",),
+            heartbeat=30,
+        ) as ws:
+            self._ws = ws
+            await ws.send_json(
+                {"type": "connection_init", "payload": {"X-API-KEY": BLINK_API_KEY or ""}}
+            )
+            ack = await ws.receive_json(timeout=BLINK_HTTP_TIMEOUT)
+            if ack.get("type") != "connection_ack":
+                raise BlinkError(f"Blink websocket connection_ack 대신 {ack} 수신")
+
+            self._ready = True
+            self.connects += 1
+            for sub_id in list(self._subs):
+                await self._send_subscribe(sub_id)
+            for listener in self._reconnect_listeners:
+                try:
+                    await listener()
+                except Exception:
+                    logger.exception("on_reconnect 예외", extra={"ws": self._name})
+
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                await self._dispatch(msg.json())
+
+    async def _dispatch(self, message: Dict[str, Any]) -> None:
+        kind = message.get("type")
+        sub_id = message.get("id")
+        if kind == "ping":
+            await self._send({"type": "pong"})
+        elif kind == "next" and sub_id in self._subs:
+            payload: Dict[str, Any] = message.get("payload") or {}
+            if payload.get("errors"):
+                logger.warning(
+                    "구독 errors",
+                    extra={"ws": self._name, "sub_id": sub_id, "errors": payload["errors"]},
+                )
+                return
+            try:
+                await self._subs[sub_id][2](payload.get("data") or {})
+            except Exception:
+                logger.exception("구독 콜백 예외", extra={"ws": self._name, "sub_id": sub_id})
+        elif kind == "error":
+            logger.warning(
+                "구독 거절",
+                extra={"ws": self._name, "sub_id": sub_id, "payload": message.get("payload")},
+            )
+            self._subs.pop(str(sub_id), None)
+        elif kind == "complete":
+            self._subs.pop(str(sub_id), None)
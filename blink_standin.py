@@ -0,0 +1,298 @@
+# blink_standin.py
+"""
+로컬 테스트용 Blink GraphQL 대역 서버.
+- HTTP POST: lnInvoiceCreate / lnInvoicePaymentStatus(별칭 일괄 조회 포함) / lnInvoicePaymentSend
+  / me.defaultAccount.wallets (지갑 잔액: 결제 완료된 입금만큼 늘고 출금 금액만큼 줄어든다)
+- websocket (graphql-transport-ws): myUpdates / lnInvoicePaymentStatus 구독
+- settle(payment_hash) 로 결제 완료 이벤트를 구독자들에게 push
+  (settle_after 를 주면 생성된 인보이스를 그 시간 뒤에 자동으로 결제 완료 처리)
+- latency / error_rate 로 느린 응답, HTTP 503 장애를 재현
+- drop_connections() 로 소켓 끊김(장애) 상황을 재현
+
+BLINK_API_URL 은 http_url, BLINK_WS_URL 은 ws_url 로 지정해서 사용한다.
+    python blink_standin.py --port 8787 --latency 0.05 --error-rate 0.01 --settle-after 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+from collections import Counter
+from typing import Any, Dict, Optional, Set
+
+from aiohttp import WSMsgType, web
+
+from bolt11 import Bolt11Error, decode
+
+# 별칭 일괄 조회: "p0: lnInvoicePaymentStatus(input: $i0)"
+_STATUS_FIELD = re.compile(
+    r"(?:(\w+)\s*:\s*)?lnInvoicePaymentStatus\s*\(\s*input\s*:\s*\$(\w+)\s*\)"
+)
+
+
+class BlinkStandIn:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        settle_after: Optional[float] = None,
+        settle_jitter: float = 0.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency                  # HTTP 응답 지연(초)
+        self.latency_jitter = latency_jitter    # 지연에 더할 0 ~ jitter 초 난수
+        self.error_rate = error_rate            # 이 확률로 HTTP 503 응답
+        self.settle_after = settle_after        # 인보이스 생성 후 자동 결제까지(초), None 이면 수동
+        self.settle_jitter = settle_jitter
+        self.app = web.Application()
+        self.app.router.add_get("/graphql", self._handle_ws)
+        self.app.router.add_post("/graphql", self._handle_http)
+        self._runner: Optional[web.AppRunner] = None
+        # websocket -> {구독 ID: (종류, paymentRequest)}
+        self._clients: Dict[web.WebSocketResponse, Dict[str, tuple[str, Optional[str]]]] = {}
+        self.invoices: Dict[str, str] = {}     # payment_hash -> payment_request
+        self.statuses: Dict[str, str] = {}     # payment_hash -> PENDING / PAID
+        self._hashes: Dict[str, str] = {}      # payment_request -> payment_hash
+        self.paid_requests: Set[str] = set()   # lnInvoicePaymentSend 로 이미 결제한 인보이스
+        self.amounts: Dict[str, int] = {}      # payment_hash -> 금액(sats)
+        self.wallet_id = "standin-wallet"
+        self.wallet_balance = 0                # sats
+        self.requests: Counter[str] = Counter()   # operation 별 HTTP 요청 수
+        self.injected_errors = 0
+        self._settle_tasks: Set[asyncio.Task[Any]] = set()
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.host}:{self.port}/graphql"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/graphql"
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            server = site._server
+            assert server is not None
+            self.port = server.sockets[0].getsockname()[1]  # type: ignore[attr-defined]
+        return self.ws_url
+
+    async def stop(self) -> None:
+        for task in list(self._settle_tasks):
+            task.cancel()
+        await self.drop_connections()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def add_invoice(self, payment_hash: str, payment_request: str) -> None:
+        self.invoices[payment_hash] = payment_request
+        self.statuses[payment_hash] = "PENDING"
+        self._hashes[payment_request] = payment_hash
+
+    async def settle(self, payment_hash: str, status: str = "PAID") -> int:
+        """결제 완료 처리 후 구독자들에게 push. 전송한 이벤트 수 반환"""
+        if self.statuses.get(payment_hash) != status and status == "PAID":
+            self.wallet_balance += self.amounts.get(payment_hash, 0)
+        self.statuses[payment_hash] = status
+        payment_request = self.invoices.get(payment_hash)
+        sent = 0
+        for ws, subs in list(self._clients.items()):
+            for sub_id, (kind, sub_request) in list(subs.items()):
+                if kind == "myUpdates":
+                    data: Dict[str, Any] = {
+                        "myUpdates": {
+                            "errors": [],
+                            "update": {"paymentHash": payment_hash, "status": status},
+                        }
+                    }
+                elif kind == "lnInvoicePaymentStatus" and sub_request == payment_request:
+                    data = {"lnInvoicePaymentStatus": {"status": status, "errors": []}}
+                else:
+                    continue
+                await ws.send_json({"id": sub_id, "type": "next", "payload": {"data": data}})
+                sent += 1
+        return sent
+
+    async def drop_connections(self) -> None:
+        for ws in list(self._clients):
+            await ws.close()
+        self._clients.clear()
+
+    @property
+    def subscription_count(self) -> int:
+        return sum(len(subs) for subs in self._clients.values())
+
+    # ---------------- 내부 ----------------
+
+    async def _handle_http(self, request: web.Request) -> web.Response:
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        body: Dict[str, Any] = await request.json()
+        query = str(body.get("query", ""))
+        variables: Dict[str, Any] = body.get("variables") or {}
+
+        if "lnInvoicePaymentSend" in query:
+            operation = "lnInvoicePaymentSend"
+        elif "lnInvoiceCreate" in query:
+            operation = "lnInvoiceCreate"
+        elif "lnInvoicePaymentStatus" in query:
+            operation = "lnInvoicePaymentStatus"
+        elif "defaultAccount" in query:
+            operation = "walletBalance"
+        else:
+            return web.json_response({"errors": [{"message": "지원하지 않는 요청입니다."}]})
+        self.requests[operation] += 1
+
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            self.injected_errors += 1
+            return web.json_response({"errors": [{"message": "injected"}]}, status=503)
+
+        if operation == "lnInvoiceCreate":
+            data = self._invoice_create(variables.get("input") or {})
+        elif operation == "lnInvoicePaymentSend":
+            data = self._payment_send(variables.get("input") or {})
+        elif operation == "walletBalance":
+            wallet = {"id": self.wallet_id, "walletCurrency": "BTC", "balance": self.wallet_balance}
+            data = {"me": {"defaultAccount": {"wallets": [wallet]}}}
+        else:
+            data = self._payment_status(query, variables)
+        return web.json_response({"data": data})
+
+    def _invoice_create(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        amount = int(params.get("amount") or 0)
+        if amount <= 0:
+            return {"lnInvoiceCreate": {"invoice": None, "errors": [{"message": "금액 오류"}]}}
+        payment_hash = os.urandom(32).hex()
+        payment_request = f"lnbcrt{amount}standin{payment_hash}"
+        self.add_invoice(payment_hash, payment_request)
+        self.amounts[payment_hash] = amount
+
+        if self.settle_after is not None:
+            delay = self.settle_after + random.uniform(0, self.settle_jitter)
+            task = asyncio.create_task(self._settle_later(payment_hash, delay))
+            self._settle_tasks.add(task)
+            task.add_done_callback(self._settle_tasks.discard)
+
+        invoice = {
+            "paymentHash": payment_hash,
+            "paymentRequest": payment_request,
+            "satoshis": amount,
+        }
+        return {"lnInvoiceCreate": {"invoice": invoice, "errors": []}}
+
+    def _payment_status(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for alias, var_name in _STATUS_FIELD.findall(query):
+            payment_request = (variables.get(var_name) or {}).get("paymentRequest")
+            payment_hash = self._hashes.get(str(payment_request))
+            if payment_hash is None:
+                result: Dict[str, Any] = {"status": None, "errors": [{"message": "알 수 없는 인보이스"}]}
+            else:
+                result = {"status": self.statuses[payment_hash], "errors": []}
+            data[alias or "lnInvoicePaymentStatus"] = result
+        return data
+
+    def _payment_send(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        payment_request = str(params.get("paymentRequest") or "")
+        if not payment_request:
+            status: Optional[str] = None
+            errors = [{"message": "paymentRequest 가 비어 있습니다."}]
+        elif payment_request in self.paid_requests:
+            status, errors = "ALREADY_PAID", []
+        else:
+            self.paid_requests.add(payment_request)
+            self.wallet_balance -= _request_amount(payment_request)
+            status, errors = "SUCCESS", []
+        return {"lnInvoicePaymentSend": {"status": status, "errors": errors}}
+
+    async def _settle_later(self, payment_hash: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.settle(payment_hash)
+
+    async def _handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(protocols=("graphql-transport-ws",))
+        await ws.prepare(request)
+        subs: Dict[str, tuple[str, Optional[str]]] = {}
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            message: Dict[str, Any] = json.loads(msg.data)
+            kind = message.get("type")
+            if kind == "connection_init":
+                self._clients[ws] = subs
+                await ws.send_json({"type": "connection_ack"})
+            elif kind == "ping":
+                await ws.send_json({"type": "pong"})
+            elif kind == "subscribe":
+                payload: Dict[str, Any] = message.get("payload") or {}
+                query = str(payload.get("query", ""))
+                variables: Dict[str, Any] = payload.get("variables") or {}
+                if "myUpdates" in query:
+                    subs[message["id"]] = ("myUpdates", None)
+                elif "lnInvoicePaymentStatus" in query:
+                    payment_request = (variables.get("input") or {}).get("paymentRequest")
+                    subs[message["id"]] = ("lnInvoicePaymentStatus", payment_request)
+                else:
+                    await ws.send_json(
+                        {
+                            "id": message["id"],
+                            "type": "error",
+                            "payload": [{"message": "지원하지 않는 구독입니다."}],
+                        }
+                    )
+            elif kind == "complete":
+                subs.pop(str(message.get("id")), None)
+
+        self._clients.pop(ws, None)
+        return ws
+
+
+def _request_amount(payment_request: str) -> int:
+    """BOLT11 이면 금액(sats), 해석할 수 없으면 0 (벤치마크용 가짜 인보이스 등)"""
+    try:
+        return decode(payment_request).amount_sats or 0
+    except Bolt11Error:
+        return 0
+
+
+async def _main(args: argparse.Namespace) -> None:
+    standin = BlinkStandIn(
+        port=args.port,
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        settle_after=args.settle_after,
+        settle_jitter=args.settle_jitter,
+    )
+    await standin.start()
+    print(f"[BlinkStandIn] {standin.http_url} / {standin.ws_url} 에서 대기 중 (Ctrl+C 로 종료)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 Blink GraphQL 대역 서버")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="HTTP 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="응답 지연에 더할 최대 난수(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 503 응답 확률 (0~1)")
+    parser.add_argument(
+        "--settle-after", type=float, default=None, help="인보이스 생성 후 자동 결제까지(초)"
+    )
+    parser.add_argument("--settle-jitter", type=float, default=0.0)
+    asyncio.run(_main(parser.parse_args()))
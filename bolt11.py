@@ -0,0 +1,279 @@
+# bolt11.py
+"""
+BOLT11 라이트닝 인보이스 디코더 (외부 의존성 없음).
+- bech32 체크섬 검증, HRP 의 네트워크 / 금액(msat) 파싱
+- 태그 필드: payment_hash(p), payment_secret(s), description(d), description_hash(h),
+  expiry(x), min_final_cltv_expiry(c), payee(n)
+- 서명(65 bytes)은 그대로 꺼내 두기만 한다. (secp256k1 복원/검증은 하지 않음)
+
+    python bolt11.py            # 마이크로 벤치마크
+"""
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+_CHARSET_REV = {c: i for i, c in enumerate(CHARSET)}
+_GENERATOR = (0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3)
+
+# HRP 통화 접두어 -> 네트워크 (긴 것부터 비교해야 lntbs / lnbcrt 가 lntb / lnbc 로 잘못 잡히지 않음)
+NETWORKS = (
+    ("bcrt", "regtest"),
+    ("tbs", "signet"),
+    ("bc", "mainnet"),
+    ("tb", "testnet"),
+    ("sb", "simnet"),
+)
+
+# 금액 단위 -> 1 단위당 msat (p 는 0.1 msat 이라 별도 처리)
+_MULTIPLIER_MSAT = {"m": 10**8, "u": 10**5, "n": 10**2}
+_BTC_MSAT = 10**11
+
+DEFAULT_EXPIRY = 3600            # x 태그가 없으면 1시간
+DEFAULT_MIN_FINAL_CLTV = 18      # c 태그가 없을 때 기본값
+_SIGNATURE_WORDS = 104           # 520 bits = 64 bytes 서명 + 1 byte recovery id
+
+
+class Bolt11Error(ValueError):
+    pass
+
+
+class Bolt11Invoice(NamedTuple):
+    network: str
+    amount_msat: Optional[int]        # 금액 없는 인보이스는 None
+    timestamp: int                    # unix 초
+    expiry: int                       # 초
+    payment_hash: str                 # hex
+    payment_secret: Optional[str]
+    description: Optional[str]
+    description_hash: Optional[str]
+    min_final_cltv_expiry: int
+    payee: Optional[str]              # n 태그가 있을 때만 (33 bytes hex)
+    signature: str                    # 65 bytes hex (r || s || recovery id)
+
+    @property
+    def amount_sats(self) -> Optional[int]:
+        """sats 단위 금액 (1 sat 미만 자투리는 올림 → 지불에 필요한 최소 잔액)"""
+        if self.amount_msat is None:
+            return None
+        return -(-self.amount_msat // 1000)
+
+    @property
+    def expires_at(self) -> int:
+        return self.timestamp + self.expiry
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires_at
+
+
+# ─────────────────────────────────────────────
+# bech32
+# ─────────────────────────────────────────────
+
+def _build_polymod_table() -> tuple[int, ...]:
+    # top 5 bit 값(0~31)마다 XOR 할 생성자 조합을 미리 계산 → 문자당 루프 1회
+    table = []
+    for top in range(32):
+        acc = 0
+        for i in range(5):
+            if (top >> i) & 1:
+                acc ^= _GENERATOR[i]
+        table.append(acc)
+    return tuple(table)
+
+
+_POLYMOD_TABLE = _build_polymod_table()
+
+
+def _polymod(values: list[int]) -> int:
+    chk = 1
+    table = _POLYMOD_TABLE
+    for v in values:
+        chk = ((chk & 0x1FFFFFF) << 5) ^ v ^ table[chk >> 25]
+    return chk
+
+
+def _hrp_expand(hrp: str) -> list[int]:
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def _bech32_decode(bech: str) -> tuple[str, list[int]]:
+    """(hrp, 5-bit words) 반환. BOLT11 은 길이 제한(90자)이 없다."""
+    if bech.lower() != bech and bech.upper() != bech:
+        raise Bolt11Error("대소문자가 섞인 bech32 문자열입니다.")
+    bech = bech.lower()
+    pos = bech.rfind("1")
+    if pos < 1 or pos + 7 > len(bech):
+        raise Bolt11Error("bech32 구분자(1) 위치가 올바르지 않습니다.")
+    hrp = bech[:pos]
+    try:
+        words = [_CHARSET_REV[c] for c in bech[pos + 1:]]
+    except KeyError:
+        raise Bolt11Error("bech32 에 허용되지 않는 문자가 있습니다.") from None
+    if _polymod(_hrp_expand(hrp) + words) != 1:
+        raise Bolt11Error("bech32 체크섬이 맞지 않습니다.")
+    return hrp, words[:-6]
+
+
+def _words_to_int(words: list[int]) -> int:
+    value = 0
+    for w in words:
+        value = (value << 5) | w
+    return value
+
+
+def _words_to_bytes(words: list[int]) -> bytes:
+    """5-bit words -> bytes (끝에 남는 8 bit 미만 패딩은 버림)"""
+    acc = 0
+    bits = 0
+    out = bytearray()
+    for w in words:
+        acc = (acc << 5) | w
+        bits += 5
+        if bits >= 8:
+            bits -= 8
+            out.append((acc >> bits) & 0xFF)
+    return bytes(out)
+
+
+# ─────────────────────────────────────────────
+# HRP / 태그 파싱
+# ─────────────────────────────────────────────
+
+def _parse_hrp(hrp: str) -> tuple[str, Optional[int]]:
+    if not hrp.startswith("ln"):
+        raise Bolt11Error("라이트닝 인보이스(ln...)가 아닙니다.")
+    rest = hrp[2:]
+    for prefix, network in NETWORKS:
+        if rest.startswith(prefix):
+            return network, _parse_amount(rest[len(prefix):])
+    raise Bolt11Error(f"알 수 없는 네트워크 접두어입니다: {hrp}")
+
+
+def _parse_amount(amount: str) -> Optional[int]:
+    if not amount:
+        return None
+    unit = amount[-1]
+    digits = amount[:-1] if unit.isalpha() else amount
+    if not digits.isdigit() or (len(digits) > 1 and digits[0] == "0"):
+        raise Bolt11Error(f"금액 형식이 올바르지 않습니다: {amount}")
+    value = int(digits)
+    if not unit.isalpha():
+        return value * _BTC_MSAT
+    if unit == "p":
+        # 1p = 0.1 msat → 10 의 배수여야 msat 로 나누어 떨어진다.
+        if value % 10:
+            raise Bolt11Error("pico 단위 금액은 10 의 배수여야 합니다.")
+        return value // 10
+    if unit not in _MULTIPLIER_MSAT:
+        raise Bolt11Error(f"알 수 없는 금액 단위입니다: {unit}")
+    return value * _MULTIPLIER_MSAT[unit]
+
+
+@lru_cache(maxsize=1024)
+def decode(bolt11: str) -> Bolt11Invoice:
+    """
+    BOLT11 문자열을 디코딩. 형식/체크섬 오류는 Bolt11Error.
+    같은 인보이스를 여러 번 검사하는 경우가 많아서 결과를 LRU 로 기억한다.
+    """
+    bolt11 = bolt11.strip()
+    if bolt11.lower().startswith("lightning:"):
+        bolt11 = bolt11[len("lightning:"):]
+
+    hrp, words = _bech32_decode(bolt11)
+    network, amount_msat = _parse_hrp(hrp)
+
+    if len(words) < 7 + _SIGNATURE_WORDS:
+        raise Bolt11Error("인보이스 데이터가 너무 짧습니다.")
+    timestamp = _words_to_int(words[:7])
+    signature = _words_to_bytes(words[-_SIGNATURE_WORDS:])
+    tagged = words[7:-_SIGNATURE_WORDS]
+
+    payment_hash: Optional[str] = None
+    payment_secret: Optional[str] = None
+    description: Optional[str] = None
+    description_hash: Optional[str] = None
+    payee: Optional[str] = None
+    expiry = DEFAULT_EXPIRY
+    min_final_cltv = DEFAULT_MIN_FINAL_CLTV
+
+    i = 0
+    while i < len(tagged):
+        if i + 3 > len(tagged):
+            raise Bolt11Error("태그 필드가 잘려 있습니다.")
+        tag = CHARSET[tagged[i]]
+        length = (tagged[i + 1] << 5) | tagged[i + 2]
+        data = tagged[i + 3:i + 3 + length]
+        if len(data) != length:
+            raise Bolt11Error("태그 필드 길이가 맞지 않습니다.")
+        i += 3 + length
+
+        # 길이가 규격과 다른 p / s / h / n 태그는 규격대로 무시한다.
+        if tag == "p" and length == 52 and payment_hash is None:
+            payment_hash = _words_to_bytes(data).hex()
+        elif tag == "s" and length == 52:
+            payment_secret = _words_to_bytes(data).hex()
+        elif tag == "h" and length == 52:
+            description_hash = _words_to_bytes(data).hex()
+        elif tag == "n" and length == 53:
+            payee = _words_to_bytes(data).hex()
+        elif tag == "d":
+            try:
+                description = _words_to_bytes(data).decode("utf-8")
+            except UnicodeDecodeError:
+                raise Bolt11Error("description 이 UTF-8 이 아닙니다.") from None
+        elif tag == "x":
+            expiry = _words_to_int(data)
+        elif tag == "c":
+            min_final_cltv = _words_to_int(data)
+
+    if payment_hash is None:
+        raise Bolt11Error("payment_hash(p) 태그가 없습니다.")
+
+    return Bolt11Invoice(
+        network=network,
+        amount_msat=amount_msat,
+        timestamp=timestamp,
+        expiry=expiry,
+        payment_hash=payment_hash,
+        payment_secret=payment_secret,
+        description=description,
+        description_hash=description_hash,
+        min_final_cltv_expiry=min_final_cltv,
+        payee=payee,
+        signature=signature.hex(),
+    )
+
+
+# ─────────────────────────────────────────────
+# 마이크로 벤치마크
+# ─────────────────────────────────────────────
+
+# BOLT11 규격 문서의 예제 인보이스 (2500u, description "1 cup coffee", expiry 60초)
+SAMPLE_INVOICE = (
+    "lnbc2500u1pvjluezsp5zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zyg3zygspp5qqqsyqcyq5rqwzqfqqqs"
+    "yqcyq5rqwzqfqqqsyqcyq5rqwzqfqypqdq5xysxxatsyp3k7enxv4jsxqzpu9qrsgquk0rl77nj30yxdy8j9vdx85fkp"
+    "mdla2087ne0xh8nhedh8w27kyke0lp53ut353s06fv3qfegext0eh0ymjpf39tuven09sam30g4vgpfna3rh"
+)
+
+
+def _benchmark(rounds: int = 20000) -> None:
+    started = time.perf_counter()
+    for _ in range(rounds // 10):
+        decode.__wrapped__(SAMPLE_INVOICE)
+    cold_us = (time.perf_counter() - started) / (rounds // 10) * 1e6
+
+    decode.cache_clear()
+    decode(SAMPLE_INVOICE)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        decode(SAMPLE_INVOICE)
+    cached_us = (time.perf_counter() - started) / rounds * 1e6
+
+    inv = decode(SAMPLE_INVOICE)
+    print(f"[bolt11] {inv.network} {inv.amount_msat} msat, hash={inv.payment_hash[:16]}...")
+    print(f"[bolt11] 디코딩: {cold_us:.1f}us / 캐시 적중: {cached_us:.2f}us")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -1,12 +1,17 @@
 # bot.py
 import asyncio
 import os
+import time
 
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
+from blink_client_rr import close_session
 from config import DISCORD_TOKEN
+from db import close_db
+from log import setup_logging, shutdown_logging
+from reconciler import reconciler
 
 load_dotenv()
 
@@ -28,10 +33,36 @@ class LEMONBot(commands.Bot):
         await self.load_extension("wallet_cog")
         await self.load_extension("rr_cog")
 
+        # 재시작 전에 남아있던 WAITING / RUNNING 게임 복원 + 자동 종료 타이머 재설정
+        rr = self.get_cog("RussianRoulette")
+        if rr is not None:
+            started = time.perf_counter()
+            restored = await rr.rehydrate()  # type: ignore[attr-defined]
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"Rehydrated {restored} RR games in {elapsed_ms:.1f}ms.")
+
+        # 재시작 전에 결제를 기다리던 입금 인보이스 감시 재개 + 끝나지 않은 출금 이어서 처리
+        wallet = self.get_cog("WalletCog")
+        if wallet is not None:
+            resumed = await wallet.resume_deposits()  # type: ignore[attr-defined]
+            print(f"Resumed {resumed} pending deposits.")
+            resumed = await wallet.resume_withdrawals()  # type: ignore[attr-defined]
+            print(f"Resumed {resumed} unfinished withdrawals.")
+
+        # 내부 잔액 합계와 Blink 지갑 잔액 주기 대사 (RECONCILE_INTERVAL_SEC 마다)
+        reconciler.start()
+
         # 슬래시 커맨드 동기화
         await self.tree.sync()
         print("Slash commands synced.")
 
+    async def close(self) -> None:
+        await super().close()
+        # Blink HTTP 커넥션 풀 정리
+        await close_session()
+        # 쓰기 커넥션 + 읽기 풀 정리 (WAL 체크포인트 포함)
+        await close_db()
+
     async def on_ready(self) -> None:
         user = self.user
         if user is None:
@@ -45,10 +76,15 @@ async def main() -> None:
     if not token:
         raise RuntimeError("DISCORD_TOKEN 이 설정되지 않았습니다.")
 
+    setup_logging()
     bot = LEMONBot()
 
-    async with bot:
-        await bot.start(token)
+    try:
+        async with bot:
+            await bot.start(token)
+    finally:
+        # 큐에 남은 로그 출력 후 리스너 스레드 정리
+        shutdown_logging()
 
 
 if __name__ == "__main__":
@@ -7,13 +7,87 @@ load_dotenv()
 # Discord
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 
+# 로깅 (log.py): 레벨, JSON 한 줄 출력 여부, 반복 로그(sample_key) 출력 간격(초), 출력 대기 큐 크기
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON = os.getenv("LOG_JSON", "0") == "1"
+LOG_SAMPLE_SEC = float(os.getenv("LOG_SAMPLE_SEC", "30"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
 # DB
 DB_PATH = os.getenv("DB_PATH", "lemon_lotto.db")
+# 테스트/CI 용: DB 초기화 직후 핫패스 쿼리에 전체 스캔이 없는지 검사
+DB_CHECK_QUERY_PLANS = os.getenv("DB_CHECK_QUERY_PLANS", "0") == "1"
+# 읽기 전용 커넥션 풀 크기 (0 이면 모든 조회를 쓰기 커넥션으로 처리)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))       # 커넥션당 페이지 캐시
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))  # 메모리 맵 크기 (bytes)
+# 0 보다 크면 이 시간(ms) 안에 끝난 트랜잭션들을 fsync 1회로 묶어서 커밋 (그룹 커밋)
+DB_GROUP_COMMIT_MS = float(os.getenv("DB_GROUP_COMMIT_MS", "0"))
+
+# 잔액 캐시 (write-through LRU) 최대 유저 수, 0 이면 캐시 사용 안 함
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", "10000"))
+# users 행이 있는 것으로 확인된 유저 ID 기억 개수 (get_or_create_user 생략용)
+KNOWN_USER_CACHE_SIZE = int(os.getenv("KNOWN_USER_CACHE_SIZE", "100000"))
+
+# 입금 QR 렌더링 (이벤트 루프 밖의 워커 풀에서 생성)
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", "2"))
+QR_RENDER_PROCESSES = os.getenv("QR_RENDER_PROCESSES", "1") == "1"  # 0 이면 스레드 풀
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "256"))             # payment_request 별 PNG 캐시 개수
+QR_COMPACT = os.getenv("QR_COMPACT", "0") == "1"                   # 작은 박스 + 1-bit PNG
 
 # Blink (Lightning)
 BLINK_API_URL = os.getenv("BLINK_API_URL", "https://api.blink.sv/graphql").rstrip("/")
 BLINK_API_KEY = os.getenv("BLINK_API_KEY", "")
 BLINK_WALLET_ID = os.getenv("BLINK_WALLET_ID", "")
+# Blink HTTP 커넥션 풀 (keep-alive 로 TCP/TLS 핸드셰이크 재사용)
+BLINK_HTTP_POOL_SIZE = int(os.getenv("BLINK_HTTP_POOL_SIZE", "20"))        # 전체 동시 연결 수
+BLINK_HTTP_KEEPALIVE_SEC = float(os.getenv("BLINK_HTTP_KEEPALIVE_SEC", "30"))
+BLINK_HTTP_CONNECT_TIMEOUT = float(os.getenv("BLINK_HTTP_CONNECT_TIMEOUT", "5"))
+BLINK_HTTP_TIMEOUT = float(os.getenv("BLINK_HTTP_TIMEOUT", "15"))            # 요청 1건 전체 제한 시간 (초)
+
+# Blink 작업별 제한 시간 (재시도 포함 전체, 초)
+BLINK_TIMEOUT_INVOICE_CREATE = float(os.getenv("BLINK_TIMEOUT_INVOICE_CREATE", "10"))
+BLINK_TIMEOUT_PAYMENT_STATUS = float(os.getenv("BLINK_TIMEOUT_PAYMENT_STATUS", "5"))
+BLINK_TIMEOUT_PAYMENT_SEND = float(os.getenv("BLINK_TIMEOUT_PAYMENT_SEND", "60"))
+# 재시도 (조회 / 인보이스 생성처럼 다시 보내도 안전한 요청만), 지터 포함 지수 백오프
+BLINK_RETRY_ATTEMPTS = int(os.getenv("BLINK_RETRY_ATTEMPTS", "3"))
+BLINK_RETRY_BASE_SEC = float(os.getenv("BLINK_RETRY_BASE_SEC", "0.2"))
+BLINK_RETRY_MAX_SEC = float(os.getenv("BLINK_RETRY_MAX_SEC", "2"))
+# 서킷 브레이커: 연속 실패가 이 횟수에 도달하면 COOLDOWN 초 동안 요청을 바로 거절
+BLINK_BREAKER_THRESHOLD = int(os.getenv("BLINK_BREAKER_THRESHOLD", "5"))
+BLINK_BREAKER_COOLDOWN_SEC = float(os.getenv("BLINK_BREAKER_COOLDOWN_SEC", "30"))
+# 요청 속도 제한(토큰 버킷): 초당 RATE 개, 순간 최대 BURST 개 (0 이면 제한 없음)
+# 대기 중에는 결제 > 인보이스 생성 > 결제 상태 조회 순서로 먼저 보낸다.
+BLINK_RATE_PER_SEC = float(os.getenv("BLINK_RATE_PER_SEC", "10"))
+BLINK_RATE_BURST = int(os.getenv("BLINK_RATE_BURST", "20"))
+
+# 입금 감시: 대기중 인보이스 전체를 이 주기(초)마다 한 번에 조회
+DEPOSIT_POLL_INTERVAL = float(os.getenv("DEPOSIT_POLL_INTERVAL", "2"))
+DEPOSIT_POLL_BATCH_SIZE = int(os.getenv("DEPOSIT_POLL_BATCH_SIZE", "50"))  # GraphQL 요청 1개당 최대 인보이스 수
+DEPOSIT_TIMEOUT_SECONDS = float(os.getenv("DEPOSIT_TIMEOUT_SECONDS", "120"))
+# 만료 시각이 지났는데 Blink 가 아직 PENDING 이라고 하면(시계 차이 등) 이 시간(초)만큼 더 감시
+DEPOSIT_EXPIRE_GRACE_SEC = float(os.getenv("DEPOSIT_EXPIRE_GRACE_SEC", "60"))
+
+# Blink websocket 구독 (graphql-transport-ws). 켜져 있으면 입금은 push 로 확인하고,
+# 소켓이 끊긴 동안에만 폴링으로 대체한다.
+BLINK_WS_ENABLED = os.getenv("BLINK_WS_ENABLED", "0") == "1"
+BLINK_WS_URL = os.getenv("BLINK_WS_URL", "wss://ws.blink.sv/graphql")
+BLINK_WS_RECONNECT_MAX_SEC = float(os.getenv("BLINK_WS_RECONNECT_MAX_SEC", "30"))
+
+# 출금 워커: 동시에 처리할 결제 수, 결과 미확정(PENDING / 통신 오류) 재전송 간격과 최대 시도 횟수
+WITHDRAW_WORKERS = int(os.getenv("WITHDRAW_WORKERS", "4"))
+WITHDRAW_RECHECK_SEC = float(os.getenv("WITHDRAW_RECHECK_SEC", "5"))
+WITHDRAW_MAX_ATTEMPTS = int(os.getenv("WITHDRAW_MAX_ATTEMPTS", "10"))
+
+# 지갑 대사: 주기(초, 0 이면 자동 실행 안 함), users 스캔 페이지 크기,
+# 허용 오차(sats, 라우팅 수수료 등), 보고서에 보여줄 원장 항목 수,
+# 스캔 전후 지갑 잔액이 달라졌을 때 다시 스캔할 최대 횟수
+RECONCILE_INTERVAL_SEC = float(os.getenv("RECONCILE_INTERVAL_SEC", "300"))
+RECONCILE_CHUNK_SIZE = int(os.getenv("RECONCILE_CHUNK_SIZE", "2000"))
+RECONCILE_TOLERANCE_SATS = int(os.getenv("RECONCILE_TOLERANCE_SATS", "100"))
+RECONCILE_LEDGER_TOP = int(os.getenv("RECONCILE_LEDGER_TOP", "10"))
+RECONCILE_SCAN_ATTEMPTS = int(os.getenv("RECONCILE_SCAN_ATTEMPTS", "3"))
 
 if not BLINK_API_URL:
     print("[WARN] BLINK_API_URL 가 설정되지 않았습니다.")
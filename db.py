@@ -1,30 +1,356 @@
 # db.py
-import aiosqlite
+import asyncio
 import os
+import pathlib
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Sequence
+
+import aiosqlite
 
-from config import DB_PATH
+from config import (
+    DB_CACHE_SIZE_KB,
+    DB_CHECK_QUERY_PLANS,
+    DB_GROUP_COMMIT_MS,
+    DB_MMAP_SIZE,
+    DB_PATH,
+    DB_READ_POOL_SIZE,
+    DB_SYNCHRONOUS,
+)
+from log import get_logger
+from queries import HOT_PATH_QUERIES
 
+logger = get_logger("db")
+
+# 쓰기 전용 커넥션 1개 (모든 INSERT / UPDATE / 커밋은 여기로)
 _db: aiosqlite.Connection | None = None
+# 읽기 전용 커넥션 풀 (WAL 이라 쓰기 커밋 중에도 막히지 않음)
+_readers: list[aiosqlite.Connection] = []
+_read_pool: "asyncio.Queue[aiosqlite.Connection] | None" = None
+_open_lock = asyncio.Lock()
+# 쓰기 트랜잭션 직렬화 (쓰기 커넥션을 여러 코루틴이 공유하므로 반드시 필요)
+_write_lock = asyncio.Lock()
+
+INDEXES: tuple[str, ...] = (
+    # rr_cog: 채널별 활성 게임 조회, 재시작 시 활성 게임 일괄 로드
+    """
+    CREATE INDEX IF NOT EXISTS idx_rr_games_status_channel
+    ON rr_games (status, channel_id)
+    """,
+    # rr_cog: 좌석 중복 방지 + 저널의 alive 갱신
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_rr_players_game_user
+    ON rr_players (game_id, user_id)
+    """,
+    # rr_cog: 순번 순서대로 참가자 조회 (커버링)
+    """
+    CREATE INDEX IF NOT EXISTS idx_rr_players_game_order
+    ON rr_players (game_id, order_index, user_id, alive)
+    """,
+)
 
 
 async def get_db() -> aiosqlite.Connection:
     """
-    싱글톤 형태로 aiosqlite DB 커넥션을 반환.
+    싱글톤 형태로 쓰기용 aiosqlite DB 커넥션을 반환.
+    처음 호출될 때 WAL / pragma 설정과 마이그레이션을 적용한다.
     """
     global _db
-    if _db is None:
-        if os.path.dirname(DB_PATH):
-            os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        _db = await aiosqlite.connect(DB_PATH)
-        _db.row_factory = aiosqlite.Row
-        await init_db(_db)
+    if _db is not None:
+        return _db
+    async with _open_lock:
+        if _db is None:
+            if os.path.dirname(DB_PATH):
+                os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+            db = await aiosqlite.connect(DB_PATH)
+            db.row_factory = aiosqlite.Row
+            await db.execute("PRAGMA journal_mode = WAL")
+            await _apply_pragmas(db)
+            await init_db(db)
+            if DB_CHECK_QUERY_PLANS:
+                await check_query_plans(db)
+            _db = db
     return _db
 
 
+async def _apply_pragmas(db: aiosqlite.Connection) -> None:
+    # WAL 에서는 synchronous=NORMAL 이어도 커밋된 트랜잭션이 깨지지 않는다 (전원 장애 시 마지막 커밋만 유실 가능).
+    await db.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    await db.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    await db.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    await db.execute("PRAGMA busy_timeout = 5000")
+    await db.execute("PRAGMA temp_store = MEMORY")
+
+
+async def _get_read_pool() -> "asyncio.Queue[aiosqlite.Connection] | None":
+    """읽기 전용 커넥션 풀 (인메모리 DB 거나 풀 크기가 0 이면 None)"""
+    global _read_pool
+    if _read_pool is not None:
+        return _read_pool
+    if DB_PATH == ":memory:" or DB_READ_POOL_SIZE <= 0:
+        return None
+
+    # 스키마 / WAL 전환이 끝난 뒤에 읽기 커넥션을 연다.
+    await get_db()
+    async with _open_lock:
+        if _read_pool is None:
+            uri = pathlib.Path(DB_PATH).absolute().as_uri() + "?mode=ro"
+            pool: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+            for _ in range(DB_READ_POOL_SIZE):
+                reader = await aiosqlite.connect(uri, uri=True)
+                reader.row_factory = aiosqlite.Row
+                await _apply_pragmas(reader)
+                await reader.execute("PRAGMA query_only = ON")
+                _readers.append(reader)
+                pool.put_nowait(reader)
+            _read_pool = pool
+    return _read_pool
+
+
+@asynccontextmanager
+async def read_db() -> AsyncIterator[aiosqlite.Connection]:
+    """
+    읽기 전용 조회용 커넥션을 빌려준다. (커밋된 데이터만 보인다)
+    사용 예)
+        async with read_db() as db:
+            cur = await db.execute("SELECT ...")
+    """
+    pool = await _get_read_pool()
+    if pool is None:
+        yield await get_db()
+        return
+
+    reader = await pool.get()
+    try:
+        yield reader
+    finally:
+        pool.put_nowait(reader)
+
+
+@asynccontextmanager
+async def read_snapshot() -> AsyncIterator[aiosqlite.Connection]:
+    """
+    여러 쿼리로 나눠 읽어도 모두 같은 시점의 데이터가 보이는 읽기 전용 커넥션. (대사 / 긴 집계용)
+    WAL 읽기 트랜잭션이라 그 사이의 쓰기 커밋을 막지 않는다.
+    읽기 풀이 없으면 read_db() 와 같다. (쓰기 커넥션을 쓰므로 스냅샷은 보장되지 않음)
+    """
+    pool = await _get_read_pool()
+    if pool is None:
+        yield await get_db()
+        return
+
+    reader = await pool.get()
+    try:
+        await reader.execute("BEGIN")
+        try:
+            yield reader
+        finally:
+            await reader.execute("ROLLBACK")
+    finally:
+        pool.put_nowait(reader)
+
+
+# ─────────────────────────────────────────────
+# 쓰기 트랜잭션 (unit of work) + 그룹 커밋
+# ─────────────────────────────────────────────
+
+class Transaction:
+    """
+    transaction() 이 넘겨주는 작업 단위.
+    블록 안의 모든 쓰기는 이 객체로 실행하고, 블록이 끝나면 한 번에 커밋된다.
+    """
+
+    __slots__ = ("db", "_on_commit")
+
+    def __init__(self, db: aiosqlite.Connection) -> None:
+        self.db = db
+        self._on_commit: list[Callable[[], None]] = []
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> aiosqlite.Cursor:
+        return await self.db.execute(sql, params)
+
+    async def executemany(
+        self, sql: str, seq_of_params: Iterable[Sequence[Any]]
+    ) -> aiosqlite.Cursor:
+        return await self.db.executemany(sql, seq_of_params)
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """커밋(fsync)까지 끝난 뒤에 실행할 콜백 등록 (롤백되면 실행되지 않음)"""
+        self._on_commit.append(callback)
+
+    def _committed(self) -> None:
+        # 콜백(과 콜백이 시작하는 태스크)이 이미 커밋된 이 트랜잭션에 "합류"하지 않도록
+        # 현재 트랜잭션이 없는 상태로 실행한다.
+        token = _current_tx.set(None)
+        try:
+            for callback in self._on_commit:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("on_commit 콜백 예외")
+        finally:
+            _current_tx.reset(token)
+
+
+_current_tx: ContextVar[Transaction | None] = ContextVar("db_current_tx", default=None)
+
+# 그룹 커밋 상태: 열린 SQLite 트랜잭션 1개에 여러 작업 단위를 SAVEPOINT 로 쌓았다가 한 번에 커밋
+_batch_open = False
+_batch: list[tuple["asyncio.Future[None]", Transaction]] = []
+_flush_task: "asyncio.Task[None] | None" = None
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[Transaction]:
+    """
+    여러 쓰기를 원자적으로 묶는 작업 단위. 블록이 정상 종료되면 커밋 1회, 예외면 전부 롤백.
+        async with transaction() as tx:
+            await tx.execute("UPDATE ...")
+            await tx.execute("INSERT ...")
+    - 이미 트랜잭션 안이면 바깥 트랜잭션에 합류한다. (커밋은 가장 바깥에서 1회)
+    - DB_GROUP_COMMIT_MS > 0 이면 그 시간 안에 끝난 작업 단위들을 fsync 1회로 함께 커밋하고,
+      블록을 빠져나가는 시점은 실제 커밋이 끝난 뒤다.
+    - 블록 안에서 네트워크 호출 등 오래 걸리는 작업을 하면 모든 쓰기가 그동안 멈춘다.
+    """
+    global _batch_open
+
+    outer = _current_tx.get()
+    if outer is not None:
+        yield outer
+        return
+
+    db = await get_db()
+    tx = Transaction(db)
+    grouped = DB_GROUP_COMMIT_MS > 0
+    waiter: "asyncio.Future[None] | None" = None
+    token = _current_tx.set(tx)
+    try:
+        async with _write_lock:
+            if grouped:
+                if not _batch_open:
+                    await db.execute("BEGIN IMMEDIATE")
+                    _batch_open = True
+                await db.execute("SAVEPOINT uow")
+            else:
+                await db.execute("BEGIN IMMEDIATE")
+
+            try:
+                yield tx
+            except BaseException:
+                if grouped:
+                    await db.execute("ROLLBACK TO uow")
+                    await db.execute("RELEASE uow")
+                    if not _batch:
+                        # 같은 배치에 커밋을 기다리는 작업이 없으면 열린 트랜잭션도 정리
+                        await db.rollback()
+                        _batch_open = False
+                else:
+                    await db.rollback()
+                raise
+
+            if grouped:
+                await db.execute("RELEASE uow")
+                waiter = asyncio.get_running_loop().create_future()
+                _batch.append((waiter, tx))
+            else:
+                await db.commit()
+    finally:
+        _current_tx.reset(token)
+
+    if waiter is not None:
+        # flush 태스크는 만드는 시점의 컨텍스트를 복사하므로, tx 를 되돌린 뒤에 만든다.
+        _schedule_flush()
+        await waiter
+    else:
+        tx._committed()
+
+
+def _schedule_flush() -> None:
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_batch())
+
+
+async def _flush_batch() -> None:
+    """그룹 커밋: 창(DB_GROUP_COMMIT_MS)이 지나면 쌓인 작업 단위를 한 번에 커밋"""
+    global _batch_open
+    await asyncio.sleep(DB_GROUP_COMMIT_MS / 1000)
+    async with _write_lock:
+        batch = list(_batch)
+        _batch.clear()
+        db = await get_db()
+        try:
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            for waiter, _ in batch:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        finally:
+            _batch_open = False
+
+    for waiter, tx in batch:
+        tx._committed()
+        if not waiter.done():
+            waiter.set_result(None)
+
+
 async def init_db(db: aiosqlite.Connection) -> None:
     """
-    필요한 테이블들을 생성한다.
+    schema_version 기준으로 아직 적용되지 않은 마이그레이션만 순서대로 적용한다.
+    - 마이그레이션 1개 = 트랜잭션 1개 (실패하면 해당 버전은 롤백되고 예외를 그대로 던진다)
+    - 이미 최신이면 SELECT 1번으로 끝난다.
     """
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    await db.commit()
+
+    cur = await db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    row = await cur.fetchone()
+    current = int(row[0]) if row is not None else 0
+
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        started = time.perf_counter()
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            await migrate(db)
+            await db.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (version, name),
+            )
+        except Exception:
+            await db.rollback()
+            raise
+        await db.commit()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "migration 적용 완료",
+            extra={"version": version, "migration": name, "duration_ms": round(elapsed_ms, 1)},
+        )
+
+
+async def _columns(db: aiosqlite.Connection, table: str) -> set[str]:
+    cur = await db.execute(f"PRAGMA table_info({table})")
+    return {str(r[1]) for r in await cur.fetchall()}
+
+
+# ─────────────────────────────────────────────
+# 마이그레이션 (버전 순서대로, 이미 적용된 DB 에서도 안전하게 재실행 가능해야 함)
+# ─────────────────────────────────────────────
+
+async def _m001_base_tables(db: aiosqlite.Connection) -> None:
+    """기본 테이블 생성"""
     # users: 유저별 내부 잔액 및 통계
     await db.execute(
         """
@@ -47,13 +373,16 @@ async def init_db(db: aiosqlite.Connection) -> None:
         CREATE TABLE IF NOT EXISTS rr_games (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             channel_id INTEGER NOT NULL,
-            status TEXT NOT NULL,              -- waiting, playing, finished
+            host_user_id INTEGER NOT NULL,     -- 게임 생성자 discord_user_id
+            status TEXT NOT NULL,              -- WAITING, RUNNING, FINISHED, CANCELLED
             entry_fee INTEGER NOT NULL,        -- 참가비 (sats)
             max_players INTEGER NOT NULL,
             bullet_count INTEGER NOT NULL,
             current_turn_index INTEGER NOT NULL DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
         )
         """
     )
@@ -64,19 +393,278 @@ async def init_db(db: aiosqlite.Connection) -> None:
         CREATE TABLE IF NOT EXISTS rr_players (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             game_id INTEGER NOT NULL,
-            discord_user_id INTEGER NOT NULL,
-            is_alive INTEGER NOT NULL DEFAULT 1,
+            user_id INTEGER NOT NULL,          -- discord_user_id
+            order_index INTEGER NOT NULL,      -- 1부터 시작하는 순번
+            alive INTEGER NOT NULL DEFAULT 1,
             joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (game_id) REFERENCES rr_games (id)
         )
         """
     )
 
-    await db.commit()
+    # 러시안 룰렛 진행 상태 (게임당 1행)
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rr_state (
+            game_id INTEGER PRIMARY KEY,
+            current_turn INTEGER NOT NULL,     -- 현재 차례 order_index
+            cylinder TEXT NOT NULL,            -- 예) '001000'
+            round_number INTEGER NOT NULL DEFAULT 0,
+            shot_in_round INTEGER NOT NULL DEFAULT 0,
+            last_action_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (game_id) REFERENCES rr_games (id)
+        )
+        """
+    )
+
+
+async def _m002_legacy_rr_columns(db: aiosqlite.Connection) -> None:
+    """
+    예전 init_db 로 만들어진 DB 를 코드가 실제로 쓰는 스키마로 맞춘다.
+    - rr_games: host_user_id / started_at / finished_at 추가
+    - rr_players(discord_user_id, is_alive) -> rr_players(user_id, order_index, alive) 재구성
+    """
+    game_columns = await _columns(db, "rr_games")
+    if "host_user_id" not in game_columns:
+        await db.execute(
+            "ALTER TABLE rr_games ADD COLUMN host_user_id INTEGER NOT NULL DEFAULT 0"
+        )
+    for column in ("started_at", "finished_at"):
+        if column not in game_columns:
+            await db.execute(f"ALTER TABLE rr_games ADD COLUMN {column} TIMESTAMP")
+
+    player_columns = await _columns(db, "rr_players")
+    if "discord_user_id" not in player_columns:
+        return
+
+    # discord_user_id 가 NOT NULL 이라 ALTER 로는 맞출 수 없으므로 테이블을 다시 만든다.
+    has = player_columns.__contains__
+    user_expr = "COALESCE(user_id, discord_user_id)" if has("user_id") else "discord_user_id"
+    alive_expr = "COALESCE(alive, is_alive)" if has("alive") else "is_alive"
+    order_expr = "order_index" if has("order_index") else "NULL"
+    await db.execute("ALTER TABLE rr_players RENAME TO rr_players_legacy")
+    await db.execute(
+        """
+        CREATE TABLE rr_players (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,          -- discord_user_id
+            order_index INTEGER NOT NULL,      -- 1부터 시작하는 순번
+            alive INTEGER NOT NULL DEFAULT 1,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (game_id) REFERENCES rr_games (id)
+        )
+        """
+    )
+    # order_index 가 없던 행은 같은 게임 안에서의 참가 순서(id 순)로 채운다.
+    await db.execute(
+        f"""
+        INSERT INTO rr_players (id, game_id, user_id, order_index, alive, joined_at)
+        SELECT
+            l.id, l.game_id, {user_expr},
+            COALESCE(
+                {order_expr},
+                (SELECT COUNT(*) FROM rr_players_legacy l2
+                 WHERE l2.game_id = l.game_id AND l2.id <= l.id)
+            ),
+            COALESCE({alive_expr}, 1),
+            l.joined_at
+        FROM rr_players_legacy l
+        """
+    )
+    await db.execute("DROP TABLE rr_players_legacy")
+
+
+async def _m003_rr_indexes(db: aiosqlite.Connection) -> None:
+    """핫패스 인덱스 (users.discord_user_id 는 UNIQUE 로 이미 인덱스가 있음)"""
+    # UNIQUE(game_id, user_id) 를 만들기 전에, 예전 경쟁 상태로 생긴 중복 좌석은 먼저 온 1개만 남긴다.
+    await db.execute(
+        """
+        DELETE FROM rr_players
+        WHERE id NOT IN (SELECT MIN(id) FROM rr_players GROUP BY game_id, user_id)
+        """
+    )
+    for statement in INDEXES:
+        await db.execute(statement)
+
+
+async def _m004_ledger(db: aiosqlite.Connection) -> None:
+    """
+    잔액 변동 원장 (append-only). users.balance 는 원장 합계의 구체화(materialized) 값.
+    기존 잔액은 'opening' 항목으로 옮겨서 원장 합계 = 잔액이 되도록 맞춘다.
+    """
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,             -- 증감 sats (+ 입금/상금, - 출금/참가비)
+            balance_after INTEGER NOT NULL,      -- 반영 후 잔액
+            reason TEXT NOT NULL,                -- opening, deposit, withdraw, rr_entry, rr_prize, ...
+            ref TEXT,                            -- payment_hash, game_id, 출금 ID 등
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    await db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_ledger_user
+        ON ledger (discord_user_id, id)
+        """
+    )
+    await db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_ledger_reason_ref
+        ON ledger (reason, ref)
+        """
+    )
+    await db.execute(
+        """
+        INSERT INTO ledger (discord_user_id, amount, balance_after, reason)
+        SELECT discord_user_id, balance, balance, 'opening'
+        FROM users
+        WHERE balance != 0
+          AND NOT EXISTS (SELECT 1 FROM ledger l WHERE l.discord_user_id = users.discord_user_id)
+        """
+    )
+
+
+async def _m005_pending_invoices(db: aiosqlite.Connection) -> None:
+    """
+    입금 인보이스 (재시작 후 감시 재개 + payment_hash 기준 1회만 입금 반영)
+    status: PENDING -> PAID / EXPIRED
+    """
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pending_invoices (
+            payment_hash TEXT PRIMARY KEY,
+            discord_user_id INTEGER NOT NULL,
+            payment_request TEXT NOT NULL,
+            amount_sats INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            expires_at INTEGER NOT NULL,         -- unix 초
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            settled_at TIMESTAMP
+        )
+        """
+    )
+    await db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_pending_invoices_status
+        ON pending_invoices (status, expires_at)
+        """
+    )
+
+
+async def _m006_withdrawals(db: aiosqlite.Connection) -> None:
+    """
+    출금 요청 (잔액은 요청 시점에 먼저 차감해 두고, 결제 결과에 따라 확정 / 환불)
+    status: PENDING(대기) -> SENDING(Blink 전송) -> SUCCESS / FAILED(환불 완료)
+    """
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS withdrawals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_user_id INTEGER NOT NULL,
+            payment_hash TEXT NOT NULL UNIQUE,
+            payment_request TEXT NOT NULL,
+            amount_sats INTEGER NOT NULL,
+            memo TEXT NOT NULL DEFAULT '',
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            attempts INTEGER NOT NULL DEFAULT 0,   -- Blink 전송 시도 횟수
+            blink_status TEXT,                     -- 마지막 lnInvoicePaymentSend status
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    await db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_withdrawals_status
+        ON withdrawals (status, id)
+        """
+    )
+
+
+async def _m007_reconciliations(db: aiosqlite.Connection) -> None:
+    """
+    지갑 대사 기록: 내부 부채(잔액 + 게임 판돈 + 출금 hold)와 Blink 지갑 잔액 비교 결과
+    status: OK / DRIFT / SHORTFALL / ERROR (마지막 OK 가 다음 대사의 기준점)
+    """
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reconciliations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL,
+            wallet_balance INTEGER,                 -- Blink 지갑 잔액 (조회 실패 시 NULL)
+            user_balances INTEGER NOT NULL,         -- SUM(users.balance)
+            users INTEGER NOT NULL,
+            negative_users INTEGER NOT NULL,        -- 잔액이 음수인 유저 수
+            locked_in_games INTEGER NOT NULL,       -- WAITING / RUNNING 게임 참가비 합계
+            active_games INTEGER NOT NULL,
+            withdrawal_holds INTEGER NOT NULL,      -- PENDING / SENDING 출금 합계
+            in_flight INTEGER NOT NULL,             -- 그중 SENDING (지갑에서 이미 빠졌을 수 있음)
+            drift INTEGER,                          -- 지갑 잔액 - 부채 합계
+            unexplained INTEGER,                    -- 기준점 이후 원장으로 설명되지 않는 drift 변화
+            ledger_max_id INTEGER NOT NULL,
+            baseline_id INTEGER,                    -- 비교한 직전 OK 대사 ID
+            error TEXT,
+            duration_ms REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    await db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_reconciliations_status
+        ON reconciliations (status, id)
+        """
+    )
+
+
+MIGRATIONS: tuple[tuple[int, str, Callable[[aiosqlite.Connection], Awaitable[None]]], ...] = (
+    (1, "base_tables", _m001_base_tables),
+    (2, "legacy_rr_columns", _m002_legacy_rr_columns),
+    (3, "rr_indexes", _m003_rr_indexes),
+    (4, "ledger", _m004_ledger),
+    (5, "pending_invoices", _m005_pending_invoices),
+    (6, "withdrawals", _m006_withdrawals),
+    (7, "reconciliations", _m007_reconciliations),
+)
+
+
+async def check_query_plans(
+    db: aiosqlite.Connection,
+    statements: Sequence[tuple[str, str]] = HOT_PATH_QUERIES,
+) -> None:
+    """
+    핫패스 쿼리(queries.HOT_PATH_QUERIES) 전체에 EXPLAIN QUERY PLAN 을 실행해서,
+    하나라도 테이블/인덱스 전체 SCAN 을 하면 RuntimeError 를 던진다.
+    (tests/test_query_plans.py 에서 검사, 운영에서는 DB_CHECK_QUERY_PLANS=1 로 시작 시 검사)
+    """
+    offenders: list[str] = []
+    for name, sql in statements:
+        params = (None,) * sql.count("?")
+        cur = await db.execute("EXPLAIN QUERY PLAN " + sql, params)
+        for row in await cur.fetchall():
+            detail = str(row[3])
+            if detail.startswith("SCAN"):
+                offenders.append(f"{name}: {detail}")
+
+    if offenders:
+        raise RuntimeError("핫패스 쿼리가 전체 스캔을 합니다:\n" + "\n".join(offenders))
 
 
 async def close_db() -> None:
-    global _db
+    global _db, _read_pool
+    # 그룹 커밋 대기 중인 작업이 있으면 먼저 커밋
+    if _flush_task is not None and not _flush_task.done():
+        await _flush_task
+    for reader in _readers:
+        await reader.close()
+    _readers.clear()
+    _read_pool = None
     if _db is not None:
         await _db.close()
         _db = None
@@ -0,0 +1,121 @@
+# deadlines.py
+import asyncio
+import heapq
+import itertools
+from typing import Any, Awaitable, Callable, Hashable
+
+from log import get_logger
+
+logger = get_logger("deadlines")
+
+ExpireCallback = Callable[[list[Any]], Awaitable[None]]
+
+
+class DeadlineScheduler:
+    """
+    여러 키(게임/채널 등)의 만료 시각을 힙 하나로 관리하는 스케줄러.
+    - schedule(): 만료 시각 등록 / 연장, O(log n)
+    - cancel(): 만료 취소, O(1) (힙에서는 지연 삭제)
+    - 코루틴 1개가 가장 가까운 만료 시각까지만 잠들었다가,
+      지난 키들을 한 번에 모아서 on_expire(keys) 로 넘긴다.
+    """
+
+    def __init__(self, on_expire: ExpireCallback, *, name: str = "deadlines") -> None:
+        self._on_expire = on_expire
+        self._name = name
+        # (deadline, seq, key) - 같은 키의 예전 항목은 _deadlines 와 비교해서 버린다.
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._deadlines: dict[Hashable, float] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[Any] | None = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def deadline(self, key: Hashable) -> float | None:
+        return self._deadlines.get(key)
+
+    def schedule(self, key: Hashable, delay: float) -> None:
+        """key 의 만료 시각을 지금부터 delay 초 뒤로 설정 (이미 있으면 덮어씀)"""
+        self.schedule_at(key, asyncio.get_running_loop().time() + delay)
+
+    def schedule_at(self, key: Hashable, when: float) -> None:
+        """key 의 만료 시각을 loop.time() 기준 절대 시각 when 으로 설정"""
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._seq), key))
+        self._compact()
+        # 새 항목이 가장 빠른 만료라면 잠들어 있는 러너를 깨운다.
+        if self._heap[0][2] == key and self._heap[0][0] == when:
+            self._wakeup.set()
+        self._ensure_running()
+
+    def cancel(self, key: Hashable) -> None:
+        self._deadlines.pop(key, None)
+
+    def start(self) -> None:
+        self._ensure_running()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------------- 내부 ----------------
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self._name)
+
+    def _compact(self) -> None:
+        # 연장(재등록)이 많으면 죽은 항목이 쌓이므로, 살아있는 항목의 2배를 넘으면 재구성
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._deadlines):
+            self._heap = [
+                entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]
+            ]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> list[Hashable]:
+        due: list[Hashable] = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            when, _, key = heapq.heappop(heap)
+            if self._deadlines.get(key) == when:
+                del self._deadlines[key]
+                due.append(key)
+        return due
+
+    def _next_delay(self, now: float) -> float | None:
+        heap = self._heap
+        # 맨 앞의 지연 삭제된 항목 정리
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return max(0.0, heap[0][0] - now)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = self._pop_due(loop.time())
+            if due:
+                try:
+                    await self._on_expire(due)
+                except Exception:
+                    # 콜백 오류로 스케줄러 전체가 멈추지 않도록 보호
+                    logger.exception("on_expire 예외", extra={"scheduler": self._name})
+                continue
+
+            delay = self._next_delay(loop.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,319 @@
+# deposit_watcher.py
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from blink_client_rr import PAID_STATUSES, BlinkError, BlinkSubscriber, check_payments
+from config import (
+    BLINK_WS_ENABLED,
+    DEPOSIT_EXPIRE_GRACE_SEC,
+    DEPOSIT_POLL_BATCH_SIZE,
+    DEPOSIT_POLL_INTERVAL,
+    DEPOSIT_TIMEOUT_SECONDS,
+)
+from locks import user_locks
+from log import get_logger
+from models_invoice import expire_invoices, settle_invoice
+
+logger = get_logger("deposit")
+
+PaidCallback = Callable[[int], Awaitable[None]]     # 인자: 입금 반영 후 잔액
+ExpiredCallback = Callable[[], Awaitable[None]]
+
+
+class PendingDeposit:
+    """결제를 기다리는 입금 인보이스 1건"""
+
+    __slots__ = (
+        "payment_hash",
+        "payment_request",
+        "amount_sats",
+        "user_id",
+        "expires_at",
+        "on_paid",
+        "on_expired",
+    )
+
+    def __init__(
+        self,
+        payment_hash: str,
+        payment_request: str,
+        amount_sats: int,
+        user_id: int,
+        expires_at: float,
+        on_paid: Optional[PaidCallback],
+        on_expired: Optional[ExpiredCallback],
+    ) -> None:
+        self.payment_hash = payment_hash
+        self.payment_request = payment_request
+        self.amount_sats = amount_sats
+        self.user_id = user_id
+        self.expires_at = expires_at      # unix 초 (재시작 후에도 그대로 이어서 사용)
+        self.on_paid = on_paid
+        self.on_expired = on_expired
+
+
+class DepositWatcher:
+    """
+    대기중인 입금 인보이스 전체를 코루틴 1개로 감시한다.
+    - 주기(DEPOSIT_POLL_INTERVAL)마다 대기중 인보이스를 묶어서
+      check_payments() 로 조회하므로, 입금 건수가 늘어도 Blink 요청 수는 거의 일정하다.
+    - 결제가 확인되면 잔액을 올리고 on_paid(new_balance) 를 호출,
+      만료되면 on_expired() 를 호출하고 감시 목록에서 뺀다.
+    - 만료는 만료 시각이 지난 뒤의 조회에 성공해서 미결제로 확인된 인보이스만 처리한다.
+      조회가 실패하면 성공할 때까지 다음 주기에 다시 조회한다. (만료 직전 결제를 놓치지 않도록)
+    - 입금 반영 / 만료는 pending_invoices 테이블 상태로 처리하므로 같은 인보이스가
+      두 번 입금되지 않고, 재시작 후에도 테이블에서 감시를 이어갈 수 있다.
+    - push(BlinkSubscriber)가 주어지면 myUpdates 구독으로 결제를 바로 반영하고,
+      소켓이 끊겨 있는 동안에만 폴링한다. 재접속 직후에는 1회 폴링해서 놓친 결제를 보충한다.
+      연결되어 있어도 만료 시각이 지난 인보이스는 만료 전에 한 번 더 조회한다.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = DEPOSIT_POLL_INTERVAL,
+        batch_size: int = DEPOSIT_POLL_BATCH_SIZE,
+        expire_grace: float = DEPOSIT_EXPIRE_GRACE_SEC,
+        push: Optional[BlinkSubscriber] = None,
+        name: str = "deposit-watcher",
+    ) -> None:
+        self._interval = interval
+        self._batch_size = max(1, batch_size)
+        self._expire_grace = expire_grace
+        self._name = name
+        self._pending: dict[str, PendingDeposit] = {}   # payment_hash -> 입금 건
+        self._task: asyncio.Task[Any] | None = None
+        self._push = push
+        self._push_started = False
+        self._push_setup: asyncio.Task[Any] | None = None
+        self._polls = 0          # Blink 조회 요청 수
+        self._pushed = 0         # push 로 확인된 입금 건수
+        self._credited = 0       # 입금 반영 건수
+        self._expired = 0        # 만료 건수
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, payment_hash: str) -> bool:
+        return payment_hash in self._pending
+
+    def watch(
+        self,
+        payment_hash: str,
+        payment_request: str,
+        amount_sats: int,
+        user_id: int,
+        *,
+        on_paid: Optional[PaidCallback] = None,
+        on_expired: Optional[ExpiredCallback] = None,
+        timeout: float = DEPOSIT_TIMEOUT_SECONDS,
+        expires_at: Optional[float] = None,
+    ) -> None:
+        """
+        인보이스를 감시 목록에 추가 (같은 payment_hash 는 한 번만 감시)
+        pending_invoices 에 먼저 기록된 인보이스여야 입금이 반영된다.
+        만료 시각은 expires_at(unix 초)이 있으면 그대로, 없으면 지금 + timeout.
+        """
+        if payment_hash in self._pending:
+            return
+        self._pending[payment_hash] = PendingDeposit(
+            payment_hash=payment_hash,
+            payment_request=payment_request,
+            amount_sats=amount_sats,
+            user_id=user_id,
+            expires_at=expires_at if expires_at is not None else time.time() + timeout,
+            on_paid=on_paid,
+            on_expired=on_expired,
+        )
+        self._ensure_running()
+
+    def unwatch(self, payment_hash: str) -> None:
+        self._pending.pop(payment_hash, None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "polls": self._polls,
+            "pushed": self._pushed,
+            "push_connected": int(self._push is not None and self._push.connected),
+            "credited": self._credited,
+            "expired": self._expired,
+        }
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._push is not None:
+            await self._push.close()
+            self._push_started = False
+
+    # ---------------- 내부 ----------------
+
+    def _ensure_running(self) -> None:
+        if self._push is not None and not self._push_started:
+            self._push_started = True
+            self._push.add_reconnect_listener(self._poll_all)
+            self._push.start()
+            # 아직 연결 전이라 등록만 되고, 연결(재접속 포함)될 때마다 전송된다.
+            self._push_setup = asyncio.create_task(
+                self._push.subscribe_my_updates(self._on_update)
+            )
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self._name)
+
+    async def _run(self) -> None:
+        # 감시할 인보이스가 없으면 루프를 끝내고, 다음 watch() 때 다시 시작한다.
+        while self._pending:
+            await asyncio.sleep(self._interval)
+            try:
+                await self._tick()
+            except Exception:
+                # 한 주기의 오류로 감시 전체가 멈추지 않도록 보호
+                logger.exception("tick 예외", extra={"watcher": self._name})
+
+    async def _tick(self) -> None:
+        """한 주기: 대기중 인보이스 조회 → 결제된 건 입금 반영 → 미결제로 확인된 만료 건 정리"""
+        now = time.time()
+        entries = list(self._pending.values())
+        if self._push is not None and self._push.connected:
+            # push 가 살아있으면 결제는 구독으로 들어오므로, 만료 시각이 지난 건만 마지막으로 조회한다.
+            entries = [e for e in entries if e.expires_at <= now]
+            if not entries:
+                return
+        unpaid = await self._poll(entries)
+        await self._expire(unpaid, now)
+
+    async def _on_update(self, update: dict[str, Any]) -> None:
+        """myUpdates 구독 이벤트: 감시 중인 인보이스가 결제되었으면 바로 반영"""
+        entry = self._pending.get(str(update.get("paymentHash")))
+        if entry is not None and update.get("status") in PAID_STATUSES:
+            self._pushed += 1
+            await self._credit(entry)
+
+    async def _poll_all(self) -> None:
+        """소켓 재접속 직후: 끊겨 있던 동안 놓친 결제 보충"""
+        await self._poll(list(self._pending.values()))
+
+    async def _poll(self, entries: list[PendingDeposit]) -> dict[str, str]:
+        """
+        entries 의 결제 상태를 batch_size 개씩 묶어 조회하고, 결제된 건은 입금 반영한다.
+        반환: 조회에 성공했고 결제되지 않은 인보이스의 payment_hash -> Blink 상태
+        (조회에 실패한 배치 / 항목은 빠지므로 만료 처리되지 않는다)
+        """
+        unpaid: dict[str, str] = {}
+        started = time.perf_counter()
+        paid_total = 0
+        for start in range(0, len(entries), self._batch_size):
+            chunk = entries[start:start + self._batch_size]
+            self._polls += 1
+            try:
+                statuses = await check_payments([e.payment_request for e in chunk])
+            except BlinkError as e:
+                logger.warning(
+                    "check_payments 실패",
+                    extra={
+                        "watcher": self._name,
+                        "batch": len(chunk),
+                        "error": str(e),
+                        "sample_key": f"{self._name}:poll_error",
+                    },
+                )
+                continue
+
+            paid: list[PendingDeposit] = []
+            for entry in chunk:
+                status = statuses.get(entry.payment_request)
+                if status in PAID_STATUSES:
+                    paid.append(entry)
+                elif status is not None:
+                    unpaid[entry.payment_hash] = status
+            if paid:
+                paid_total += len(paid)
+                await asyncio.gather(*(self._credit(e) for e in paid))
+
+        if logger.isEnabledFor(logging.DEBUG):
+            fields: dict[str, Any] = {
+                "watcher": self._name,
+                "pending": len(entries),
+                "paid": paid_total,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            if not paid_total:
+                # 주기마다 반복되므로 결제 확인이 없었던 주기는 샘플링
+                fields["sample_key"] = f"{self._name}:poll"
+            logger.debug("입금 상태 조회", extra=fields)
+        return unpaid
+
+    async def _expire(self, unpaid: dict[str, str], now: float) -> None:
+        """
+        만료 시각이 지났고 방금 조회에서 미결제로 확인된(unpaid) 인보이스만 만료 처리한다.
+        Blink 가 아직 PENDING 이라고 하면 expire_grace 초 동안 더 감시한다.
+        """
+        expired: list[PendingDeposit] = []
+        for payment_hash, status in unpaid.items():
+            entry = self._pending.get(payment_hash)
+            if entry is None or entry.expires_at > now:
+                continue
+            if status == "PENDING" and now < entry.expires_at + self._expire_grace:
+                continue
+            expired.append(entry)
+        if not expired:
+            return
+        # DB 에 기록된 뒤에만 목록에서 뺀다. (실패하면 다음 주기에 다시 조회 / 만료)
+        await expire_invoices([e.payment_hash for e in expired])
+        expired = [e for e in expired if self._pending.pop(e.payment_hash, None) is e]
+        self._expired += len(expired)
+        await asyncio.gather(*(self._notify_expired(e) for e in expired))
+
+    async def _credit(self, entry: PendingDeposit) -> None:
+        if self._pending.get(entry.payment_hash) is not entry:
+            return
+
+        # 같은 인보이스를 동시에 반영해도 settle_invoice 가 status = 'PENDING' 조건으로 한 번만 입금한다.
+        try:
+            async with user_locks.hold(entry.user_id):
+                new_balance = await settle_invoice(entry.payment_hash)
+        except Exception:
+            # 커밋되지 않았으므로 목록에 남겨두고 다음 조회에서 다시 반영한다.
+            logger.exception(
+                "입금 반영 실패", extra={"watcher": self._name, "payment_hash": entry.payment_hash}
+            )
+            return
+        self._pending.pop(entry.payment_hash, None)
+        if new_balance is None:
+            # 이미 다른 경로(재시작 전 실행 등)에서 반영된 인보이스
+            return
+        self._credited += 1
+        logger.info(
+            "입금 반영",
+            extra={
+                "user_id": entry.user_id,
+                "amount_sats": entry.amount_sats,
+                "payment_hash": entry.payment_hash,
+            },
+        )
+
+        if entry.on_paid is not None:
+            try:
+                await entry.on_paid(new_balance)
+            except Exception:
+                logger.exception("on_paid 예외", extra={"watcher": self._name})
+
+    async def _notify_expired(self, entry: PendingDeposit) -> None:
+        if entry.on_expired is None:
+            return
+        try:
+            await entry.on_expired()
+        except Exception:
+            logger.exception("on_expired 예외", extra={"watcher": self._name})
+
+
+# 여러 Cog 에서 같은 감시 루프를 공유하도록 모듈 단위 싱글톤으로 둔다.
+deposit_watcher = DepositWatcher(push=BlinkSubscriber() if BLINK_WS_ENABLED else None)
@@ -0,0 +1,92 @@
+# locks.py
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+
+class LockStats:
+    """락 대기 시간 통계"""
+
+    __slots__ = ("acquired", "contended", "total_wait", "max_wait")
+
+    def __init__(self) -> None:
+        self.acquired = 0        # 획득 횟수
+        self.contended = 0       # 다른 코루틴이 잡고 있어서 기다린 횟수
+        self.total_wait = 0.0    # 누적 대기 시간 (초)
+        self.max_wait = 0.0      # 최대 대기 시간 (초)
+
+    def record(self, waited: float, contended: bool) -> None:
+        self.acquired += 1
+        if contended:
+            self.contended += 1
+        self.total_wait += waited
+        if waited > self.max_wait:
+            self.max_wait = waited
+
+    def as_dict(self) -> dict[str, float]:
+        avg = self.total_wait / self.acquired if self.acquired else 0.0
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "avg_wait_ms": avg * 1000,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class KeyedLocks:
+    """
+    키(채널 ID, 유저 ID 등)별 asyncio.Lock 레지스트리.
+    - 락 객체는 WeakValueDictionary 로 보관하므로, 아무도 잡고 있지 않은 키는
+      GC 와 함께 자동으로 사라진다.
+    - hold() 로 획득한 경우 대기 시간이 stats 에 누적된다.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._locks: "weakref.WeakValueDictionary[Hashable, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._stats = LockStats()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def get(self, key: Hashable) -> asyncio.Lock:
+        """키에 해당하는 락 반환 (없으면 생성). 반환값을 들고 있는 동안은 유지된다."""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    @asynccontextmanager
+    async def hold(self, *keys: Hashable) -> AsyncIterator[None]:
+        """
+        하나 이상의 키를 잠근다.
+        여러 키를 함께 잡을 때는 정렬된 순서로 획득해서 교착 상태를 막는다.
+        """
+        locks = [self.get(key) for key in sorted(set(keys), key=repr)]
+        acquired: list[asyncio.Lock] = []
+        try:
+            for lock in locks:
+                contended = lock.locked()
+                started = time.perf_counter()
+                await lock.acquire()
+                acquired.append(lock)
+                self._stats.record(time.perf_counter() - started, contended)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    def stats(self) -> dict[str, float]:
+        data = self._stats.as_dict()
+        data["live_keys"] = len(self._locks)
+        return data
+
+
+# 잔액을 건드리는 경로(참가비 차감, 입금, 출금 등)는 유저별로 직렬화한다.
+# 여러 Cog 가 공유해야 하므로 모듈 단위 싱글톤으로 둔다.
+user_locks = KeyedLocks("user")
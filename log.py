@@ -0,0 +1,172 @@
+# log.py
+"""
+구조화 로깅 설정.
+- 로거에서는 QueueHandler 로 큐에 넣기만 하고, 실제 출력(stderr)은 QueueListener 스레드가 한다.
+  → 이벤트 루프가 stdout/stderr I/O 로 막히지 않는다. 큐가 가득 차면 기다리지 않고 버린다.
+- extra 로 넘긴 필드는 key=value (또는 LOG_JSON=1 이면 JSON 한 줄) 로 붙여서 출력한다.
+      logger.info("blink request", extra={"operation": "lnInvoiceCreate", "duration_ms": 12.3})
+- extra 에 sample_key 가 있으면 같은 key 는 LOG_SAMPLE_SEC 에 한 번만 출력하고,
+  그 사이에 생략한 건수를 다음 줄의 suppressed 필드로 알려준다. (반복되는 폴링 로그용)
+- 라이트닝 인보이스(lnbc...)와 Blink API 키는 출력 전에 가린다.
+"""
+import json
+import logging
+import queue
+import re
+import sys
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from config import BLINK_API_KEY, LOG_JSON, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_SEC
+
+# 인보이스는 앞부분(네트워크 + 금액 정도)만 남긴다.
+_INVOICE_RE = re.compile(r"\b(ln(?:bcrt|tbs|bc|tb|sb)[0-9a-z]{0,10})[0-9a-z]{20,}", re.IGNORECASE)
+_API_KEY_RE = re.compile(r"blink_[A-Za-z0-9]{16,}")
+
+# LogRecord 기본 속성 (이 외의 속성은 extra 로 넘긴 필드로 본다)
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+_INTERNAL_FIELDS = frozenset({"sample_key"})
+
+
+def redact(text: str) -> str:
+    """인보이스 / API 키 가리기"""
+    text = _INVOICE_RE.sub(r"\1…", text)
+    text = _API_KEY_RE.sub("blink_***", text)
+    if BLINK_API_KEY and BLINK_API_KEY in text:
+        text = text.replace(BLINK_API_KEY, "***")
+    return text
+
+
+def _fields(record: logging.LogRecord) -> dict[str, Any]:
+    return {
+        key: value
+        for key, value in record.__dict__.items()
+        if key not in _RECORD_ATTRS and key not in _INTERNAL_FIELDS
+    }
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, json_format: bool = False) -> None:
+        super().__init__(datefmt="%Y-%m-%d %H:%M:%S")
+        self.json_format = json_format
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = _fields(record)
+        if self.json_format:
+            return json.dumps(
+                {
+                    "ts": round(record.created, 3),
+                    "level": record.levelname,
+                    "logger": record.name,
+                    "msg": record.getMessage(),
+                    **fields,
+                },
+                ensure_ascii=False,
+                default=str,
+            )
+        line = (
+            f"{self.formatTime(record, self.datefmt)} {record.levelname:<7} "
+            f"{record.name}: {record.getMessage()}"
+        )
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _SamplingFilter(logging.Filter):
+    """sample_key 별로 interval 초에 한 번만 통과시킨다."""
+
+    def __init__(self, interval: float) -> None:
+        super().__init__()
+        self.interval = interval
+        self._last: dict[str, float] = {}
+        self._suppressed: Counter[str] = Counter()
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None or self.interval <= 0:
+            return True
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last is not None and now - last < self.interval:
+            self._suppressed[key] += 1
+            self.suppressed_total += 1
+            return False
+        self._last[key] = now
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _RedactingQueueHandler(QueueHandler):
+    """메시지를 만든 뒤 가리고 큐에 넣는다. 큐가 가득 차면 버린다. (호출 측을 막지 않음)"""
+
+    def __init__(self, log_queue: "queue.Queue[Any]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.msg = redact(str(record.msg))
+        for key, value in _fields(record).items():
+            if isinstance(value, str):
+                setattr(record, key, redact(value))
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: Optional[_RedactingQueueHandler] = None
+_sampler: Optional[_SamplingFilter] = None
+_listener: Optional[QueueListener] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"lemon.{name}")
+
+
+def setup_logging(level: str = LOG_LEVEL, json_format: bool = LOG_JSON) -> None:
+    """봇 시작 시 1회 호출: 루트 로거를 큐 기반 핸들러로 설정 (다시 호출하면 레벨만 변경)"""
+    global _handler, _sampler, _listener
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _listener is not None:
+        return
+
+    log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = _RedactingQueueHandler(log_queue)
+    _sampler = _SamplingFilter(LOG_SAMPLE_SEC)
+    _handler.addFilter(_sampler)
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(StructuredFormatter(json_format))
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    root.addHandler(_handler)
+
+
+def shutdown_logging() -> None:
+    """봇 종료 시 호출: 큐에 남은 로그를 모두 출력하고 리스너 스레드 정리"""
+    global _handler, _sampler, _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    _handler = _sampler = _listener = None
+
+
+def logging_stats() -> dict[str, int]:
+    return {
+        "queued": _handler.queue.qsize() if _handler is not None else 0,  # type: ignore[attr-defined]
+        "dropped": _handler.dropped if _handler is not None else 0,
+        "suppressed": _sampler.suppressed_total if _sampler is not None else 0,
+    }
@@ -0,0 +1,73 @@
+# models_invoice.py
+from typing import NamedTuple, Optional, Sequence
+
+from db import read_db, transaction
+from models_user import change_balance
+from queries import (
+    INVOICE_EXPIRE,
+    INVOICE_LOAD_PENDING,
+    INVOICE_SETTLE,
+)
+
+
+class PendingInvoice(NamedTuple):
+    payment_hash: str
+    discord_user_id: int
+    payment_request: str
+    amount_sats: int
+    expires_at: int      # unix 초
+
+
+async def add_pending_invoice(
+    payment_hash: str,
+    discord_user_id: int,
+    payment_request: str,
+    amount_sats: int,
+    expires_at: int,
+) -> None:
+    """/deposit 에서 만든 인보이스 기록 (같은 payment_hash 는 무시)"""
+    async with transaction() as tx:
+        await tx.execute(
+            """
+            INSERT INTO pending_invoices (
+                payment_hash, discord_user_id, payment_request, amount_sats, expires_at
+            )
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (payment_hash) DO NOTHING
+            """,
+            (payment_hash, discord_user_id, payment_request, amount_sats, expires_at),
+        )
+
+
+async def load_pending_invoices() -> list[PendingInvoice]:
+    """아직 결제 / 만료 처리되지 않은 인보이스 전체 (재시작 후 감시 재개용)"""
+    async with read_db() as db:
+        cur = await db.execute(INVOICE_LOAD_PENDING)
+        rows = await cur.fetchall()
+    return [
+        PendingInvoice(str(r[0]), int(r[1]), str(r[2]), int(r[3]), int(r[4])) for r in rows
+    ]
+
+
+async def settle_invoice(payment_hash: str) -> Optional[int]:
+    """
+    결제 확인된 인보이스를 PAID 로 바꾸고 입금액을 잔액에 반영한다. (트랜잭션 1개)
+    - status = 'PENDING' 조건으로 바꾸므로, 같은 인보이스를 여러 번 확인해도 한 번만 입금된다.
+    - 반환: 새 잔액 / 이미 처리된(또는 모르는) 인보이스면 None
+    """
+    async with transaction() as tx:
+        cur = await tx.execute(INVOICE_SETTLE, (payment_hash,))
+        row = await cur.fetchone()
+        if row is None:
+            return None
+        return await change_balance(
+            int(row[0]), int(row[1]), reason="deposit", ref=payment_hash
+        )
+
+
+async def expire_invoices(payment_hashes: Sequence[str]) -> None:
+    """결제되지 않고 만료된 인보이스 정리 (이미 PAID 인 건은 그대로 둔다)"""
+    if not payment_hashes:
+        return
+    async with transaction() as tx:
+        await tx.executemany(INVOICE_EXPIRE, [(h,) for h in payment_hashes])
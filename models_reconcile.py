@@ -0,0 +1,206 @@
+# models_reconcile.py
+from typing import NamedTuple, Optional
+
+from db import read_db, read_snapshot, transaction
+from queries import (
+    RECONCILE_GAMES,
+    RECONCILE_HOLDS,
+    RECONCILE_LAST_OK,
+    RECONCILE_LEDGER_MAX_ID,
+    RECONCILE_LEDGER_REASONS,
+    RECONCILE_USERS_BOUND,
+    RECONCILE_USERS_SUM,
+)
+
+# 지갑 잔액도 함께 움직이는 원장 사유 (나머지 사유는 지갑 밖에서 부채만 바꾼다)
+WALLET_REASONS = ("deposit", "withdraw", "withdraw_refund")
+
+_MAX_ROWID = 2**63 - 1
+
+
+class Liabilities(NamedTuple):
+    """같은 시점 스냅샷으로 집계한 내부 부채"""
+    user_balances: int
+    users: int
+    negative_users: int
+    locked_in_games: int      # WAITING / RUNNING 게임에 낸 참가비 합계
+    active_games: int
+    withdrawal_holds: int     # PENDING / SENDING 출금으로 잡아둔 금액
+    in_flight: int            # 그중 SENDING
+    ledger_max_id: int
+
+    @property
+    def total(self) -> int:
+        return self.user_balances + self.locked_in_games + self.withdrawal_holds
+
+
+class Baseline(NamedTuple):
+    """비교 기준이 되는 마지막 OK 대사"""
+    id: int
+    drift: int
+    locked_in_games: int
+    in_flight: int
+    ledger_max_id: int
+
+
+class LedgerReason(NamedTuple):
+    reason: str
+    entries: int      # 건수 (tuple.count 와 겹치지 않는 이름)
+    amount: int
+
+
+class LedgerItem(NamedTuple):
+    id: int
+    discord_user_id: int
+    amount: int
+    reason: str
+    ref: Optional[str]
+    created_at: str
+
+
+async def scan_liabilities(chunk_size: int) -> Liabilities:
+    """
+    users / 진행 중인 게임을 id 기준 keyset 페이지로 나눠 집계한다.
+    - 페이지마다 SQLite 안에서 합계만 내므로 유저 수가 많아도 행을 파이썬으로 가져오지 않는다.
+      (쿼리 사이마다 이벤트 루프에 양보하므로 게임 진행을 막지 않는다)
+    - 하나의 읽기 스냅샷 안에서 읽으므로 스캔 도중 잔액 이동(참가비 등)이 이중으로 잡히지 않는다.
+    """
+    chunk_size = max(1, chunk_size)
+    user_balances = users = negative_users = 0
+    locked_in_games = active_games = 0
+    holds: dict[str, int] = {}
+
+    async with read_snapshot() as db:
+        cur = await db.execute(RECONCILE_LEDGER_MAX_ID)
+        row = await cur.fetchone()
+        ledger_max_id = int(row[0]) if row else 0
+
+        last_id = 0
+        while True:
+            # 페이지 끝 id 를 PK 로 찾고, (last_id, 끝 id] 범위를 SQLite 안에서 합산
+            cur = await db.execute(RECONCILE_USERS_BOUND, (last_id, chunk_size - 1))
+            row = await cur.fetchone()
+            upper = int(row[0]) if row is not None else _MAX_ROWID
+            cur = await db.execute(RECONCILE_USERS_SUM, (last_id, upper))
+            row = await cur.fetchone()
+            if row is not None:
+                users += int(row[0])
+                user_balances += int(row[1])
+                negative_users += int(row[2])
+            if upper == _MAX_ROWID:
+                break
+            last_id = upper
+
+        last_id = 0
+        while True:
+            cur = await db.execute(RECONCILE_GAMES, (last_id, chunk_size))
+            rows = list(await cur.fetchall())
+            for r in rows:
+                locked_in_games += int(r[1]) * int(r[2])
+            active_games += len(rows)
+            if len(rows) < chunk_size:
+                break
+            last_id = int(rows[-1][0])
+
+        cur = await db.execute(RECONCILE_HOLDS)
+        for r in await cur.fetchall():
+            holds[str(r[0])] = int(r[1])
+
+    return Liabilities(
+        user_balances=user_balances,
+        users=users,
+        negative_users=negative_users,
+        locked_in_games=locked_in_games,
+        active_games=active_games,
+        withdrawal_holds=sum(holds.values()),
+        in_flight=holds.get("SENDING", 0),
+        ledger_max_id=ledger_max_id,
+    )
+
+
+async def last_ok_reconciliation() -> Optional[Baseline]:
+    async with read_db() as db:
+        cur = await db.execute(RECONCILE_LAST_OK)
+        row = await cur.fetchone()
+    if row is None:
+        return None
+    return Baseline(int(row[0]), int(row[1]), int(row[2]), int(row[3]), int(row[4]))
+
+
+async def ledger_since(
+    after_id: int,
+    until_id: int,
+    top: int,
+) -> tuple[list[LedgerReason], list[LedgerItem]]:
+    """
+    (after_id, until_id] 구간 원장: 사유별 건수 / 합계, 그리고 지갑과 무관한 항목 중 금액이 큰 순서 top 개
+    """
+    async with read_db() as db:
+        cur = await db.execute(RECONCILE_LEDGER_REASONS, (after_id, until_id))
+        reasons = [LedgerReason(str(r[0]), int(r[1]), int(r[2])) for r in await cur.fetchall()]
+
+        placeholders = ", ".join("?" for _ in WALLET_REASONS)
+        cur = await db.execute(
+            f"""
+            SELECT id, discord_user_id, amount, reason, ref, created_at
+            FROM ledger
+            WHERE id > ? AND id <= ? AND reason NOT IN ({placeholders})
+            ORDER BY ABS(amount) DESC, id DESC
+            LIMIT ?
+            """,
+            (after_id, until_id, *WALLET_REASONS, top),
+        )
+        items = [
+            LedgerItem(
+                int(r[0]), int(r[1]), int(r[2]), str(r[3]),
+                None if r[4] is None else str(r[4]), str(r[5]),
+            )
+            for r in await cur.fetchall()
+        ]
+    return reasons, items
+
+
+async def save_reconciliation(
+    status: str,
+    liabilities: Liabilities,
+    wallet_balance: Optional[int],
+    drift: Optional[int],
+    unexplained: Optional[int],
+    baseline_id: Optional[int],
+    error: Optional[str],
+    duration_ms: float,
+) -> int:
+    async with transaction() as tx:
+        cur = await tx.execute(
+            """
+            INSERT INTO reconciliations (
+                status, wallet_balance, user_balances, users, negative_users,
+                locked_in_games, active_games, withdrawal_holds, in_flight,
+                drift, unexplained, ledger_max_id, baseline_id, error, duration_ms
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                status, wallet_balance, liabilities.user_balances, liabilities.users,
+                liabilities.negative_users, liabilities.locked_in_games,
+                liabilities.active_games, liabilities.withdrawal_holds, liabilities.in_flight,
+                drift, unexplained, liabilities.ledger_max_id, baseline_id, error, duration_ms,
+            ),
+        )
+        if cur.lastrowid is None:
+            raise RuntimeError("Failed to get lastrowid for reconciliations")
+        return int(cur.lastrowid)
+
+
+async def accept_reconciliation(reconciliation_id: int) -> bool:
+    """관리자가 확인한 DRIFT / SHORTFALL 대사를 OK 로 바꿔 다음 대사의 기준점으로 삼는다."""
+    async with transaction() as tx:
+        cur = await tx.execute(
+            """
+            UPDATE reconciliations
+            SET status = 'OK'
+            WHERE id = ? AND status IN ('DRIFT', 'SHORTFALL') AND drift IS NOT NULL
+            """,
+            (reconciliation_id,),
+        )
+        return cur.rowcount > 0
@@ -1,119 +1,276 @@
 # models_user.py
-from typing import Optional
+from collections import OrderedDict
+from typing import Mapping, NamedTuple, Optional, Sequence
 
-from db import get_db
+from config import BALANCE_CACHE_SIZE, KNOWN_USER_CACHE_SIZE
+from db import Transaction, read_db, transaction
+from queries import (
+    LEDGER_INSERT,
+    SETTLE_CREDIT,
+    SETTLE_GAME_STATUS,
+    SETTLE_LEDGER,
+    SETTLE_RESULTS,
+    USER_APPLY_BALANCE,
+    USER_GET_BALANCE,
+    USER_GET_ID,
+    USER_INSERT,
+)
+
+
+class BalanceCache:
+    """
+    discord_user_id -> 잔액 write-through 캐시 (LRU).
+    - 잔액 변경은 전부 이 모듈을 거치므로, 커밋 직후 새 잔액으로 갱신한다.
+    - 조회 미스로 DB 에서 읽어온 값은, 읽는 사이에 다른 쓰기가 있었다면 넣지 않는다.
+      (오래된 값이 최신 값을 덮어쓰지 않도록 version 으로 확인)
+    """
+
+    __slots__ = ("maxsize", "_data", "version", "hits", "misses", "evictions")
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[int, int]" = OrderedDict()
+        self.version = 0        # 쓰기(put)마다 증가
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, discord_user_id: int) -> int | None:
+        balance = self._data.get(discord_user_id)
+        if balance is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(discord_user_id)
+        self.hits += 1
+        return balance
+
+    def put(self, discord_user_id: int, balance: int) -> None:
+        """커밋된 새 잔액 반영 (write-through)"""
+        self.version += 1
+        self._store(discord_user_id, balance)
+
+    def fill(self, discord_user_id: int, balance: int, version: int) -> None:
+        """조회 미스 후 DB 값 채우기: 조회 시작 이후 쓰기가 없었을 때만 반영"""
+        if version == self.version:
+            self._store(discord_user_id, balance)
+
+    def _store(self, discord_user_id: int, balance: int) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[discord_user_id] = balance
+        self._data.move_to_end(discord_user_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.version += 1
+        self._data.clear()
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+balance_cache = BalanceCache(BALANCE_CACHE_SIZE)
+
+# 이미 users 행이 있는 것으로 확인된 discord_user_id -> users.id
+# (유저 행은 삭제되지 않으므로 무효화가 필요 없다)
+_known_users: dict[int, int] = {}
 
 
 async def get_or_create_user(discord_user_id: int) -> int:
     """
     discord_user_id 에 해당하는 users 레코드를 가져오거나 생성.
     반환: users.id (내부 PK)
+    - 한 번 확인된 유저는 _known_users 에서 바로 반환 (DB 조회 없음)
+    - 처음 보는 유저는 INSERT ... ON CONFLICT DO NOTHING RETURNING 1번으로 생성,
+      이미 있으면 SELECT 1번
     """
-    db = await get_db()
-    cur = await db.execute(
-        "SELECT id FROM users WHERE discord_user_id = ?",
-        (discord_user_id,),
-    )
-    row = await cur.fetchone()
+    user_pk = _known_users.get(discord_user_id)
+    if user_pk is not None:
+        return user_pk
 
-    if row is not None:
-        return int(row["id"])
+    async with transaction() as tx:
+        cur = await tx.execute(USER_INSERT, (discord_user_id,))
+        row = await cur.fetchone()
+        if row is None:
+            cur = await tx.execute(USER_GET_ID, (discord_user_id,))
+            row = await cur.fetchone()
+        if row is None:
+            raise RuntimeError("유저 생성 후에도 레코드를 찾을 수 없습니다.")
+        user_pk = int(row["id"])
+        # 새로 만든 행이 롤백될 수도 있으므로 커밋 이후에만 기억한다.
+        tx.on_commit(lambda: _remember_user(discord_user_id, user_pk))
+    return user_pk
 
-    await db.execute(
-        "INSERT INTO users (discord_user_id, balance) VALUES (?, ?)",
-        (discord_user_id, 0),
-    )
-    await db.commit()
 
-    cur = await db.execute(
-        "SELECT id FROM users WHERE discord_user_id = ?",
-        (discord_user_id,),
-    )
-    row2 = await cur.fetchone()
-    if row2 is None:
-        raise RuntimeError("유저 생성 후에도 레코드를 찾을 수 없습니다.")
-    return int(row2["id"])
+def _remember_user(discord_user_id: int, user_pk: int) -> None:
+    if KNOWN_USER_CACHE_SIZE <= 0:
+        return
+    if len(_known_users) >= KNOWN_USER_CACHE_SIZE:
+        # 삽입 순서상 가장 오래된 항목부터 버린다.
+        del _known_users[next(iter(_known_users))]
+    _known_users[discord_user_id] = user_pk
 
 
 async def get_balance(discord_user_id: int) -> int:
     """
-    유저의 내부 잔액(sats)을 반환.
+    유저의 내부 잔액(sats)을 반환. (캐시에 있으면 DB 를 거치지 않음)
     """
-    db = await get_db()
-    cur = await db.execute(
-        "SELECT balance FROM users WHERE discord_user_id = ?",
-        (discord_user_id,),
-    )
-    row = await cur.fetchone()
+    cached = balance_cache.get(discord_user_id)
+    if cached is not None:
+        return cached
+
+    version = balance_cache.version
+    async with read_db() as db:
+        cur = await db.execute(USER_GET_BALANCE, (discord_user_id,))
+        row = await cur.fetchone()
     if row is None:
         await get_or_create_user(discord_user_id)
-        return 0
-    return int(row["balance"])
+        balance = 0
+    else:
+        balance = int(row["balance"])
+    balance_cache.fill(discord_user_id, balance, version)
+    return balance
 
 
-async def change_balance(discord_user_id: int, diff_sats: int) -> int:
+async def change_balance(
+    discord_user_id: int,
+    diff_sats: int,
+    reason: str = "adjust",
+    ref: str | int | None = None,
+) -> int:
     """
     유저 잔액을 diff_sats 만큼 증감시키고, 변경된 잔액을 반환.
-    (음수 diff_sats 는 차감)
+    (음수 diff_sats 는 차감, 잔액이 모자라면 ValueError)
+    - 조건부 UPDATE ... RETURNING 1번으로 잔액 검사 + 반영을 원자적으로 처리
+    - 같은 트랜잭션에서 ledger 에 사유(reason)와 참조(ref: payment_hash, game_id 등)를 남긴다.
     """
-    db = await get_db()
-    await get_or_create_user(discord_user_id)
+    async with transaction() as tx:
+        new_balance = await _apply_balance(tx, discord_user_id, diff_sats)
+        if new_balance is None and discord_user_id not in _known_users:
+            # 유저가 아직 없을 수 있음 → 유저를 만든 뒤 한 번만 다시 시도
+            await get_or_create_user(discord_user_id)
+            new_balance = await _apply_balance(tx, discord_user_id, diff_sats)
+        if new_balance is None:
+            raise ValueError("잔액이 부족합니다.")
+
+        await tx.execute(
+            LEDGER_INSERT,
+            (discord_user_id, diff_sats, new_balance, reason, None if ref is None else str(ref)),
+        )
+        # 롤백되면 캐시도 그대로 두고, 실제 커밋된 뒤에만 갱신
+        tx.on_commit(lambda: balance_cache.put(discord_user_id, new_balance))
+    return new_balance
+
 
-    cur = await db.execute(
-        "SELECT balance FROM users WHERE discord_user_id = ?",
-        (discord_user_id,),
-    )
+async def _apply_balance(tx: Transaction, discord_user_id: int, diff_sats: int) -> int | None:
+    """잔액이 음수가 되지 않을 때만 반영하고 새 잔액을 반환 (반영 못 하면 None)"""
+    cur = await tx.execute(USER_APPLY_BALANCE, (diff_sats, discord_user_id, diff_sats))
     row = await cur.fetchone()
-    if row is None:
-        current = 0
-    else:
-        current = int(row["balance"])
+    return None if row is None else int(row[0])
 
-    new_balance = current + diff_sats
-    if new_balance < 0:
-        raise ValueError("잔액이 부족합니다.")
 
-    await db.execute(
-        "UPDATE users SET balance = ? WHERE discord_user_id = ?",
-        (new_balance, discord_user_id),
-    )
-    await db.commit()
-    return new_balance
+class GameAlreadySettled(Exception):
+    """settle_game: 게임이 이미 정산되었거나(WAITING / RUNNING 이 아님) 존재하지 않는 경우"""
 
 
-async def add_game_result(
-    discord_user_id: int,
-    spent_sats: int = 0,
-    won_sats: int = 0,
-    win: Optional[bool] = None,
-) -> None:
+class GameResult(NamedTuple):
+    """settle_game 에 넘기는 참가자 1명의 게임 결과 (사용/획득 sats, 승패)"""
+
+    discord_user_id: int
+    spent_sats: int = 0
+    won_sats: int = 0
+    win: Optional[bool] = None
+
+
+async def settle_game(
+    game_id: int,
+    payouts: Mapping[int, int],
+    results: Sequence[GameResult],
+    status: str = "FINISHED",
+    reason: str = "rr_prize",
+) -> dict[int, int]:
     """
-    게임 결과(사용/획득 sats, 승패)를 누적한다.
+    게임 정산: 상금/환불 지급, 전적 누적, rr_games 상태 변경을 트랜잭션 1개로 처리한다.
+    - payouts: discord_user_id -> 지급 sats (ledger 에 reason / ref=game_id 로 기록)
+    - results: 참가자별 total_spent / total_won / 승패 누적
+    - 참가자 수와 상관없이 executemany 로 일정한 횟수의 쿼리만 실행한다.
+    - 이미 정산된(WAITING / RUNNING 이 아닌) 게임이면 GameAlreadySettled (이중 지급 방지)
+    반환: 지급받은 유저들의 새 잔액
     """
-    db = await get_db()
-    await get_or_create_user(discord_user_id)
-
-    # 총 사용/획득 sats 반영
-    await db.execute(
-        """
-        UPDATE users
-        SET total_spent = total_spent + ?,
-            total_won = total_won + ?
-        WHERE discord_user_id = ?
-        """,
-        (spent_sats, won_sats, discord_user_id),
-    )
-
-    # 승패 카운트 반영
-    if win is True:
-        await db.execute(
-            "UPDATE users SET win_count = win_count + 1 WHERE discord_user_id = ?",
-            (discord_user_id,),
-        )
-    elif win is False:
-        await db.execute(
-            "UPDATE users SET lose_count = lose_count + 1 WHERE discord_user_id = ?",
-            (discord_user_id,),
-        )
+    credits = [(uid, amount) for uid, amount in payouts.items() if amount > 0]
+    new_balances: dict[int, int] = {}
+
+    async with transaction() as tx:
+        cur = await tx.execute(SETTLE_GAME_STATUS, (status, game_id))
+        if await cur.fetchone() is None:
+            raise GameAlreadySettled("이미 정산되었거나 존재하지 않는 게임입니다.")
+
+        user_ids = {uid for uid, _ in credits} | {r.discord_user_id for r in results}
+        unknown = [uid for uid in user_ids if uid not in _known_users]
+        created: dict[int, int] = {}
+        if unknown:
+            await tx.executemany(
+                """
+                INSERT INTO users (discord_user_id, balance) VALUES (?, 0)
+                ON CONFLICT (discord_user_id) DO NOTHING
+                """,
+                [(uid,) for uid in unknown],
+            )
+            placeholders = ",".join("?" * len(unknown))
+            cur = await tx.execute(
+                f"SELECT discord_user_id, id FROM users WHERE discord_user_id IN ({placeholders})",
+                unknown,
+            )
+            created = {int(r[0]): int(r[1]) for r in await cur.fetchall()}
+
+        if credits:
+            await tx.executemany(SETTLE_CREDIT, [(amount, uid) for uid, amount in credits])
+            # balance_after 는 방금 갱신된 users.balance 에서 그대로 가져온다.
+            await tx.executemany(
+                SETTLE_LEDGER,
+                [(amount, reason, str(game_id), uid) for uid, amount in credits],
+            )
+            placeholders = ",".join("?" * len(credits))
+            cur = await tx.execute(
+                f"SELECT discord_user_id, balance FROM users WHERE discord_user_id IN ({placeholders})",
+                [uid for uid, _ in credits],
+            )
+            new_balances = {int(r[0]): int(r[1]) for r in await cur.fetchall()}
+
+        if results:
+            await tx.executemany(
+                SETTLE_RESULTS,
+                [
+                    (
+                        r.spent_sats,
+                        r.won_sats,
+                        1 if r.win is True else 0,
+                        1 if r.win is False else 0,
+                        r.discord_user_id,
+                    )
+                    for r in results
+                ],
+            )
+
+        def _on_commit() -> None:
+            for uid, balance in new_balances.items():
+                balance_cache.put(uid, balance)
+            # get_or_create_user 와 마찬가지로 커밋된 뒤에만 기억한다.
+            for uid, user_pk in created.items():
+                _remember_user(uid, user_pk)
 
-    await db.commit()
+        tx.on_commit(_on_commit)
+    return new_balances
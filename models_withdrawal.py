@@ -0,0 +1,127 @@
+# models_withdrawal.py
+import sqlite3
+from typing import NamedTuple, Optional
+
+from db import read_db, transaction
+from models_user import change_balance
+from queries import (
+    WITHDRAWAL_EXISTS,
+    WITHDRAWAL_FINISH,
+    WITHDRAWAL_GET,
+    WITHDRAWAL_LOAD_UNFINISHED,
+    WITHDRAWAL_MARK_SENDING,
+    WITHDRAWAL_RECORD_ATTEMPT,
+    WITHDRAWAL_REVERT_SENDING,
+)
+
+
+class Withdrawal(NamedTuple):
+    id: int
+    discord_user_id: int
+    payment_hash: str
+    payment_request: str
+    amount_sats: int
+    memo: str
+    status: str          # PENDING / SENDING / SUCCESS / FAILED
+    attempts: int
+
+
+async def create_withdrawal(
+    discord_user_id: int,
+    payment_hash: str,
+    payment_request: str,
+    amount_sats: int,
+    memo: str = "",
+) -> int:
+    """
+    출금 요청 등록 + 잔액 선차감(hold)을 트랜잭션 1개로 처리하고 출금 ID 를 반환.
+    - 잔액이 모자라면 ValueError("잔액이 부족합니다.")
+    - 같은 인보이스(payment_hash)는 한 번만 등록된다. (ValueError)
+    """
+    async with transaction() as tx:
+        await change_balance(discord_user_id, -amount_sats, reason="withdraw", ref=payment_hash)
+        try:
+            cur = await tx.execute(
+                """
+                INSERT INTO withdrawals (
+                    discord_user_id, payment_hash, payment_request, amount_sats, memo
+                )
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (discord_user_id, payment_hash, payment_request, amount_sats, memo),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError("이미 출금에 사용된 인보이스입니다.") from None
+        if cur.lastrowid is None:
+            raise RuntimeError("Failed to get lastrowid for withdrawals")
+        return int(cur.lastrowid)
+
+
+async def withdrawal_exists(payment_hash: str) -> bool:
+    async with read_db() as db:
+        cur = await db.execute(WITHDRAWAL_EXISTS, (payment_hash,))
+        return await cur.fetchone() is not None
+
+
+async def get_withdrawal(withdrawal_id: int) -> Optional[Withdrawal]:
+    async with read_db() as db:
+        cur = await db.execute(WITHDRAWAL_GET, (withdrawal_id,))
+        row = await cur.fetchone()
+    if row is None:
+        return None
+    return Withdrawal(
+        int(row[0]), int(row[1]), str(row[2]), str(row[3]),
+        int(row[4]), str(row[5]), str(row[6]), int(row[7]),
+    )
+
+
+async def load_unfinished_withdrawals() -> list[int]:
+    """재시작 후 이어서 처리할 출금 ID (PENDING / SENDING)"""
+    async with read_db() as db:
+        cur = await db.execute(WITHDRAWAL_LOAD_UNFINISHED)
+        rows = await cur.fetchall()
+    return [int(r[0]) for r in rows]
+
+
+async def mark_sending(withdrawal_id: int) -> None:
+    """Blink 로 전송하기 직전에 호출 (재시작 시 '보냈을 수도 있는' 건을 구분하기 위함)"""
+    async with transaction() as tx:
+        await tx.execute(WITHDRAWAL_MARK_SENDING, (withdrawal_id,))
+
+
+async def revert_sending(withdrawal_id: int, error: str) -> None:
+    """
+    mark_sending 뒤에 요청을 보내지 못한 경우(서킷 브레이커 / 대기열 시간 초과):
+    시도 횟수를 되돌려서 보내지 않은 시도가 attempts 에 세지지 않게 한다.
+    """
+    async with transaction() as tx:
+        await tx.execute(WITHDRAWAL_REVERT_SENDING, (error, withdrawal_id))
+
+
+async def record_attempt(withdrawal_id: int, blink_status: Optional[str], error: Optional[str]) -> None:
+    """결과가 아직 확정되지 않은 시도(PENDING / 통신 오류) 기록"""
+    async with transaction() as tx:
+        await tx.execute(WITHDRAWAL_RECORD_ATTEMPT, (blink_status, error, withdrawal_id))
+
+
+async def finish_withdrawal(
+    withdrawal_id: int,
+    success: bool,
+    blink_status: Optional[str] = None,
+    error: Optional[str] = None,
+) -> Optional[int]:
+    """
+    출금 확정(SUCCESS) 또는 실패(FAILED + 차감했던 금액 환불)를 트랜잭션 1개로 처리.
+    이미 끝난 출금이면 아무것도 하지 않고 None, 환불했으면 환불 후 잔액을 반환.
+    """
+    async with transaction() as tx:
+        cur = await tx.execute(
+            WITHDRAWAL_FINISH,
+            ("SUCCESS" if success else "FAILED", blink_status, error, withdrawal_id),
+        )
+        row = await cur.fetchone()
+        if row is None or success:
+            return None
+        return await change_balance(
+            int(row[0]), int(row[1]), reason="withdraw_refund", ref=str(row[2])
+        )
@@ -0,0 +1,143 @@
+# qr_render.py
+import asyncio
+import io
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import qrcode
+
+from config import QR_CACHE_SIZE, QR_COMPACT, QR_RENDER_PROCESSES, QR_RENDER_WORKERS
+
+# (box_size, border): 기본값은 qrcode.make() 와 같고, compact 는 픽셀 수가 약 1/6
+DEFAULT_LAYOUT = (10, 4)
+COMPACT_LAYOUT = (4, 2)
+
+
+def render_png(data: str, box_size: int, border: int) -> bytes:
+    """
+    QR 코드를 1-bit PNG 바이트로 생성. (워커 풀에서 실행되는 순수 CPU 작업)
+    프로세스 풀에서도 쓸 수 있도록 모듈 최상위 함수로 둔다.
+    """
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class QrRenderer:
+    """
+    입금 인보이스 QR 렌더러.
+    - 생성은 크기가 제한된 스레드/프로세스 풀에서 처리해서 이벤트 루프를 막지 않는다.
+    - (내용, 레이아웃) 별 PNG 를 LRU 로 캐시하고, 같은 요청이 동시에 오면 한 번만 생성한다.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = QR_RENDER_WORKERS,
+        processes: bool = QR_RENDER_PROCESSES,
+        cache_size: int = QR_CACHE_SIZE,
+    ) -> None:
+        self._workers = max(1, workers)
+        self._processes = processes
+        self._executor: Optional[Executor] = None
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[tuple[str, int, int], bytes]" = OrderedDict()
+        self._inflight: dict[tuple[str, int, int], "asyncio.Future[bytes]"] = {}
+        self.renders = 0
+        self.hits = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    async def render(self, data: str, *, compact: bool = QR_COMPACT) -> bytes:
+        """data(보통 payment_request)의 QR PNG 바이트 반환"""
+        box_size, border = COMPACT_LAYOUT if compact else DEFAULT_LAYOUT
+        key = (data, box_size, border)
+
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return png
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[bytes]" = loop.create_future()
+        self._inflight[key] = future
+        started = time.perf_counter()
+        try:
+            png = await loop.run_in_executor(
+                self._get_executor(), render_png, data, box_size, border
+            )
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 기다리는 쪽이 없어도 경고가 나지 않도록 소비
+            raise
+        finally:
+            del self._inflight[key]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.renders += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+        self._store(key, png)
+        future.set_result(png)
+        return png
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "renders": self.renders,
+            "hits": self.hits,
+            "inflight": len(self._inflight),
+            "cached": len(self._cache),
+            "avg_ms": self.total_ms / self.renders if self.renders else 0.0,
+            "max_ms": self.max_ms,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ---------------- 내부 ----------------
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._processes:
+                # qrcode / PNG 인코딩은 순수 파이썬이라 GIL 을 오래 잡는다 → 프로세스 풀이 기본
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="qr-render"
+                )
+        return self._executor
+
+    def _store(self, key: tuple[str, int, int], png: bytes) -> None:
+        if self._cache_size <= 0:
+            return
+        self._cache[key] = png
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+
+# 여러 Cog 에서 같은 풀 / 캐시를 쓰도록 모듈 단위 싱글톤으로 둔다.
+qr_renderer = QrRenderer()
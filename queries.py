@@ -0,0 +1,301 @@
+# queries.py
+"""
+핫패스 SQL 모음.
+- 호출하는 모듈과 db.check_query_plans() 가 같은 문자열을 import 해서 쓰므로,
+  쿼리를 고치면 검사 대상도 함께 바뀐다. (손으로 복사한 SQL 이 실제 쿼리와 어긋나지 않도록)
+- HOT_PATH_QUERIES 에 등록된 쿼리는 EXPLAIN QUERY PLAN 에 테이블/인덱스 전체 SCAN 이 없어야 한다.
+  (tests/test_query_plans.py, 또는 DB_CHECK_QUERY_PLANS=1 로 시작 시 검사)
+"""
+
+# ─────────────────────────────────────────────
+# rr_cog: 게임 세션 로드 / 저널
+# ─────────────────────────────────────────────
+
+RR_LOAD_GAME = """
+    SELECT id, host_user_id, entry_fee, max_players, bullet_count, status
+    FROM rr_games
+    WHERE channel_id = ? AND status IN ('WAITING', 'RUNNING')
+    ORDER BY id DESC LIMIT 1
+"""
+
+RR_GET_PLAYERS = """
+    SELECT user_id, order_index, alive
+    FROM rr_players
+    WHERE game_id = ?
+    ORDER BY order_index ASC
+"""
+
+RR_LOAD_STATE = """
+    SELECT current_turn, cylinder, round_number, shot_in_round
+    FROM rr_state
+    WHERE game_id = ?
+"""
+
+RR_REHYDRATE_GAMES = """
+    SELECT id, channel_id, host_user_id, entry_fee, max_players, bullet_count, status,
+           CAST(strftime('%s', 'now') - strftime('%s', created_at) AS INTEGER)
+    FROM rr_games
+    WHERE status IN ('WAITING', 'RUNNING')
+    ORDER BY id ASC
+"""
+
+RR_REHYDRATE_PLAYERS = """
+    SELECT p.game_id, p.user_id, p.alive,
+           CAST(strftime('%s', 'now') - strftime('%s', p.joined_at) AS INTEGER)
+    FROM rr_players p
+    JOIN rr_games g ON g.id = p.game_id
+    WHERE g.status IN ('WAITING', 'RUNNING')
+    ORDER BY p.game_id ASC, p.order_index ASC
+"""
+
+RR_REHYDRATE_STATE = """
+    SELECT s.game_id, s.current_turn, s.cylinder, s.round_number, s.shot_in_round,
+           CAST(strftime('%s', 'now') - strftime('%s', s.last_action_at) AS INTEGER)
+    FROM rr_state s
+    JOIN rr_games g ON g.id = s.game_id
+    WHERE g.status IN ('WAITING', 'RUNNING')
+"""
+
+RR_CANCEL_GAME = """
+    UPDATE rr_games
+    SET status = 'CANCELLED', finished_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+"""
+
+RR_JOIN_SEAT = """
+    INSERT INTO rr_players (game_id, user_id, order_index, alive)
+    SELECT ?, ?, COUNT(*) + 1, 1
+    FROM rr_players
+    WHERE game_id = ?
+      AND EXISTS (
+          SELECT 1 FROM rr_games WHERE id = ? AND status = 'WAITING'
+      )
+    HAVING COUNT(*) < ?
+    RETURNING order_index
+"""
+
+RR_JOURNAL_STATE = """
+    INSERT OR REPLACE INTO rr_state (
+        game_id, current_turn, cylinder,
+        round_number, shot_in_round, last_action_at
+    )
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
+
+RR_JOURNAL_PLAYERS = "UPDATE rr_players SET alive = ? WHERE game_id = ? AND user_id = ?"
+
+RR_JOURNAL_GAME = """
+    UPDATE rr_games
+    SET status = ?,
+        started_at = CASE WHEN ? = 'RUNNING'
+            THEN COALESCE(started_at, CURRENT_TIMESTAMP) ELSE started_at END,
+        finished_at = CASE WHEN ? IN ('FINISHED', 'CANCELLED')
+            THEN CURRENT_TIMESTAMP ELSE finished_at END
+    WHERE id = ?
+"""
+
+# ─────────────────────────────────────────────
+# models_user: 유저 / 잔액 / 원장 / 게임 정산
+# ─────────────────────────────────────────────
+
+USER_INSERT = """
+    INSERT INTO users (discord_user_id, balance) VALUES (?, 0)
+    ON CONFLICT (discord_user_id) DO NOTHING
+    RETURNING id
+"""
+
+USER_GET_ID = "SELECT id FROM users WHERE discord_user_id = ?"
+
+USER_GET_BALANCE = "SELECT balance FROM users WHERE discord_user_id = ?"
+
+USER_APPLY_BALANCE = """
+    UPDATE users SET balance = balance + ?
+    WHERE discord_user_id = ? AND balance + ? >= 0
+    RETURNING balance
+"""
+
+LEDGER_INSERT = """
+    INSERT INTO ledger (discord_user_id, amount, balance_after, reason, ref)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+SETTLE_GAME_STATUS = """
+    UPDATE rr_games
+    SET status = ?, finished_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND status IN ('WAITING', 'RUNNING')
+    RETURNING id
+"""
+
+SETTLE_CREDIT = "UPDATE users SET balance = balance + ? WHERE discord_user_id = ?"
+
+# balance_after 는 방금 갱신된 users.balance 에서 그대로 가져온다.
+SETTLE_LEDGER = """
+    INSERT INTO ledger (discord_user_id, amount, balance_after, reason, ref)
+    SELECT discord_user_id, ?, balance, ?, ?
+    FROM users WHERE discord_user_id = ?
+"""
+
+SETTLE_RESULTS = """
+    UPDATE users
+    SET total_spent = total_spent + ?,
+        total_won = total_won + ?,
+        win_count = win_count + ?,
+        lose_count = lose_count + ?
+    WHERE discord_user_id = ?
+"""
+
+# ─────────────────────────────────────────────
+# models_invoice: 입금 인보이스
+# ─────────────────────────────────────────────
+
+INVOICE_LOAD_PENDING = """
+    SELECT payment_hash, discord_user_id, payment_request, amount_sats, expires_at
+    FROM pending_invoices
+    WHERE status = 'PENDING'
+    ORDER BY expires_at ASC
+"""
+
+INVOICE_SETTLE = """
+    UPDATE pending_invoices
+    SET status = 'PAID', settled_at = CURRENT_TIMESTAMP
+    WHERE payment_hash = ? AND status = 'PENDING'
+    RETURNING discord_user_id, amount_sats
+"""
+
+INVOICE_EXPIRE = """
+    UPDATE pending_invoices
+    SET status = 'EXPIRED', settled_at = CURRENT_TIMESTAMP
+    WHERE payment_hash = ? AND status = 'PENDING'
+"""
+
+# ─────────────────────────────────────────────
+# models_withdrawal: 출금
+# ─────────────────────────────────────────────
+
+WITHDRAWAL_EXISTS = "SELECT 1 FROM withdrawals WHERE payment_hash = ?"
+
+WITHDRAWAL_GET = """
+    SELECT id, discord_user_id, payment_hash, payment_request,
+           amount_sats, memo, status, attempts
+    FROM withdrawals
+    WHERE id = ?
+"""
+
+WITHDRAWAL_LOAD_UNFINISHED = (
+    "SELECT id FROM withdrawals WHERE status IN ('PENDING', 'SENDING') ORDER BY id ASC"
+)
+
+WITHDRAWAL_MARK_SENDING = """
+    UPDATE withdrawals
+    SET status = 'SENDING', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND status IN ('PENDING', 'SENDING')
+"""
+
+WITHDRAWAL_REVERT_SENDING = """
+    UPDATE withdrawals
+    SET status = CASE WHEN attempts > 1 THEN 'SENDING' ELSE 'PENDING' END,
+        attempts = attempts - 1,
+        error = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND status = 'SENDING' AND attempts > 0
+"""
+
+WITHDRAWAL_RECORD_ATTEMPT = """
+    UPDATE withdrawals
+    SET blink_status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+"""
+
+WITHDRAWAL_FINISH = """
+    UPDATE withdrawals
+    SET status = ?, blink_status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND status IN ('PENDING', 'SENDING')
+    RETURNING discord_user_id, amount_sats, payment_hash
+"""
+
+# ─────────────────────────────────────────────
+# models_reconcile: 지갑 대사
+# ─────────────────────────────────────────────
+
+RECONCILE_LEDGER_MAX_ID = "SELECT COALESCE(MAX(id), 0) FROM ledger"
+
+# 페이지 끝 id 를 PK 로 찾고, (last_id, 끝 id] 범위를 SQLite 안에서 합산
+RECONCILE_USERS_BOUND = "SELECT id FROM users WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?"
+
+RECONCILE_USERS_SUM = """
+    SELECT COUNT(*), COALESCE(SUM(balance), 0), COALESCE(SUM(balance < 0), 0)
+    FROM users
+    WHERE id > ? AND id <= ?
+"""
+
+RECONCILE_GAMES = """
+    SELECT g.id, g.entry_fee,
+           (SELECT COUNT(*) FROM rr_players p WHERE p.game_id = g.id)
+    FROM rr_games g
+    WHERE g.status IN ('WAITING', 'RUNNING') AND g.id > ?
+    ORDER BY g.id LIMIT ?
+"""
+
+RECONCILE_HOLDS = """
+    SELECT status, COALESCE(SUM(amount_sats), 0)
+    FROM withdrawals
+    WHERE status IN ('PENDING', 'SENDING')
+    GROUP BY status
+"""
+
+RECONCILE_LAST_OK = """
+    SELECT id, drift, locked_in_games, in_flight, ledger_max_id
+    FROM reconciliations
+    WHERE status = 'OK'
+    ORDER BY id DESC LIMIT 1
+"""
+
+RECONCILE_LEDGER_REASONS = """
+    SELECT reason, COUNT(*), SUM(amount)
+    FROM ledger
+    WHERE id > ? AND id <= ?
+    GROUP BY reason
+    ORDER BY reason
+"""
+
+
+# 전체 스캔이 없어야 하는 쿼리 목록 (이름, SQL)
+HOT_PATH_QUERIES: tuple[tuple[str, str], ...] = (
+    ("rr_cog._load_session/game", RR_LOAD_GAME),
+    ("rr_cog._get_players", RR_GET_PLAYERS),
+    ("rr_cog._load_session/state", RR_LOAD_STATE),
+    ("rr_cog.rehydrate/games", RR_REHYDRATE_GAMES),
+    ("rr_cog.rehydrate/players", RR_REHYDRATE_PLAYERS),
+    ("rr_cog.rehydrate/state", RR_REHYDRATE_STATE),
+    ("rr_cog._expire_games", RR_CANCEL_GAME),
+    ("rr_cog._join/seat", RR_JOIN_SEAT),
+    ("rr_cog._journal/state", RR_JOURNAL_STATE),
+    ("rr_cog._journal/players", RR_JOURNAL_PLAYERS),
+    ("rr_cog._journal/game", RR_JOURNAL_GAME),
+    ("models_user.get_or_create_user/insert", USER_INSERT),
+    ("models_user.get_or_create_user/select", USER_GET_ID),
+    ("models_user.get_balance", USER_GET_BALANCE),
+    ("models_user.change_balance", USER_APPLY_BALANCE),
+    ("models_user.change_balance/ledger", LEDGER_INSERT),
+    ("models_user.settle_game/status", SETTLE_GAME_STATUS),
+    ("models_user.settle_game/credit", SETTLE_CREDIT),
+    ("models_user.settle_game/ledger", SETTLE_LEDGER),
+    ("models_user.settle_game/results", SETTLE_RESULTS),
+    ("models_invoice.load_pending_invoices", INVOICE_LOAD_PENDING),
+    ("models_invoice.settle_invoice", INVOICE_SETTLE),
+    ("models_invoice.expire_invoices", INVOICE_EXPIRE),
+    ("models_withdrawal.withdrawal_exists", WITHDRAWAL_EXISTS),
+    ("models_withdrawal.get_withdrawal", WITHDRAWAL_GET),
+    ("models_withdrawal.load_unfinished_withdrawals", WITHDRAWAL_LOAD_UNFINISHED),
+    ("models_withdrawal.mark_sending", WITHDRAWAL_MARK_SENDING),
+    ("models_withdrawal.revert_sending", WITHDRAWAL_REVERT_SENDING),
+    ("models_withdrawal.record_attempt", WITHDRAWAL_RECORD_ATTEMPT),
+    ("models_withdrawal.finish_withdrawal", WITHDRAWAL_FINISH),
+    ("models_reconcile.scan_liabilities/ledger_max_id", RECONCILE_LEDGER_MAX_ID),
+    ("models_reconcile.scan_liabilities/users_bound", RECONCILE_USERS_BOUND),
+    ("models_reconcile.scan_liabilities/users_sum", RECONCILE_USERS_SUM),
+    ("models_reconcile.scan_liabilities/games", RECONCILE_GAMES),
+    ("models_reconcile.scan_liabilities/holds", RECONCILE_HOLDS),
+    ("models_reconcile.last_ok_reconciliation", RECONCILE_LAST_OK),
+    ("models_reconcile.ledger_since/reasons", RECONCILE_LEDGER_REASONS),
+)
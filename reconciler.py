@@ -0,0 +1,204 @@
+# reconciler.py
+import asyncio
+import time
+from typing import Any, NamedTuple, Optional
+
+from blink_client_rr import BlinkError, get_wallet_balance
+from config import (
+    RECONCILE_CHUNK_SIZE,
+    RECONCILE_INTERVAL_SEC,
+    RECONCILE_LEDGER_TOP,
+    RECONCILE_SCAN_ATTEMPTS,
+    RECONCILE_TOLERANCE_SATS,
+)
+from log import get_logger
+from models_reconcile import (
+    WALLET_REASONS,
+    Baseline,
+    LedgerItem,
+    LedgerReason,
+    Liabilities,
+    last_ok_reconciliation,
+    ledger_since,
+    save_reconciliation,
+    scan_liabilities,
+)
+
+logger = get_logger("reconcile")
+
+
+class ReconcileReport(NamedTuple):
+    id: int
+    status: str                          # OK / DRIFT / SHORTFALL / ERROR
+    liabilities: Liabilities
+    wallet_balance: Optional[int]
+    drift: Optional[int]                 # 지갑 잔액 - 부채 합계 (+ 면 여유분)
+    baseline: Optional[Baseline]
+    expected_change: Optional[int]       # 기준점 이후 원장으로 설명되는 drift 변화
+    unexplained: Optional[int]
+    reasons: list[LedgerReason]
+    items: list[LedgerItem]
+    error: Optional[str]
+    duration_ms: float
+
+
+class Reconciler:
+    """
+    지갑 대사: 내부 부채(users 잔액 + 진행 중인 게임 참가비 + 출금 hold)를 Blink 지갑 잔액과 비교.
+    - drift = 지갑 잔액 - 부채. 게임 수수료 / 자동 종료된 게임의 참가비는 drift 를 늘리고,
+      라우팅 수수료 / 테스트 충전(debug)은 줄인다.
+    - 마지막 OK 대사(기준점) 이후 원장을 사유별로 합산해서 drift 변화 중 설명되는 몫을 계산한다.
+      (지갑과 무관한 원장 합계 + 게임 판돈 변화 = 부채만 바뀐 금액)
+    - 설명되지 않는 변화가 허용 오차를 넘으면 DRIFT, 지갑이 부채를 감당하지 못하면 SHORTFALL.
+      SENDING 출금은 지갑에서 이미 빠졌을 수 있으므로 그만큼은 오차로 인정한다.
+    - 지갑 잔액은 스캔 전후로 두 번 읽어서 같을 때만 비교한다. 스캔 도중 입금 / 출금이 있으면
+      다시 스캔하고, scan_attempts 번 모두 달라지면 ERROR 로 남기고 건너뛴다.
+      (스캔 뒤의 잔액과 스캔 시점의 부채를 비교해서 생기는 일시적인 DRIFT 방지)
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = RECONCILE_INTERVAL_SEC,
+        chunk_size: int = RECONCILE_CHUNK_SIZE,
+        tolerance: int = RECONCILE_TOLERANCE_SATS,
+        ledger_top: int = RECONCILE_LEDGER_TOP,
+        scan_attempts: int = RECONCILE_SCAN_ATTEMPTS,
+        name: str = "reconciler",
+    ) -> None:
+        self._interval = interval
+        self._chunk_size = chunk_size
+        self._tolerance = tolerance
+        self._ledger_top = ledger_top
+        self._scan_attempts = max(1, scan_attempts)
+        self._name = name
+        self._lock = asyncio.Lock()     # 예약 실행과 관리자 명령이 겹치지 않도록
+        self._task: Optional[asyncio.Task[Any]] = None
+        self.last: Optional[ReconcileReport] = None
+
+    def start(self) -> None:
+        """주기 실행 시작 (interval 이 0 이하면 관리자 명령으로만 실행)"""
+        if self._interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self._name)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> ReconcileReport:
+        async with self._lock:
+            report = await self._reconcile()
+        self.last = report
+        self._log(report)
+        return report
+
+    # ---------------- 내부 ----------------
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("대사 실행 예외", extra={"job": self._name})
+
+    async def _reconcile(self) -> ReconcileReport:
+        started = time.perf_counter()
+        liabilities: Optional[Liabilities] = None
+        wallet_balance: Optional[int] = None
+        error: Optional[str] = None
+        try:
+            for attempt in range(1, self._scan_attempts + 1):
+                before = await get_wallet_balance()
+                liabilities = await scan_liabilities(self._chunk_size)
+                after = await get_wallet_balance()
+                if before == after:
+                    wallet_balance = after
+                    break
+                logger.info(
+                    "대사 스캔 중 지갑 잔액 변동",
+                    extra={"job": self._name, "attempt": attempt, "before": before, "after": after},
+                )
+            else:
+                error = f"스캔하는 동안 지갑 잔액이 계속 바뀌어 대사를 건너뜀 ({self._scan_attempts}회)"
+        except BlinkError as e:
+            error = str(e)
+        if liabilities is None:
+            # 첫 잔액 조회부터 실패: ERROR 기록에 남길 부채만 집계
+            liabilities = await scan_liabilities(self._chunk_size)
+        baseline = await last_ok_reconciliation()
+
+        if wallet_balance is None:
+            duration_ms = (time.perf_counter() - started) * 1000
+            report_id = await save_reconciliation(
+                "ERROR", liabilities, None, None, None,
+                baseline.id if baseline else None, error, duration_ms,
+            )
+            return ReconcileReport(
+                report_id, "ERROR", liabilities, None, None, baseline,
+                None, None, [], [], error, duration_ms,
+            )
+
+        drift = wallet_balance - liabilities.total
+        expected_change: Optional[int] = None
+        unexplained: Optional[int] = None
+        reasons: list[LedgerReason] = []
+        items: list[LedgerItem] = []
+        if baseline is not None:
+            reasons, items = await ledger_since(
+                baseline.ledger_max_id, liabilities.ledger_max_id, self._ledger_top
+            )
+            liability_only = sum(r.amount for r in reasons if r.reason not in WALLET_REASONS)
+            expected_change = -liability_only - (
+                liabilities.locked_in_games - baseline.locked_in_games
+            )
+            unexplained = (drift - baseline.drift) - expected_change
+
+        lower = -(self._tolerance + liabilities.in_flight)
+        if drift < lower:
+            status = "SHORTFALL"
+        elif unexplained is not None and baseline is not None and not (
+            lower <= unexplained <= self._tolerance + baseline.in_flight
+        ):
+            status = "DRIFT"
+        else:
+            status = "OK"
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        report_id = await save_reconciliation(
+            status, liabilities, wallet_balance, drift, unexplained,
+            baseline.id if baseline else None, None, duration_ms,
+        )
+        return ReconcileReport(
+            report_id, status, liabilities, wallet_balance, drift, baseline,
+            expected_change, unexplained, reasons, items, None, duration_ms,
+        )
+
+    def _log(self, report: ReconcileReport) -> None:
+        fields = {
+            "reconciliation_id": report.id,
+            "status": report.status,
+            "wallet_balance": report.wallet_balance,
+            "liabilities": report.liabilities.total,
+            "drift": report.drift,
+            "unexplained": report.unexplained,
+            "users": report.liabilities.users,
+            "duration_ms": round(report.duration_ms, 1),
+        }
+        if report.status == "OK":
+            logger.info("지갑 대사", extra=fields)
+        elif report.status == "ERROR":
+            logger.error("지갑 대사 실패", extra={**fields, "error": report.error})
+        else:
+            logger.warning("지갑 대사 불일치", extra=fields)
+
+
+# 관리자 명령과 예약 실행이 같은 인스턴스를 쓰도록 모듈 단위 싱글톤으로 둔다.
+reconciler = Reconciler()
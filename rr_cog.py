@@ -1,19 +1,47 @@
 # rr_cog.py
-import random
 import asyncio
-from typing import Any
+import sqlite3
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from db import get_db
-from models_user import get_balance, change_balance
+from blink_client_rr import blink_stats
+from db import read_db, transaction
+from deadlines import DeadlineScheduler
+from locks import KeyedLocks, user_locks
+from log import get_logger, logging_stats
+from models_user import (
+    GameAlreadySettled,
+    GameResult,
+    balance_cache,
+    change_balance,
+    get_balance,
+    settle_game,
+)
+from qr_render import qr_renderer
+from queries import (
+    RR_CANCEL_GAME,
+    RR_GET_PLAYERS,
+    RR_JOIN_SEAT,
+    RR_JOURNAL_GAME,
+    RR_JOURNAL_PLAYERS,
+    RR_JOURNAL_STATE,
+    RR_LOAD_GAME,
+    RR_LOAD_STATE,
+    RR_REHYDRATE_GAMES,
+    RR_REHYDRATE_PLAYERS,
+    RR_REHYDRATE_STATE,
+)
+from rr_session import GameSession, PullResult
+
+logger = get_logger("rr")
 
 ENTRY_FEE_DEFAULT = 100
 MAX_PLAYERS_DEFAULT = 6          # 항상 6으로 고정
 BULLET_COUNT_DEFAULT = 1         # 각 라운드에서 실린더에 넣을 총알 수 (항상 1발)
 GAME_TIMEOUT_SECONDS = 300       # 5분 동안 액션 없으면 자동 종료
+EXPIRE_RETRY_SECONDS = 30        # 자동 종료 기록에 실패하면 이 시간 뒤 다시 시도
 
 
 class RussianRoulette(commands.Cog):
@@ -21,44 +49,137 @@ class RussianRoulette(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self._lock = asyncio.Lock()
-        # channel_id -> timeout task
-        self._timeout_tasks: dict[int, asyncio.Task[Any]] = {}
-
-    # 내부 헬퍼: 현재 채널의 진행중 / 대기중 게임 가져오기 (가장 최근 1개)
-    async def _get_active_game(self, channel_id: int) -> tuple[int, str] | None:
-        db = await get_db()
-        cur = await db.execute(
-            """
-            SELECT id, status FROM rr_games
-            WHERE channel_id = ? AND status IN ('WAITING', 'RUNNING')
-            ORDER BY id DESC LIMIT 1
-            """,
-            (channel_id,),
-        )
-        row = await cur.fetchone()
+        # 채널별 락: 한 채널의 느린 커밋이 다른 채널을 막지 않도록 한다.
+        self._channel_locks = KeyedLocks("channel")
+        # channel_id -> 비활성 자동 종료 시각 (모든 게임을 코루틴 1개로 관리)
+        self._timeouts = DeadlineScheduler(self._expire_games, name="rr-timeouts")
+        # channel_id -> 진행중 / 대기중 게임 세션 (채널당 1개)
+        self._sessions: dict[int, GameSession] = {}
+        # DB 에서 한 번이라도 상태를 확인한 채널 (이후에는 메모리 세션이 기준)
+        self._loaded_channels: set[int] = set()
+        # rehydrate() 로 활성 게임 전체를 복원했다면 채널별 DB 조회는 필요 없다.
+        self._rehydrated = False
+
+    # 내부 헬퍼: 현재 채널의 진행중 / 대기중 게임 가져오기
+    async def _get_active_game(self, channel_id: int) -> GameSession | None:
+        """
+        메모리 세션을 우선 사용하고, 아직 한 번도 보지 않은 채널이면 DB 에서 1회 로드한다.
+        """
+        session = self._sessions.get(channel_id)
+        if session is not None:
+            return session
+        if self._rehydrated or channel_id in self._loaded_channels:
+            return None
+
+        session = await self._load_session(channel_id)
+        self._loaded_channels.add(channel_id)
+        if session is not None:
+            self._sessions[channel_id] = session
+            self._touch(session)
+        return session
+
+    async def _load_session(self, channel_id: int) -> GameSession | None:
+        """DB 에 남아있는 채널의 가장 최근 WAITING / RUNNING 게임을 세션으로 복원"""
+        async with read_db() as db:
+            cur = await db.execute(RR_LOAD_GAME, (channel_id,))
+            row = await cur.fetchone()
         if row is None:
             return None
-        game_id, status = row
-        return int(game_id), str(status)
 
-    # 내부 헬퍼: 현재 채널의 모든 대기중 게임 목록 (게임 선택용)
-    async def _get_waiting_games(self, channel_id: int) -> list[tuple[int, int, int]]:
+        session = GameSession(
+            game_id=int(row[0]),
+            channel_id=channel_id,
+            host_user_id=int(row[1]),
+            entry_fee=int(row[2]),
+            max_players=int(row[3]),
+            bullet_count=int(row[4]),
+            status=str(row[5]),
+        )
+
+        for user_id, _, alive in await self._get_players(session.game_id):
+            session.seats.append(user_id)
+            if alive:
+                session.alive.add(user_id)
+
+        async with read_db() as db:
+            cur = await db.execute(RR_LOAD_STATE, (session.game_id,))
+            state_row = await cur.fetchone()
+        if state_row is not None:
+            session.current_turn = int(state_row[0])
+            session.cylinder = str(state_row[1])
+            session.round_number = int(state_row[2] or 0)
+            session.shot_in_round = int(state_row[3] or 0)
+        return session
+
+    async def rehydrate(self) -> int:
         """
-        반환: [(game_id, host_user_id, entry_fee), ...]
+        봇 재시작 시 WAITING / RUNNING 게임 전체를 메모리 세션으로 복원하고
+        마지막 액션 시각 기준으로 자동 종료 타이머를 다시 건다.
+        - rr_games / rr_players / rr_state 를 각각 1번씩만 조회한다.
+        - 한 채널에 활성 게임이 여러 개 남아있으면 가장 최근 것만 살리고 나머지는 취소한다.
+        반환: 복원한 게임 수
         """
-        db = await get_db()
-        cur = await db.execute(
-            """
-            SELECT id, host_user_id, entry_fee
-            FROM rr_games
-            WHERE channel_id = ? AND status = 'WAITING'
-            ORDER BY id ASC
-            """,
-            (channel_id,),
-        )
-        rows = await cur.fetchall()
-        return [(int(r[0]), int(r[1]), int(r[2])) for r in rows]
+        async with read_db() as db:
+            cur = await db.execute(RR_REHYDRATE_GAMES)
+            sessions: dict[int, GameSession] = {}
+            by_channel: dict[int, GameSession] = {}
+            idle: dict[int, int] = {}
+            stale_game_ids: list[int] = []
+            for row in await cur.fetchall():
+                session = GameSession(
+                    game_id=int(row[0]),
+                    channel_id=int(row[1]),
+                    host_user_id=int(row[2]),
+                    entry_fee=int(row[3]),
+                    max_players=int(row[4]),
+                    bullet_count=int(row[5]),
+                    status=str(row[6]),
+                )
+                previous = by_channel.get(session.channel_id)
+                if previous is not None:
+                    stale_game_ids.append(previous.game_id)
+                    del sessions[previous.game_id]
+                by_channel[session.channel_id] = session
+                sessions[session.game_id] = session
+                idle[session.game_id] = int(row[7] or 0)
+
+            cur = await db.execute(RR_REHYDRATE_PLAYERS)
+            for game_id, user_id, alive, joined_idle in await cur.fetchall():
+                seated = sessions.get(int(game_id))
+                if seated is None:
+                    continue
+                seated.seats.append(int(user_id))
+                if alive:
+                    seated.alive.add(int(user_id))
+                if joined_idle is not None:
+                    idle[seated.game_id] = min(idle[seated.game_id], int(joined_idle))
+
+            cur = await db.execute(RR_REHYDRATE_STATE)
+            for game_id, current_turn, cylinder, round_number, shot_in_round, action_idle in (
+                await cur.fetchall()
+            ):
+                running = sessions.get(int(game_id))
+                if running is None:
+                    continue
+                running.current_turn = int(current_turn)
+                running.cylinder = str(cylinder)
+                running.round_number = int(round_number or 0)
+                running.shot_in_round = int(shot_in_round or 0)
+                if action_idle is not None:
+                    idle[running.game_id] = min(idle[running.game_id], int(action_idle))
+
+        if stale_game_ids:
+            async with transaction() as tx:
+                await tx.executemany(RR_CANCEL_GAME, [(game_id,) for game_id in stale_game_ids])
+
+        # 이미 기한이 지난 게임은 지연 0 으로 등록되어 스케줄러가 한 번에 정리한다.
+        for session in sessions.values():
+            self._sessions[session.channel_id] = session
+            self._loaded_channels.add(session.channel_id)
+            remaining = max(0, GAME_TIMEOUT_SECONDS - max(0, idle[session.game_id]))
+            self._timeouts.schedule(session.channel_id, remaining)
+        self._rehydrated = True
+        return len(sessions)
 
     async def _create_game(
         self,
@@ -67,511 +188,245 @@ class RussianRoulette(commands.Cog):
         entry_fee: int = ENTRY_FEE_DEFAULT,
         max_players: int = MAX_PLAYERS_DEFAULT,
         bullet_count: int = BULLET_COUNT_DEFAULT,
-    ) -> int:
+    ) -> GameSession:
         """게임 룸을 생성 (max_players는 항상 6으로 저장)"""
-        db = await get_db()
-        cur = await db.execute(
-            """
-            INSERT INTO rr_games (
-                channel_id, host_user_id, entry_fee,
-                max_players, bullet_count, status
+        async with transaction() as tx:
+            cur = await tx.execute(
+                """
+                INSERT INTO rr_games (
+                    channel_id, host_user_id, entry_fee,
+                    max_players, bullet_count, status
+                )
+                VALUES (?, ?, ?, ?, ?, 'WAITING')
+                """,
+                (channel_id, host_user_id, entry_fee, max_players, bullet_count),
             )
-            VALUES (?, ?, ?, ?, ?, 'WAITING')
-            """,
-            (channel_id, host_user_id, entry_fee, max_players, bullet_count),
-        )
-        await db.commit()
 
         last_id = cur.lastrowid
         if last_id is None:
             raise RuntimeError("Failed to get lastrowid for rr_games")
-        return int(last_id)
-
-    async def _add_player(self, game_id: int, user_id: int) -> int:
-        db = await get_db()
-        # 이미 참가했는지 확인
-        cur = await db.execute(
-            "SELECT id FROM rr_players WHERE game_id = ? AND user_id = ?",
-            (game_id, user_id),
-        )
-        row = await cur.fetchone()
-        if row is not None:
-            raise ValueError("이미 이 게임에 참가했습니다.")
-
-        # 현재 인원 수
-        cur = await db.execute(
-            "SELECT COUNT(*) FROM rr_players WHERE game_id = ?",
-            (game_id,),
-        )
-        count_row = await cur.fetchone()
-        current_count = int(count_row[0]) if count_row is not None else 0
-
-        # order_index = 현재 인원 수 + 1
-        order_index = current_count + 1
-        await db.execute(
-            """
-            INSERT INTO rr_players (game_id, user_id, order_index, alive)
-            VALUES (?, ?, ?, 1)
-            """,
-            (game_id, user_id, order_index),
+
+        session = GameSession(
+            game_id=int(last_id),
+            channel_id=channel_id,
+            host_user_id=host_user_id,
+            entry_fee=entry_fee,
+            max_players=max_players,
+            bullet_count=bullet_count,
         )
-        await db.commit()
+        self._sessions[channel_id] = session
+        self._loaded_channels.add(channel_id)
+        self._touch(session)
+        return session
+
+    async def _join(self, session: GameSession, user_id: int) -> int:
+        """
+        참가비 차감 + 좌석 등록을 트랜잭션 1개(커밋 1회)로 처리하고 order_index 를 반환한다.
+        - 정원 / 대기 상태는 INSERT ... SELECT 조건으로 DB 에서도 다시 확인한다.
+        - 중복 좌석은 (game_id, user_id) 유니크 인덱스로 막는다.
+        - 어느 단계에서든 실패하면 참가비 차감까지 함께 롤백된다. (ValueError)
+        """
+        # 중복 참가 / 인원 초과는 먼저 메모리에서 판정 (DB 왕복 없이 거절)
+        session.check_join(user_id)
+
+        async with transaction() as tx:
+            await change_balance(
+                user_id, -session.entry_fee, reason="rr_entry", ref=session.game_id
+            )
+            try:
+                cur = await tx.execute(
+                    RR_JOIN_SEAT,
+                    (
+                        session.game_id,
+                        user_id,
+                        session.game_id,
+                        session.game_id,
+                        session.max_players,
+                    ),
+                )
+            except sqlite3.IntegrityError:
+                raise ValueError("이미 이 게임에 참가했습니다.") from None
+            row = await cur.fetchone()
+            if row is None:
+                raise ValueError("이미 시작되었거나 인원이 가득 찬 게임입니다.")
+
+        # 커밋된 이후에만 메모리 세션에 반영
+        order_index = session.add_player(user_id)
+        if order_index != int(row[0]):
+            raise RuntimeError("rr_players 의 순번과 세션 좌석이 어긋났습니다.")
+        self._touch(session)
         return order_index
 
     async def _get_players(self, game_id: int) -> list[tuple[int, int, int]]:
-        db = await get_db()
-        cur = await db.execute(
-            """
-            SELECT user_id, order_index, alive
-            FROM rr_players
-            WHERE game_id = ?
-            ORDER BY order_index ASC
-            """,
-            (game_id,),
-        )
-        rows = await cur.fetchall()
+        async with read_db() as db:
+            cur = await db.execute(RR_GET_PLAYERS, (game_id,))
+            rows = await cur.fetchall()
         return [(int(r[0]), int(r[1]), int(r[2])) for r in rows]
 
-    # ---------------- 라운드 기반 실린더 생성 ----------------
+    # ---------------- 세션 상태 저널 ----------------
 
-    async def _start_round(self, game_id: int) -> None:
+    async def _journal(self, session: GameSession, draft: GameSession) -> None:
         """
-        새 라운드를 시작한다.
-        - 실린더는 항상 6칸
-        - 총알은 1발
-        - alive=1인 플레이어들만 턴을 돌린다.
+        세션의 다음 상태(draft)를 DB 에 한 번에 기록하고, 커밋된 뒤에만 세션에 반영한다.
+        (트랜잭션 1개. 실패하면 세션은 전이 전 상태 그대로 남아 DB 와 어긋나지 않는다)
+        - rr_state: 턴 / 실린더 / 라운드 카운터 + last_action_at
+        - rr_players: alive 플래그
+        - rr_games: status / started_at / finished_at
         """
-        db = await get_db()
-
-        # 현재 살아있는 플레이어 수
-        cur = await db.execute(
-            """
-            SELECT COUNT(*) FROM rr_players
-            WHERE game_id = ? AND alive = 1
-            """,
-            (game_id,),
-        )
-        alive_row = await cur.fetchone()
-        alive_count = int(alive_row[0]) if alive_row is not None else 0
-
-        # 최소 인원 체크 (테스트용: 1명도 허용)
-        MIN_PLAYERS = 1
-        if alive_count < MIN_PLAYERS:
-            raise ValueError(f"최소 {MIN_PLAYERS}명 이상 모여야 게임을 시작할 수 있습니다.")
-
-        # 현재 rr_state에서 round_number 읽기
-        cur = await db.execute(
-            """
-            SELECT round_number
-            FROM rr_state
-            WHERE game_id = ?
-            """,
-            (game_id,),
-        )
-        state_row = await cur.fetchone()
-        if state_row is None:
-            round_number = 0
-        else:
-            round_number = int(state_row[0] or 0)
-
-        # 새 라운드 번호
-        round_number += 1
-
-        # 항상 6칸짜리 실린더 생성
-        cylinder_size = MAX_PLAYERS_DEFAULT  # 항상 6
-        bullet_count = BULLET_COUNT_DEFAULT  # 항상 1발
-        bullet_count = min(bullet_count, cylinder_size)
-
-        cylinder_list = [0] * cylinder_size
-        bullet_positions = random.sample(range(cylinder_size), bullet_count)
-        for pos in bullet_positions:
-            cylinder_list[pos] = 1
-        cylinder_str = "".join(str(x) for x in cylinder_list)
-
-        # 새 라운드 시작: current_turn = 살아있는 사람 중 order_index가 가장 작은 사람
-        cur = await db.execute(
-            """
-            SELECT order_index
-            FROM rr_players
-            WHERE game_id = ? AND alive = 1
-            ORDER BY order_index ASC
-            LIMIT 1
-            """,
-            (game_id,),
-        )
-        first_alive_row = await cur.fetchone()
-        if first_alive_row is None:
-            # 살아있는 사람이 없으면 게임을 종료하는 게 맞지만,
-            # 여기서는 그냥 예외를 던진다.
-            raise RuntimeError("살아있는 플레이어가 없습니다.")
-
-        first_turn = int(first_alive_row[0])
-
-        # rr_state 갱신: 새 라운드 + 샷 카운트 초기화
-        await db.execute(
-            """
-            INSERT OR REPLACE INTO rr_state (
-                game_id, current_turn, cylinder,
-                round_number, shot_in_round, last_action_at
+        async with transaction() as tx:
+            if draft.round_number > 0:
+                await tx.execute(
+                    RR_JOURNAL_STATE,
+                    (
+                        draft.game_id,
+                        draft.current_turn,
+                        draft.cylinder,
+                        draft.round_number,
+                        draft.shot_in_round,
+                    ),
+                )
+            await tx.executemany(
+                RR_JOURNAL_PLAYERS,
+                [
+                    (1 if uid in draft.alive else 0, draft.game_id, uid)
+                    for uid in draft.seats
+                ],
             )
-            VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP)
-            """,
-            (game_id, first_turn, cylinder_str, round_number),
-        )
-        # 게임 상태 RUNNING 으로 보장
-        await db.execute(
-            """
-            UPDATE rr_games
-            SET status = 'RUNNING', started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
-            WHERE id = ?
-            """,
-            (game_id,),
-        )
-        await db.commit()
+            await tx.execute(
+                RR_JOURNAL_GAME,
+                (draft.status, draft.status, draft.status, draft.game_id),
+            )
+            # 바깥 트랜잭션(상금 지급 등)에 합류한 경우에도 실제 커밋 이후에 반영 + 타이머/세션 정리
+            tx.on_commit(lambda: self._apply(session, draft))
 
-    async def _start_game(self, game_id: int) -> None:
+    def _apply(self, session: GameSession, draft: GameSession) -> None:
+        session.apply(draft)
+        self._touch(session)
+
+    def _touch(self, session: GameSession) -> None:
         """
-        게임 시작 시 호출.
-        - 내부적으로는 첫 라운드를 시작한다.
+        액션이 있을 때마다 호출: 자동 종료 시각을 뒤로 미룬다.
+        종료된 게임이면 세션과 타이머를 정리한다.
         """
-        db = await get_db()
+        if session.is_active:
+            self._timeouts.schedule(session.channel_id, GAME_TIMEOUT_SECONDS)
+            return
+        self._timeouts.cancel(session.channel_id)
+        if self._sessions.get(session.channel_id) is session:
+            del self._sessions[session.channel_id]
 
-        # 전체 참가자 수
-        cur = await db.execute(
-            "SELECT COUNT(*) FROM rr_players WHERE game_id = ?",
-            (game_id,),
-        )
-        count_row = await cur.fetchone()
-        total_players = int(count_row[0]) if count_row is not None else 0
-
-        MIN_PLAYERS = 1  # 실제 라이브 서비스에서는 2로 변경 가능
-        if total_players < MIN_PLAYERS:
-            raise ValueError(f"최소 {MIN_PLAYERS}명 이상 모여야 게임을 시작할 수 있습니다.")
-
-        # 모든 참가자를 alive=1로 보장
-        await db.execute(
-            """
-            UPDATE rr_players
-            SET alive = 1
-            WHERE game_id = ?
-            """,
-            (game_id,),
-        )
-        await db.commit()
-
-        # 첫 라운드 시작
-        await self._start_round(game_id)
-
-    async def _update_last_action(self, game_id: int) -> None:
-        db = await get_db()
-        await db.execute(
-            """
-            UPDATE rr_state
-            SET last_action_at = CURRENT_TIMESTAMP
-            WHERE game_id = ?
-            """,
-            (game_id,),
-        )
-        await db.commit()
+    def _evict(self, session: GameSession) -> None:
+        """DB 에서는 이미 끝난 게임의 세션과 타이머를 정리한다. (채널에 새 게임을 만들 수 있도록)"""
+        self._timeouts.cancel(session.channel_id)
+        if self._sessions.get(session.channel_id) is session:
+            del self._sessions[session.channel_id]
 
-    async def _get_next_player_id(self, game_id: int, current_user_id: int) -> int | None:
+    async def _start_game(self, session: GameSession) -> None:
         """
-        현재 유저 기준으로 다음 턴 유저의 user_id 반환.
-        - alive = 1 인 플레이어들만 대상으로 한다.
-        - order_index 기준으로 다음, 없으면 가장 작은 order_index.
+        게임 시작 시 호출.
+        - 모든 참가자를 alive 로 만들고 첫 라운드를 시작한다.
         """
-        db = await get_db()
-
-        # 현재 플레이어의 order_index 조회
-        cur = await db.execute(
-            """
-            SELECT order_index
-            FROM rr_players
-            WHERE game_id = ? AND user_id = ? AND alive = 1
-            """,
-            (game_id, current_user_id),
-        )
-        row = await cur.fetchone()
-        if row is None:
-            return None
-        cur_order = int(row[0])
-
-        # 살아있는 플레이어들의 order_index 목록
-        cur = await db.execute(
-            """
-            SELECT user_id, order_index
-            FROM rr_players
-            WHERE game_id = ? AND alive = 1
-            ORDER BY order_index ASC
-            """,
-            (game_id,),
-        )
-        rows = await cur.fetchall()
-        alive_players = [(int(r[0]), int(r[1])) for r in rows]
-        if not alive_players:
-            return None
-
-        # 현재 order_index 이후 첫 번째 alive 플레이어
-        larger = [p for p in alive_players if p[1] > cur_order]
-        if larger:
-            next_user_id = min(larger, key=lambda x: x[1])[0]
-            return next_user_id
-
-        # 없다면(현재가 마지막이라면) 가장 order_index가 작은 alive 플레이어
-        first_user_id = min(alive_players, key=lambda x: x[1])[0]
-        return first_user_id
+        draft = session.copy()
+        draft.start()
+        await self._journal(session, draft)
 
-    async def _pull_trigger(
-        self,
-        game_id: int,
-        user_id: int,
-    ) -> tuple[bool, bool, int | None, int]:
+    async def _pull_trigger(self, session: GameSession, user_id: int) -> PullResult:
         """
         방아쇠를 당기고, 생존 여부/승리 여부/상금 정보를 반환.
-        반환: (shot, dead, winner_user_id, prize_amount)
-
-        라운드 기반:
-        - 각 라운드마다 6칸 실린더 + 1발
-        - 한 라운드에서 누군가 죽으면 라운드 종료
-        - 살아있는 사람이 1명 남으면 게임 종료
-        - 2명 이상 남으면 새 라운드 시작
+        판정은 세션 복사본에서 끝내고 결과만 한 번에 기록한다. (커밋된 뒤에만 세션에 반영)
+        DB 에서 이미 정산된 게임이면 세션을 정리하고 GameAlreadySettled 를 그대로 올린다.
         """
-        db = await get_db()
-        # 상태 조회
-        cur = await db.execute(
-            """
-            SELECT current_turn, cylinder, round_number, shot_in_round
-            FROM rr_state
-            WHERE game_id = ?
-            """,
-            (game_id,),
-        )
-        state_row = await cur.fetchone()
-        if state_row is None:
-            raise RuntimeError("게임 상태를 찾을 수 없습니다.")
-        current_turn, cylinder, round_number, shot_in_round = state_row
-        current_turn = int(current_turn)
-        cylinder = str(cylinder)
-        round_number = int(round_number or 0)
-        shot_in_round = int(shot_in_round or 0)
-
-        # 현재 턴의 플레이어
-        cur = await db.execute(
-            """
-            SELECT user_id, order_index, alive
-            FROM rr_players
-            WHERE game_id = ? AND order_index = ?
-            """,
-            (game_id, current_turn),
-        )
-        player_row = await cur.fetchone()
-        if player_row is None:
-            raise RuntimeError("현재 차례인 플레이어를 찾을 수 없습니다.")
-
-        turn_user_id, _, alive = player_row
-        turn_user_id = int(turn_user_id)
-        alive = int(alive)
-
-        if not alive:
-            raise RuntimeError("현재 플레이어는 이미 사망 처리되었습니다.")
-
-        if turn_user_id != user_id:
-            raise ValueError("지금은 당신의 차례가 아닙니다.")
-
-        # 이번 라운드에서 몇 번째 발인지 계산
-        shot_in_round += 1
-
-        # cylinder에서 현재 칸 확인 (index = shot_in_round - 1)
-        idx = shot_in_round - 1
-        if idx < 0 or idx >= len(cylinder):
-            # 실린더 범위를 넘어갔다는 것은 데이터 이상이므로, 안전하게 빈 클릭 처리
-            shot = False
-        else:
-            shot = (cylinder[idx] == "1")
-
-        dead = False
-        winner_user_id: int | None = None
-        prize_amount = 0
-
-        if shot:
-            # 사망 처리
-            dead = True
-            await db.execute(
-                """
-                UPDATE rr_players
-                SET alive = 0
-                WHERE game_id = ? AND user_id = ?
-                """,
-                (game_id, user_id),
-            )
-
-        # 살아있는 플레이어 수 확인
-        cur = await db.execute(
-            """
-            SELECT COUNT(*) FROM rr_players
-            WHERE game_id = ? AND alive = 1
-            """,
-            (game_id,),
-        )
-        alive_count_row = await cur.fetchone()
-        alive_count = int(alive_count_row[0]) if alive_count_row is not None else 0
+        draft = session.copy()
+        result = draft.pull(user_id)
 
-        # 전체 참가자 수
-        cur = await db.execute(
-            "SELECT COUNT(*) FROM rr_players WHERE game_id = ?",
-            (game_id,),
-        )
-        total_players_row = await cur.fetchone()
-        total_players = int(total_players_row[0]) if total_players_row is not None else 0
-
-        # --- 혼자 테스트 모드: 참가자가 1명뿐이면 상금 지급/게임 종료 없이 계속 돌림 ---
-        if total_players <= 1:
-            # shot=True 이면 alive=0 이지만,
-            # 다음 라운드 시작 시 다시 한 명만 남는 상태가 되므로
-            # 그냥 "계속 진행" 로직으로 보냄
-            pass
-        else:
-            # 멀티 플레이 모드: 1명만 살아남으면 게임 종료
-            if alive_count <= 1:
-                # 게임 종료 -> 승자에게 상금 지급
-                cur = await db.execute(
-                    """
-                    SELECT user_id FROM rr_players
-                    WHERE game_id = ? AND alive = 1
-                    """,
-                    (game_id,),
-                )
-                winner_row = await cur.fetchone()
-                if winner_row is not None:
-                    winner_user_id = int(winner_row[0])
-
-                    # 상금풀 = 참가자 수 * entry_fee
-                    cur = await db.execute(
-                        "SELECT entry_fee FROM rr_games WHERE id = ?",
-                        (game_id,),
+        # 상금 지급 / 전적 / 상태 기록을 한 트랜잭션으로 (반쯤 지급된 상태가 남지 않도록)
+        try:
+            async with transaction():
+                if result.finished:
+                    await settle_game(
+                        draft.game_id,
+                        self._payouts(draft, result),
+                        self._results(draft, result),
+                        status=draft.status,
                     )
-                    fee_row = await cur.fetchone()
-                    entry_fee = int(fee_row[0]) if fee_row is not None else 0
-
-                    prize_amount = entry_fee * total_players
-
-                    # 상금 지급
-                    await change_balance(winner_user_id, prize_amount)
-
-                await db.execute(
-                    """
-                    UPDATE rr_games
-                    SET status = 'FINISHED', finished_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                    """,
-                    (game_id,),
-                )
-                await db.commit()
-                return shot, dead, winner_user_id, prize_amount
+                await self._journal(session, draft)
+        except GameAlreadySettled:
+            self._evict(session)
+            raise
+        return result
+
+    @staticmethod
+    def _payouts(session: GameSession, result: PullResult) -> dict[int, int]:
+        if result.winner_user_id is None:
+            return {}
+        return {result.winner_user_id: result.prize_amount}
+
+    @staticmethod
+    def _results(session: GameSession, result: PullResult) -> list[GameResult]:
+        """참가자 전원: 참가비만큼 소비, 승자는 상금만큼 획득"""
+        return [
+            GameResult(
+                discord_user_id=uid,
+                spent_sats=session.entry_fee,
+                won_sats=result.prize_amount if uid == result.winner_user_id else 0,
+                win=uid == result.winner_user_id,
+            )
+            for uid in session.seats
+        ]
 
-        # 여기까지 왔다는 것은:
-        # - shot=False 이거나
-        # - shot=True 이지만 아직 2명 이상 살아있어서 게임 계속인 상태
+    async def _cancel_game(self, session: GameSession) -> None:
+        draft = session.copy()
+        draft.finish("CANCELLED")
+        await self._journal(session, draft)
 
-        # shot=True 이면 라운드 종료 → 새 라운드를 시작
-        if shot:
-            # shot_in_round 업데이트 (마지막 발 기록)
-            await db.execute(
-                """
-                UPDATE rr_state
-                SET shot_in_round = ?, last_action_at = CURRENT_TIMESTAMP
-                WHERE game_id = ?
-                """,
-                (shot_in_round, game_id),
-            )
-            await db.commit()
-
-            # 새 라운드 시작
-            await self._start_round(game_id)
-            return shot, dead, None, 0
-
-        # shot=False (빈 클릭) 이면, 동일 라운드에서 다음 턴으로 넘어간다.
-        # 다음 턴 계산: alive=1 인 사람들 중 현재 사람 다음 order_index
-        cur = await db.execute(
-            """
-            SELECT order_index FROM rr_players
-            WHERE game_id = ? AND alive = 1
-            ORDER BY order_index ASC
-            """,
-            (game_id,),
-        )
-        alive_rows = await cur.fetchall()
-        order_list = [int(r[0]) for r in alive_rows]
+    async def _expire_games(self, channel_ids: list[int]) -> None:
+        """
+        자동 종료 시각이 지난 채널들을 한 번에 처리한다.
+        - 락을 기다리는 사이 액션이 들어와 시각이 연장된 채널은 건너뛴다.
+        - 상태 변경은 executemany + 커밋 1회로 기록하고, 커밋된 뒤에만 세션을 종료 처리한다.
+          기록에 실패하면 세션은 그대로 두고 EXPIRE_RETRY_SECONDS 뒤에 다시 시도한다.
+        """
+        async with self._channel_locks.hold(*channel_ids):
+            expired: list[GameSession] = []
+            for channel_id in channel_ids:
+                session = self._sessions.get(channel_id)
+                if session is None or not session.is_active or channel_id in self._timeouts:
+                    continue
+                expired.append(session)
+
+            if not expired:
+                return
 
-        if not order_list:
-            # 모두 죽어있는 이상한 상태 -> 그냥 종료 처리
-            await db.execute(
-                """
-                UPDATE rr_games
-                SET status = 'FINISHED', finished_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (game_id,),
-            )
-            await db.commit()
-            return shot, dead, None, 0
-
-        if current_turn not in order_list:
-            # (이론상 shot=False 이므로 current_turn 은 alive 목록에 있어야 함)
-            # 혹시라도 없으면, 가장 order_index 작은 사람부터
-            next_turn = min(order_list)
-        else:
-            idx_in_alive = order_list.index(current_turn)
-            next_turn = order_list[(idx_in_alive + 1) % len(order_list)]
-
-        # rr_state 갱신: current_turn, shot_in_round 증가
-        await db.execute(
-            """
-            UPDATE rr_state
-            SET current_turn = ?, shot_in_round = ?, last_action_at = CURRENT_TIMESTAMP
-            WHERE game_id = ?
-            """,
-            (next_turn, shot_in_round, game_id),
-        )
-        await db.commit()
-
-        return shot, dead, None, 0
-
-    async def _schedule_timeout(self, channel: discord.TextChannel, game_id: int) -> None:
-        async def timeout_task() -> None:
-            await asyncio.sleep(GAME_TIMEOUT_SECONDS)
-            async with self._lock:
-                db = await get_db()
-                cur = await db.execute(
-                    """
-                    SELECT status FROM rr_games
-                    WHERE id = ?
-                    """,
-                    (game_id,),
-                )
-                row = await cur.fetchone()
-                if row is None:
-                    return
-                status = str(row[0])
-                if status not in ("WAITING", "RUNNING"):
-                    return
-
-                await db.execute(
-                    """
-                    UPDATE rr_games
-                    SET status = 'CANCELLED', finished_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                    """,
-                    (game_id,),
-                )
-                await db.commit()
+            def _on_commit() -> None:
+                for session in expired:
+                    session.finish("CANCELLED")
+                    self._touch(session)
 
+            try:
+                async with transaction() as tx:
+                    await tx.executemany(RR_CANCEL_GAME, [(s.game_id,) for s in expired])
+                    tx.on_commit(_on_commit)
+            except Exception:
+                for session in expired:
+                    if session.channel_id not in self._timeouts:
+                        self._timeouts.schedule(session.channel_id, EXPIRE_RETRY_SECONDS)
+                raise
+
+        async def notify(session: GameSession) -> None:
+            channel = self.bot.get_channel(session.channel_id)
+            if not isinstance(channel, discord.TextChannel):
+                return
+            try:
                 await channel.send(
                     "⏰ 5분 동안 움직임이 없어 러시안 룰렛 게임이 자동 종료되었습니다."
                 )
+            except discord.HTTPException:
+                logger.exception("자동 종료 안내 전송 실패", extra={"channel_id": session.channel_id})
+
+        await asyncio.gather(*(notify(s) for s in expired))
 
-        task: asyncio.Task[Any] = asyncio.create_task(timeout_task())
-        self._timeout_tasks[channel.id] = task
+    async def cog_unload(self) -> None:
+        await self._timeouts.close()
 
     # /rr_create
     @app_commands.command(
@@ -594,7 +449,7 @@ class RussianRoulette(commands.Cog):
             )
             return
 
-        async with self._lock:
+        async with self._channel_locks.hold(interaction.channel.id):
             existing = await self._get_active_game(interaction.channel.id)
             if existing is not None:
                 await interaction.response.send_message(
@@ -604,13 +459,14 @@ class RussianRoulette(commands.Cog):
                 )
                 return
 
-            game_id = await self._create_game(
+            session = await self._create_game(
                 interaction.channel.id,
                 interaction.user.id,
                 entry_fee=entry_fee,
                 max_players=MAX_PLAYERS_DEFAULT,      # 항상 6
                 bullet_count=BULLET_COUNT_DEFAULT,
             )
+            game_id = session.game_id
 
             await interaction.response.send_message(
                 f"🎲 러시안 룰렛 게임을 생성했어요! (ID: `{game_id}`)\n"
@@ -621,8 +477,6 @@ class RussianRoulette(commands.Cog):
                 allowed_mentions=discord.AllowedMentions.none(),
             )
 
-            await self._schedule_timeout(interaction.channel, game_id)
-
     # /rr_join  (여러 게임 중 선택 가능)
     @app_commands.command(
         name="rr_join",
@@ -643,10 +497,12 @@ class RussianRoulette(commands.Cog):
             )
             return
 
-        async with self._lock:
-            # game_id 를 선택하지 않은 경우: 이 채널의 WAITING 게임 목록
-            waiting_games = await self._get_waiting_games(interaction.channel.id)
-            if not waiting_games:
+        # 채널 락(좌석) + 유저 락(잔액)을 함께 잡아서 정원 초과 / 이중 차감을 막는다.
+        async with self._channel_locks.hold(interaction.channel.id), user_locks.hold(
+            interaction.user.id
+        ):
+            session = await self._get_active_game(interaction.channel.id)
+            if session is None or session.status != "WAITING":
                 await interaction.response.send_message(
                     "이 채널에는 대기 중인 러시안 룰렛 게임이 없습니다.\n"
                     "`/rr_create` 로 새 게임을 먼저 만들어 주세요.",
@@ -656,81 +512,50 @@ class RussianRoulette(commands.Cog):
 
             if game_id is None:
                 # 가장 최근 게임에 자동 참가
-                game_id = waiting_games[-1][0]
+                game_id = session.game_id
 
             # 선택한 game_id 가 이 채널의 WAITING 게임인지 검증
-            if all(g[0] != game_id for g in waiting_games):
+            if game_id != session.game_id:
                 await interaction.response.send_message(
                     "선택한 게임을 찾을 수 없거나 이미 시작/종료된 게임입니다.",
                     ephemeral=True,
                 )
                 return
 
-            db = await get_db()
-            cur = await db.execute(
-                "SELECT entry_fee, max_players FROM rr_games WHERE id = ?",
-                (game_id,),
-            )
-            row = await cur.fetchone()
-            if row is None:
+            entry_fee = session.entry_fee
+            if session.player_count >= session.max_players:
                 await interaction.response.send_message(
-                    "게임 정보를 찾을 수 없습니다. 잠시 후 다시 시도해 주세요.",
+                    "이미 최대 인원에 도달한 게임입니다.",
                     ephemeral=True,
                 )
                 return
-            entry_fee, max_players = row
-            entry_fee = int(entry_fee)
-            max_players = int(max_players)
-
-            # 현재 참가자 수
-            cur = await db.execute(
-                "SELECT COUNT(*) FROM rr_players WHERE game_id = ?",
-                (game_id,),
-            )
-            count_row = await cur.fetchone()
-            current_count = int(count_row[0]) if count_row is not None else 0
-            if current_count >= max_players:
+
+            # 잔액 확인 (캐시 조회라 보통 DB 왕복 없음)
+            balance = await get_balance(interaction.user.id)
+            if balance < entry_fee:
                 await interaction.response.send_message(
-                    "이미 최대 인원에 도달한 게임입니다.",
+                    f"잔액이 부족합니다.\n"
+                    f"- 참가비: **{entry_fee} sats**\n"
+                    f"- 현재 잔액: **{balance} sats**",
                     ephemeral=True,
                 )
                 return
 
-        # 잔액 확인 및 참가비 차감
-        balance = await get_balance(interaction.user.id)
-        if balance < entry_fee:
-            await interaction.response.send_message(
-                f"잔액이 부족합니다.\n"
-                f"- 참가비: **{entry_fee} sats**\n"
-                f"- 현재 잔액: **{balance} sats**",
-                ephemeral=True,
-            )
-            return
-
-        try:
-            await change_balance(interaction.user.id, -entry_fee)
-        except ValueError:
-            await interaction.response.send_message(
-                "잔액 부족으로 인해 참가에 실패했습니다. 잔액을 다시 확인해 주세요.",
-                ephemeral=True,
-            )
-            return
+            # 참가비 차감 + 참가 등록 (트랜잭션 1개)
+            try:
+                order_index = await self._join(session, interaction.user.id)
+            except ValueError as e:
+                await interaction.response.send_message(
+                    str(e),
+                    ephemeral=True,
+                )
+                return
 
-        # 참가 등록
-        try:
-            order_index = await self._add_player(game_id, interaction.user.id)
-        except ValueError as e:
             await interaction.response.send_message(
-                str(e),
-                ephemeral=True,
+                f"✅ 러시안 룰렛 게임(ID: `{game_id}`)에 참가했습니다!\n"
+                f"당신의 순번은 **{order_index}번** 입니다.",
+                allowed_mentions=discord.AllowedMentions.none(),
             )
-            return
-
-        await interaction.response.send_message(
-            f"✅ 러시안 룰렛 게임(ID: `{game_id}`)에 참가했습니다!\n"
-            f"당신의 순번은 **{order_index}번** 입니다.",
-            allowed_mentions=discord.AllowedMentions.none(),
-        )
 
     # /rr_start
     @app_commands.command(
@@ -745,17 +570,17 @@ class RussianRoulette(commands.Cog):
             )
             return
 
-        async with self._lock:
-            active = await self._get_active_game(interaction.channel.id)
-            if active is None:
+        async with self._channel_locks.hold(interaction.channel.id):
+            session = await self._get_active_game(interaction.channel.id)
+            if session is None:
                 await interaction.response.send_message(
                     "이 채널에는 대기 중인 러시안 룰렛 게임이 없습니다.",
                     ephemeral=True,
                 )
                 return
 
-            game_id, status = active
-            if status != "WAITING":
+            game_id = session.game_id
+            if session.status != "WAITING":
                 await interaction.response.send_message(
                     "이미 시작되었거나 종료된 게임입니다.",
                     ephemeral=True,
@@ -763,7 +588,7 @@ class RussianRoulette(commands.Cog):
                 return
 
             try:
-                await self._start_game(game_id)
+                await self._start_game(session)
             except ValueError as e:
                 await interaction.response.send_message(
                     f"게임을 시작할 수 없습니다.\n➡ {e}",
@@ -796,17 +621,16 @@ class RussianRoulette(commands.Cog):
             )
             return
 
-        async with self._lock:
-            active = await self._get_active_game(interaction.channel.id)
-            if active is None:
+        async with self._channel_locks.hold(interaction.channel.id):
+            session = await self._get_active_game(interaction.channel.id)
+            if session is None:
                 await interaction.response.send_message(
                     "이 채널에는 진행 중인 러시안 룰렛 게임이 없습니다.",
                     ephemeral=True,
                 )
                 return
 
-            game_id, status = active
-            if status != "RUNNING":
+            if session.status != "RUNNING":
                 await interaction.response.send_message(
                     "아직 시작되지 않았거나 이미 종료된 게임입니다.",
                     ephemeral=True,
@@ -814,9 +638,14 @@ class RussianRoulette(commands.Cog):
                 return
 
             try:
-                shot, dead, winner_user_id, prize_amount = await self._pull_trigger(
-                    game_id, interaction.user.id
+                result = await self._pull_trigger(session, interaction.user.id)
+            except GameAlreadySettled:
+                await interaction.response.send_message(
+                    "이 게임은 이미 정산되어 종료되었습니다.\n"
+                    "`/rr_create` 로 새 게임을 만들 수 있어요.",
+                    ephemeral=True,
                 )
+                return
             except ValueError as e:
                 await interaction.response.send_message(
                     f"❌ 진행할 수 없습니다.\n➡ {e}",
@@ -830,7 +659,8 @@ class RussianRoulette(commands.Cog):
                 )
                 return
 
-            await self._update_last_action(game_id)
+            shot, dead = result.shot, result.dead
+            winner_user_id, prize_amount = result.winner_user_id, result.prize_amount
 
             # ---------- 썸네일로 사용할 이미지 URL들 ----------
             BASE = "https://raw.githubusercontent.com/zzeongzi/-lemon-RR/master/assets"
@@ -867,8 +697,8 @@ class RussianRoulette(commands.Cog):
                     )
                     thumb_url = IMAGE_URL_BANG
                 else:
-                    # 다음 플레이어 ID 조회
-                    next_user_id = await self._get_next_player_id(game_id, interaction.user.id)
+                    # 다음 플레이어 ID (세션에서 바로 계산됨)
+                    next_user_id = result.next_user_id
 
                     if next_user_id is not None:
                         msg = (
@@ -922,64 +752,32 @@ class RussianRoulette(commands.Cog):
             )
             return
 
-        async with self._lock:
-            db = await get_db()
-
-            if game_id is None:
-                # 이 채널의 가장 최근 WAITING 게임 1개 찾기
-                cur = await db.execute(
-                    """
-                    SELECT id, host_user_id, status
-                    FROM rr_games
-                    WHERE channel_id = ? AND status = 'WAITING'
-                    ORDER BY id DESC
-                    LIMIT 1
-                    """,
-                    (interaction.channel.id,),
-                )
-            else:
-                cur = await db.execute(
-                    """
-                    SELECT id, host_user_id, status
-                    FROM rr_games
-                    WHERE id = ? AND channel_id = ?
-                    """,
-                    (game_id, interaction.channel.id),
-                )
-
-            row = await cur.fetchone()
-            if row is None:
+        async with self._channel_locks.hold(interaction.channel.id):
+            session = await self._get_active_game(interaction.channel.id)
+            if session is None or (game_id is not None and game_id != session.game_id):
                 await interaction.response.send_message(
                     "이 채널에서 종료할 수 있는 대기 중 게임을 찾지 못했습니다.",
                     ephemeral=True,
                 )
                 return
 
-            found_game_id, host_user_id, status = int(row[0]), int(row[1]), str(row[2])
+            found_game_id = session.game_id
 
-            if status != "WAITING":
+            if session.status != "WAITING":
                 await interaction.response.send_message(
                     "이미 시작되었거나 종료된 게임은 폐쇄할 수 없습니다.",
                     ephemeral=True,
                 )
                 return
 
-            if host_user_id != interaction.user.id:
+            if session.host_user_id != interaction.user.id:
                 await interaction.response.send_message(
                     "이 게임의 생성자만 게임을 폐쇄할 수 있습니다.",
                     ephemeral=True,
                 )
                 return
 
-            await db.execute(
-                """
-                UPDATE rr_games
-                SET status = 'CANCELLED', finished_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (found_game_id,),
-            )
-            await db.commit()
+            await self._cancel_game(session)
 
             await interaction.response.send_message(
                 f"🛑 러시안 룰렛 게임(ID: `{found_game_id}`)이 생성자에 의해 폐쇄되었습니다.",
@@ -1006,14 +804,65 @@ class RussianRoulette(commands.Cog):
             )
             return
 
-        await change_balance(interaction.user.id, amount)
-        new_balance = await get_balance(interaction.user.id)
+        async with user_locks.hold(interaction.user.id):
+            await change_balance(interaction.user.id, amount, reason="debug")
+            new_balance = await get_balance(interaction.user.id)
         await interaction.response.send_message(
             f"✅ 테스트용으로 **{amount} sats** 를 충전했습니다.\n"
             f"현재 잔액: **{new_balance} sats**",
             ephemeral=True,
         )
 
+    # /rr_debug_stats : 락 대기 시간 등 내부 지표 확인 (관리자/개발용)
+    @app_commands.command(
+        name="rr_debug_stats",
+        description="(테스트용) 러시안 룰렛 내부 지표를 확인합니다.",
+    )
+    async def rr_debug_stats(self, interaction: discord.Interaction) -> None:
+        lines = [f"- 활성 게임 세션: **{len(self._sessions)}개**"]
+        cache = balance_cache.stats()
+        lines.append(
+            f"- 잔액 캐시: {cache['size']}/{cache['maxsize']} / 적중 {cache['hits']} / "
+            f"미스 {cache['misses']} / 적중률 {cache['hit_rate'] * 100:.1f}%"
+        )
+        blink = blink_stats()
+        lines.append(
+            f"- Blink: 브레이커 {blink['breaker']} / 연속 실패 {blink['failures']}회 / "
+            f"거절 {blink['rejected']}회"
+        )
+        sched = blink["scheduler"]
+        lines.append(
+            "- Blink 대기열: "
+            + " / ".join(
+                f"{name} {sched['queued'][name]}건 "
+                f"(평균 {w['avg_wait_ms']:.0f}ms, 최대 {w['max_wait_ms']:.0f}ms)"
+                for name, w in sched["waits"].items()
+            )
+        )
+        logs = logging_stats()
+        lines.append(
+            f"- 로그: 출력 대기 {logs['queued']}건 / 버림 {logs['dropped']}건 / "
+            f"샘플링 생략 {logs['suppressed']}건"
+        )
+        qr = qr_renderer.stats()
+        lines.append(
+            f"- 입금 QR: 생성 {qr['renders']}회 / 캐시 적중 {qr['hits']}회 / "
+            f"평균 {qr['avg_ms']:.1f}ms / 최대 {qr['max_ms']:.1f}ms"
+        )
+        for name, stats in (
+            ("채널 락", self._channel_locks.stats()),
+            ("유저 락", user_locks.stats()),
+        ):
+            lines.append(
+                f"- {name}: 획득 {stats['acquired']}회 / 대기 {stats['contended']}회 / "
+                f"평균 {stats['avg_wait_ms']:.2f}ms / 최대 {stats['max_wait_ms']:.2f}ms / "
+                f"키 {stats['live_keys']}개"
+            )
+        await interaction.response.send_message(
+            "📊 **러시안 룰렛 내부 지표**\n" + "\n".join(lines),
+            ephemeral=True,
+        )
+
 
 async def setup(bot: commands.Bot) -> None:
     await bot.add_cog(RussianRoulette(bot))
@@ -0,0 +1,227 @@
+# rr_session.py
+import random
+
+CYLINDER_SIZE = 6      # 실린더는 항상 6칸
+MIN_PLAYERS = 1        # 테스트용: 1명도 허용 (실제 서비스에서는 2로 변경 가능)
+
+
+class PullResult:
+    """방아쇠 한 번의 결과"""
+
+    __slots__ = ("shot", "dead", "winner_user_id", "prize_amount", "next_user_id", "finished")
+
+    def __init__(self) -> None:
+        self.shot = False
+        self.dead = False
+        self.winner_user_id: int | None = None
+        self.prize_amount = 0
+        self.next_user_id: int | None = None
+        self.finished = False
+
+
+class GameSession:
+    """
+    진행중 / 대기중 러시안 룰렛 게임 1개의 메모리 상태.
+    - 판정은 전부 메모리에서 처리하고, DB(rr_games / rr_players / rr_state)는
+      상태가 바뀔 때마다 한 번에 기록하는 저널 역할만 한다.
+    - seats[i] 는 order_index = i + 1 인 플레이어의 user_id
+    """
+
+    __slots__ = (
+        "game_id",
+        "channel_id",
+        "host_user_id",
+        "entry_fee",
+        "max_players",
+        "bullet_count",
+        "status",
+        "seats",
+        "alive",
+        "cylinder",
+        "round_number",
+        "shot_in_round",
+        "current_turn",
+    )
+
+    def __init__(
+        self,
+        game_id: int,
+        channel_id: int,
+        host_user_id: int,
+        entry_fee: int,
+        max_players: int,
+        bullet_count: int,
+        status: str = "WAITING",
+    ) -> None:
+        self.game_id = game_id
+        self.channel_id = channel_id
+        self.host_user_id = host_user_id
+        self.entry_fee = entry_fee
+        self.max_players = max_players
+        self.bullet_count = bullet_count
+        self.status = status
+        self.seats: list[int] = []
+        self.alive: set[int] = set()
+        self.cylinder = ""
+        self.round_number = 0
+        self.shot_in_round = 0
+        self.current_turn = 0
+
+    # ---------------- 조회 ----------------
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("WAITING", "RUNNING")
+
+    @property
+    def player_count(self) -> int:
+        return len(self.seats)
+
+    def order_index_of(self, user_id: int) -> int | None:
+        try:
+            return self.seats.index(user_id) + 1
+        except ValueError:
+            return None
+
+    def user_at(self, order_index: int) -> int | None:
+        if 1 <= order_index <= len(self.seats):
+            return self.seats[order_index - 1]
+        return None
+
+    def alive_orders(self) -> list[int]:
+        """살아있는 플레이어들의 order_index (오름차순)"""
+        return [i + 1 for i, uid in enumerate(self.seats) if uid in self.alive]
+
+    def next_user_id(self) -> int | None:
+        """현재 턴(current_turn) 플레이어의 user_id"""
+        if not self.alive:
+            return None
+        return self.user_at(self.current_turn)
+
+    # ---------------- 상태 변경 ----------------
+
+    def copy(self) -> "GameSession":
+        """
+        전이를 미리 계산할 복사본. (DB 에 기록이 끝난 뒤에만 apply() 로 원본에 반영)
+        """
+        clone = GameSession.__new__(GameSession)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        clone.seats = list(self.seats)
+        clone.alive = set(self.alive)
+        return clone
+
+    def apply(self, other: "GameSession") -> None:
+        """커밋된 복사본(other)의 상태를 이 세션에 반영"""
+        if other.game_id != self.game_id:
+            raise RuntimeError("다른 게임의 상태는 반영할 수 없습니다.")
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
+        self.seats = list(other.seats)
+        self.alive = set(other.alive)
+
+    def add_player(self, user_id: int) -> int:
+        """참가 등록 후 order_index 반환"""
+        self.check_join(user_id)
+        self.seats.append(user_id)
+        self.alive.add(user_id)
+        return len(self.seats)
+
+    def check_join(self, user_id: int) -> None:
+        """참가 가능 여부만 검사 (상태는 바꾸지 않음)"""
+        if self.status != "WAITING":
+            raise ValueError("이미 시작되었거나 종료된 게임입니다.")
+        if user_id in self.seats:
+            raise ValueError("이미 이 게임에 참가했습니다.")
+        if len(self.seats) >= self.max_players:
+            raise ValueError("이미 최대 인원에 도달한 게임입니다.")
+
+    def start(self) -> None:
+        """게임 시작: 모든 참가자를 alive 로 만들고 첫 라운드를 시작"""
+        if len(self.seats) < MIN_PLAYERS:
+            raise ValueError(f"최소 {MIN_PLAYERS}명 이상 모여야 게임을 시작할 수 있습니다.")
+        self.alive = set(self.seats)
+        self.status = "RUNNING"
+        self.start_round()
+
+    def start_round(self) -> None:
+        """
+        새 라운드를 시작한다.
+        - 실린더는 항상 6칸, 총알은 bullet_count 발
+        - alive 인 플레이어들만 턴을 돌린다.
+        """
+        if len(self.alive) < MIN_PLAYERS:
+            raise ValueError(f"최소 {MIN_PLAYERS}명 이상 모여야 게임을 시작할 수 있습니다.")
+
+        bullet_count = min(self.bullet_count, CYLINDER_SIZE)
+        cylinder_list = ["0"] * CYLINDER_SIZE
+        for pos in random.sample(range(CYLINDER_SIZE), bullet_count):
+            cylinder_list[pos] = "1"
+
+        self.round_number += 1
+        self.cylinder = "".join(cylinder_list)
+        self.shot_in_round = 0
+        # 살아있는 사람 중 order_index 가 가장 작은 사람부터
+        self.current_turn = self.alive_orders()[0]
+
+    def pull(self, user_id: int) -> PullResult:
+        """
+        방아쇠를 당긴다.
+        - 한 라운드에서 누군가 죽으면 라운드 종료
+        - 살아있는 사람이 1명 남으면 게임 종료 (상금 = 참가자 수 * entry_fee)
+        - 2명 이상 남으면 새 라운드 시작
+        """
+        if self.status != "RUNNING":
+            raise ValueError("아직 시작되지 않았거나 이미 종료된 게임입니다.")
+
+        turn_user_id = self.user_at(self.current_turn)
+        if turn_user_id is None:
+            raise RuntimeError("현재 차례인 플레이어를 찾을 수 없습니다.")
+        if turn_user_id not in self.alive:
+            raise RuntimeError("현재 플레이어는 이미 사망 처리되었습니다.")
+        if turn_user_id != user_id:
+            raise ValueError("지금은 당신의 차례가 아닙니다.")
+
+        result = PullResult()
+
+        # cylinder 에서 현재 칸 확인 (범위를 넘어가면 데이터 이상이므로 빈 클릭 처리)
+        idx = self.shot_in_round
+        self.shot_in_round += 1
+        result.shot = 0 <= idx < len(self.cylinder) and self.cylinder[idx] == "1"
+
+        if result.shot:
+            result.dead = True
+            self.alive.discard(user_id)
+
+        total_players = len(self.seats)
+
+        # 멀티 플레이 모드: 1명만 살아남으면 게임 종료
+        if total_players > 1 and len(self.alive) <= 1:
+            if self.alive:
+                result.winner_user_id = next(iter(self.alive))
+                result.prize_amount = self.entry_fee * total_players
+            result.finished = True
+            self.status = "FINISHED"
+            return result
+
+        if result.shot:
+            # 혼자 테스트 모드: 한 명뿐이면 다음 라운드에 다시 살아난 상태로 계속 진행
+            if total_players <= 1:
+                self.alive = set(self.seats)
+            self.start_round()
+            result.next_user_id = self.next_user_id()
+            return result
+
+        # 빈 클릭: 같은 라운드에서 다음 alive 플레이어로 턴을 넘긴다.
+        order_list = self.alive_orders()
+        if self.current_turn in order_list:
+            pos = order_list.index(self.current_turn)
+            self.current_turn = order_list[(pos + 1) % len(order_list)]
+        else:
+            self.current_turn = order_list[0]
+        result.next_user_id = self.next_user_id()
+        return result
+
+    def finish(self, status: str) -> None:
+        """게임을 종료 상태(FINISHED / CANCELLED)로 전환"""
+        self.status = status
@@ -0,0 +1,58 @@
+# tests/conftest.py
+import asyncio
+import os
+import pathlib
+import sys
+from typing import Any, Awaitable, Callable, Iterator, TypeVar
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# config 는 import 시점에 환경 변수를 읽으므로 그 전에 테스트용 값으로 정한다.
+# (.env 의 실제 키로 Blink 에 요청하지 않도록 항상 덮어쓴다)
+os.environ.update(
+    {
+        "BLINK_API_URL": "http://127.0.0.1:9/graphql",
+        "BLINK_API_KEY": "test",
+        "BLINK_WALLET_ID": "test-wallet",
+        "DB_GROUP_COMMIT_MS": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+)
+
+T = TypeVar("T")
+
+
+@pytest.fixture
+def fresh_db(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[str]:
+    """테스트마다 빈 DB 파일 (마이그레이션은 첫 get_db() 에서 적용)"""
+    import db
+    import models_user
+
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    # 모듈 전역 락은 테스트마다 다른 이벤트 루프에서 쓰이므로 새로 만든다.
+    monkeypatch.setattr(db, "_open_lock", asyncio.Lock())
+    monkeypatch.setattr(db, "_write_lock", asyncio.Lock())
+    models_user.balance_cache.clear()
+    models_user._known_users.clear()
+    yield path
+
+
+@pytest.fixture
+def run(fresh_db: str) -> Callable[[Awaitable[T]], T]:
+    """코루틴을 새 이벤트 루프에서 실행하고, 끝나면 DB 커넥션을 닫는다."""
+    import db
+
+    def _run(coro: Awaitable[T]) -> T:
+        async def main() -> Any:
+            try:
+                return await coro
+            finally:
+                await db.close_db()
+
+        return asyncio.run(main())
+
+    return _run
@@ -0,0 +1,184 @@
+# tests/test_blink_client.py
+import asyncio
+from typing import Any
+
+import pytest
+
+import blink_client_rr as blink
+from blink_client_rr import (
+    BlinkError,
+    BlinkTransientError,
+    BlinkUnavailable,
+    CircuitBreaker,
+    RequestScheduler,
+)
+
+
+class FakePost:
+    """_post 대역: results 를 앞에서부터 하나씩 돌려준다 (예외면 던지고, Event 면 set 될 때까지 대기)"""
+
+    def __init__(self, *results: Any) -> None:
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        self.calls += 1
+        result = self.results.pop(0) if self.results else {"data": {"ok": True}}
+        if isinstance(result, asyncio.Event):
+            await result.wait()
+            return {"data": {"ok": True}}
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
+@pytest.fixture
+def breaker(monkeypatch: pytest.MonkeyPatch) -> CircuitBreaker:
+    # 실패 1번이면 OPEN, cooldown 0 이라 바로 HALF_OPEN (시험 요청 1개)
+    fresh = CircuitBreaker(threshold=1, cooldown=0)
+    monkeypatch.setattr(blink, "_breaker", fresh)
+    monkeypatch.setattr(blink, "_scheduler", RequestScheduler(rate=0, burst=1))
+    monkeypatch.setattr(blink, "BLINK_RETRY_BASE_SEC", 0)
+    return fresh
+
+
+def _use_post(monkeypatch: pytest.MonkeyPatch, post: FakePost) -> FakePost:
+    monkeypatch.setattr(blink, "_post", post)
+    return post
+
+
+def test_breaker_state_machine() -> None:
+    async def main() -> None:
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        assert breaker.before_request() is False
+        breaker.record_failure()
+        assert breaker.state == "CLOSED"
+        breaker.record_failure()
+        assert breaker.state == "OPEN"
+        with pytest.raises(BlinkUnavailable):
+            breaker.before_request()
+        assert breaker.rejected == 1
+
+        # cooldown 이 지나면 시험 요청 1개만 통과
+        assert breaker.opened_at is not None
+        breaker.opened_at -= 60
+        assert breaker.state == "HALF_OPEN"
+        assert breaker.before_request() is True
+        with pytest.raises(BlinkUnavailable):
+            breaker.before_request()
+
+        # 시험 요청 실패 → 다시 OPEN, 성공 → CLOSED
+        breaker.record_failure()
+        assert breaker.state == "OPEN"
+        breaker.opened_at -= 60
+        assert breaker.before_request() is True
+        breaker.record_success()
+        assert breaker.state == "CLOSED" and breaker.failures == 0
+
+    asyncio.run(main())
+
+
+def test_retries_transient_errors(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    post = _use_post(monkeypatch, FakePost(BlinkTransientError("503"), {"data": {"ok": 1}}))
+    breaker.threshold = 10
+
+    result = asyncio.run(blink._blink_request("query", operation="lnInvoicePaymentStatus"))
+    assert result == {"ok": 1}
+    assert post.calls == 2
+    assert breaker.state == "CLOSED" and breaker.failures == 0
+
+
+def test_payment_send_is_not_retried(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    post = _use_post(monkeypatch, FakePost(BlinkTransientError("timeout"), {"data": {}}))
+    breaker.threshold = 10
+
+    with pytest.raises(BlinkTransientError):
+        asyncio.run(blink._blink_request("mutation", operation="lnInvoicePaymentSend"))
+    assert post.calls == 1
+
+
+def test_response_errors_do_not_trip_breaker(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    post = _use_post(monkeypatch, FakePost(BlinkError("HTTP 400")))
+
+    with pytest.raises(BlinkError):
+        asyncio.run(blink._blink_request("query", operation="lnInvoicePaymentStatus"))
+    assert post.calls == 1
+    assert breaker.state == "CLOSED"
+
+
+async def _open(breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch) -> None:
+    """transient 실패 1번으로 브레이커를 연다 (cooldown 0 → 바로 HALF_OPEN)"""
+    _use_post(monkeypatch, FakePost(BlinkTransientError("503")))
+    with pytest.raises(BlinkTransientError):
+        await blink._blink_request("mutation", operation="lnInvoicePaymentSend")
+    assert breaker.state == "HALF_OPEN"
+
+
+def test_cancelled_probe_releases_half_open(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """시험 요청이 취소되면 자리를 돌려놓아서 다음 요청이 다시 시험 요청이 된다."""
+
+    async def main() -> None:
+        await _open(breaker, monkeypatch)
+        post = _use_post(monkeypatch, FakePost(asyncio.Event()))
+        probe = asyncio.create_task(blink._blink_request("query", operation="walletBalance"))
+        while post.calls == 0:
+            await asyncio.sleep(0)
+        # 시험 요청이 진행 중인 동안 다른 요청은 거절
+        with pytest.raises(BlinkUnavailable):
+            await blink._blink_request("query", operation="walletBalance")
+
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert await blink._blink_request("query", operation="walletBalance") == {"ok": True}
+        assert breaker.state == "CLOSED"
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("error", [RuntimeError("bug"), KeyError("data")])
+def test_unexpected_error_releases_probe(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch, error: Exception
+) -> None:
+    """BlinkError 가 아닌 예외로 끝난 시험 요청도 자리를 돌려놓는다."""
+
+    async def main() -> None:
+        await _open(breaker, monkeypatch)
+        _use_post(monkeypatch, FakePost(error))
+        with pytest.raises(type(error)):
+            await blink._blink_request("query", operation="walletBalance")
+
+        _use_post(monkeypatch, FakePost())
+        assert await blink._blink_request("query", operation="walletBalance") == {"ok": True}
+        assert breaker.state == "CLOSED"
+
+    asyncio.run(main())
+
+
+def test_queue_timeout_releases_probe(
+    breaker: CircuitBreaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def never_acquire(priority: int) -> None:
+        await asyncio.Event().wait()
+
+    async def main() -> None:
+        await _open(breaker, monkeypatch)
+        with monkeypatch.context() as m:
+            m.setitem(blink.OPERATIONS, "walletBalance", (0.01, True, blink.PRIORITY_POLL))
+            m.setattr(blink._scheduler, "acquire", never_acquire)
+            with pytest.raises(BlinkTransientError, match="대기열"):
+                await blink._blink_request("query", operation="walletBalance")
+
+        _use_post(monkeypatch, FakePost())
+        assert await blink._blink_request("query", operation="walletBalance") == {"ok": True}
+
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+# tests/test_bolt11.py
+import pytest
+
+import bolt11
+from bolt11 import SAMPLE_INVOICE, Bolt11Error, decode
+
+# BOLT11 규격 문서 예제 인보이스의 기대값
+SAMPLE_PAYMENT_HASH = "0001020304050607080900010203040506070809000102030405060708090102"
+SAMPLE_PAYMENT_SECRET = "11" * 32
+SAMPLE_TIMESTAMP = 1496314658
+
+
+def _reencode(invoice: str, hrp: str) -> str:
+    """예제 인보이스의 데이터는 그대로 두고 HRP 만 바꿔서 체크섬을 다시 계산"""
+    _, words = bolt11._bech32_decode(invoice)
+    values = bolt11._hrp_expand(hrp) + words + [0] * 6
+    polymod = bolt11._polymod(values) ^ 1
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + "1" + "".join(bolt11.CHARSET[w] for w in words + checksum)
+
+
+def test_decode_spec_example() -> None:
+    inv = decode(SAMPLE_INVOICE)
+    assert inv.network == "mainnet"
+    assert inv.amount_msat == 250_000_000
+    assert inv.amount_sats == 250_000
+    assert inv.timestamp == SAMPLE_TIMESTAMP
+    assert inv.expiry == 60
+    assert inv.expires_at == SAMPLE_TIMESTAMP + 60
+    assert inv.payment_hash == SAMPLE_PAYMENT_HASH
+    assert inv.payment_secret == SAMPLE_PAYMENT_SECRET
+    assert inv.description == "1 cup coffee"
+    assert inv.description_hash is None
+    assert inv.min_final_cltv_expiry == bolt11.DEFAULT_MIN_FINAL_CLTV
+    assert len(inv.signature) == 130
+
+
+def test_decode_accepts_uppercase_and_uri_prefix() -> None:
+    assert decode(SAMPLE_INVOICE.upper()).payment_hash == SAMPLE_PAYMENT_HASH
+    assert decode(f"  lightning:{SAMPLE_INVOICE}\n").payment_hash == SAMPLE_PAYMENT_HASH
+
+
+def test_is_expired() -> None:
+    inv = decode(SAMPLE_INVOICE)
+    assert not inv.is_expired(now=SAMPLE_TIMESTAMP + 59)
+    assert inv.is_expired(now=SAMPLE_TIMESTAMP + 60)
+
+
+@pytest.mark.parametrize(
+    ("hrp", "network", "amount_msat", "amount_sats"),
+    [
+        ("lnbc", "mainnet", None, None),
+        ("lnbc1m", "mainnet", 100_000_000, 100_000),
+        ("lnbc20n", "mainnet", 2_000, 2),
+        ("lnbc10p", "mainnet", 1, 1),            # 1 msat → 1 sat 로 올림
+        ("lnbc2", "mainnet", 2 * 10**11, 2 * 10**8),
+        ("lntb1u", "testnet", 100_000, 100),
+        ("lntbs1u", "signet", 100_000, 100),
+        ("lnbcrt1u", "regtest", 100_000, 100),
+    ],
+)
+def test_hrp_network_and_amount(
+    hrp: str, network: str, amount_msat: int | None, amount_sats: int | None
+) -> None:
+    inv = decode(_reencode(SAMPLE_INVOICE, hrp))
+    assert inv.network == network
+    assert inv.amount_msat == amount_msat
+    assert inv.amount_sats == amount_sats
+    assert inv.payment_hash == SAMPLE_PAYMENT_HASH
+
+
+# 0 으로 시작하는 금액 / 알 수 없는 단위 / 10 의 배수가 아닌 pico / 알 수 없는 네트워크 / ln 아님
+@pytest.mark.parametrize("hrp", ["lnbc01u", "lnbc1x", "lnbc15p", "lnxx1u", "bc1u"])
+def test_invalid_hrp(hrp: str) -> None:
+    with pytest.raises(Bolt11Error):
+        decode(_reencode(SAMPLE_INVOICE, hrp))
+
+
+def test_invalid_strings() -> None:
+    # 체크섬: 데이터 한 글자 변경
+    pos = len(SAMPLE_INVOICE) // 2
+    flipped = "q" if SAMPLE_INVOICE[pos] != "q" else "p"
+    with pytest.raises(Bolt11Error, match="체크섬"):
+        decode(SAMPLE_INVOICE[:pos] + flipped + SAMPLE_INVOICE[pos + 1:])
+    with pytest.raises(Bolt11Error, match="대소문자"):
+        decode(SAMPLE_INVOICE[:10] + SAMPLE_INVOICE[10:].upper())
+    with pytest.raises(Bolt11Error, match="허용되지 않는 문자"):
+        decode(SAMPLE_INVOICE[:-1] + "b")
+    with pytest.raises(Bolt11Error):
+        decode("lnbc1qqqqqqq")
+    with pytest.raises(Bolt11Error):
+        decode("")
+
+
+def test_bolt11_error_is_value_error() -> None:
+    # 기존 호출부가 ValueError 로 잡고 있어도 동작하도록
+    assert issubclass(Bolt11Error, ValueError)
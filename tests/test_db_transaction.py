@@ -0,0 +1,79 @@
+# tests/test_db_transaction.py
+import asyncio
+from typing import Callable
+
+import pytest
+
+import db
+from db import read_db, transaction
+
+
+@pytest.fixture(params=[0, 5], ids=["direct", "group-commit"])
+def group_commit(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> int:
+    monkeypatch.setattr(db, "DB_GROUP_COMMIT_MS", request.param)
+    return int(request.param)
+
+
+async def _insert_user(discord_user_id: int) -> None:
+    async with transaction() as tx:
+        await tx.execute(
+            "INSERT INTO users (discord_user_id, balance) VALUES (?, 0)", (discord_user_id,)
+        )
+
+
+async def _user_exists(discord_user_id: int) -> bool:
+    async with read_db() as conn:
+        cur = await conn.execute(
+            "SELECT 1 FROM users WHERE discord_user_id = ?", (discord_user_id,)
+        )
+        return await cur.fetchone() is not None
+
+
+def test_transaction_started_from_on_commit_commits(run: Callable, group_commit: int) -> None:
+    """
+    on_commit 콜백이 시작한 태스크의 transaction() 은 이미 커밋된 트랜잭션에 합류하지 않고
+    새 트랜잭션으로 커밋되어야 한다. (그룹 커밋의 flush 태스크에서 콜백이 실행되는 경우 포함)
+    """
+
+    async def main() -> None:
+        events: list[str] = []
+        tasks: list["asyncio.Task[None]"] = []
+
+        async def follow_up() -> None:
+            async with transaction() as tx:
+                await tx.execute("INSERT INTO users (discord_user_id, balance) VALUES (2, 0)")
+                tx.on_commit(lambda: events.append("second committed"))
+
+        def on_first_commit() -> None:
+            events.append(f"first committed (tx={db._current_tx.get()})")
+            tasks.append(asyncio.create_task(follow_up()))
+
+        async with transaction() as tx:
+            await tx.execute("INSERT INTO users (discord_user_id, balance) VALUES (1, 0)")
+            tx.on_commit(on_first_commit)
+
+        await asyncio.wait_for(asyncio.gather(*tasks), 2)
+        assert events == ["first committed (tx=None)", "second committed"]
+        assert await _user_exists(1) and await _user_exists(2)
+
+    run(main())
+
+
+def test_group_commit_batches_and_rolls_back_one_unit(run: Callable, group_commit: int) -> None:
+    """같은 배치에 섞인 작업 단위 중 실패한 것만 롤백되고 나머지는 커밋된다."""
+
+    async def failing() -> None:
+        async with transaction() as tx:
+            await tx.execute("INSERT INTO users (discord_user_id, balance) VALUES (99, 0)")
+            raise RuntimeError("boom")
+
+    async def main() -> None:
+        results = await asyncio.gather(
+            _insert_user(10), failing(), _insert_user(11), return_exceptions=True
+        )
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], RuntimeError)
+        assert await _user_exists(10) and await _user_exists(11)
+        assert not await _user_exists(99)
+
+    run(main())
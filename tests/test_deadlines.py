@@ -0,0 +1,120 @@
+# tests/test_deadlines.py
+import asyncio
+from typing import Any
+
+from deadlines import DeadlineScheduler
+
+
+class Recorder:
+    """on_expire 대역: 호출마다 받은 키 목록을 기록하고, fail_first 면 첫 호출에서 예외"""
+
+    def __init__(self, fail_first: bool = False) -> None:
+        self.calls: list[list[Any]] = []
+        self.fail_first = fail_first
+        self.fired = asyncio.Event()
+
+    async def __call__(self, keys: list[Any]) -> None:
+        self.calls.append(sorted(keys))
+        self.fired.set()
+        if self.fail_first and len(self.calls) == 1:
+            raise RuntimeError("callback bug")
+
+
+def test_expired_keys_are_batched() -> None:
+    async def main() -> None:
+        on_expire = Recorder()
+        scheduler = DeadlineScheduler(on_expire, name="test-deadlines")
+        when = asyncio.get_running_loop().time() + 0.02
+        for key in ("a", "b", "c"):
+            scheduler.schedule_at(key, when)
+        assert len(scheduler) == 3
+
+        await asyncio.wait_for(on_expire.fired.wait(), 1)
+        assert on_expire.calls == [["a", "b", "c"]]
+        assert len(scheduler) == 0
+        await scheduler.close()
+
+    asyncio.run(main())
+
+
+def test_reschedule_replaces_deadline() -> None:
+    async def main() -> None:
+        on_expire = Recorder()
+        scheduler = DeadlineScheduler(on_expire, name="test-deadlines")
+        scheduler.schedule("game", 0.02)
+        scheduler.schedule("game", 0.5)      # 연장: 앞의 만료 시각은 무시된다.
+        deadline = scheduler.deadline("game")
+
+        await asyncio.sleep(0.06)
+        assert on_expire.calls == []
+        assert "game" in scheduler and scheduler.deadline("game") == deadline
+
+        # 당기는 것도 가능 (잠들어 있는 러너를 깨운다)
+        scheduler.schedule("game", 0.01)
+        await asyncio.wait_for(on_expire.fired.wait(), 0.3)
+        assert on_expire.calls == [["game"]]
+        await asyncio.sleep(0.05)
+        assert on_expire.calls == [["game"]]
+        await scheduler.close()
+
+    asyncio.run(main())
+
+
+def test_cancel() -> None:
+    async def main() -> None:
+        on_expire = Recorder()
+        scheduler = DeadlineScheduler(on_expire, name="test-deadlines")
+        scheduler.schedule("keep", 0.04)
+        scheduler.schedule("drop", 0.01)
+        scheduler.cancel("drop")
+        scheduler.cancel("missing")         # 없는 키는 무시
+        assert "drop" not in scheduler and len(scheduler) == 1
+
+        await asyncio.wait_for(on_expire.fired.wait(), 1)
+        assert on_expire.calls == [["keep"]]
+        await scheduler.close()
+
+    asyncio.run(main())
+
+
+def test_failing_callback_does_not_stop_scheduler() -> None:
+    async def main() -> None:
+        on_expire = Recorder(fail_first=True)
+        scheduler = DeadlineScheduler(on_expire, name="test-deadlines")
+        scheduler.schedule("first", 0.01)
+        scheduler.schedule("second", 0.05)
+
+        for _ in range(100):
+            if len(on_expire.calls) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert on_expire.calls == [["first"], ["second"]]
+        assert scheduler._task is not None and not scheduler._task.done()
+        await scheduler.close()
+
+    asyncio.run(main())
+
+
+def test_close_cancels_runner() -> None:
+    async def main() -> None:
+        on_expire = Recorder()
+        scheduler = DeadlineScheduler(on_expire, name="test-deadlines")
+        scheduler.schedule("game", 0.05)
+        task = scheduler._task
+        assert task is not None
+
+        await scheduler.close()
+        assert task.cancelled()
+        assert scheduler._task is None
+        await scheduler.close()             # 두 번 닫아도 문제 없음
+
+        await asyncio.sleep(0.1)
+        assert on_expire.calls == []
+
+        # 닫은 뒤에 다시 등록하면 러너가 새로 시작된다.
+        scheduler.schedule("game", 0.01)
+        await asyncio.wait_for(on_expire.fired.wait(), 1)
+        assert on_expire.calls == [["game"]]
+        await scheduler.close()
+
+    asyncio.run(main())
@@ -0,0 +1,215 @@
+# tests/test_deposit_watcher.py
+import time
+from typing import Any, Callable, Optional
+
+import pytest
+
+import deposit_watcher as dw
+from blink_client_rr import BlinkTransientError
+from models_invoice import add_pending_invoice, load_pending_invoices
+from models_user import get_balance
+
+USER = 2001
+
+
+class FakeBlink:
+    """check_payments 대역: statuses 의 상태를 돌려주고, fail 이 켜져 있으면 요청 전체 실패"""
+
+    def __init__(self) -> None:
+        self.statuses: dict[str, Optional[str]] = {}
+        self.fail = False
+        self.calls: list[list[str]] = []
+
+    async def check_payments(self, payment_requests: list[str]) -> dict[str, Optional[str]]:
+        self.calls.append(list(payment_requests))
+        if self.fail:
+            raise BlinkTransientError("timeout")
+        return {pr: self.statuses.get(pr, "PENDING") for pr in payment_requests}
+
+
+@pytest.fixture
+def blink(monkeypatch: pytest.MonkeyPatch) -> FakeBlink:
+    fake = FakeBlink()
+    monkeypatch.setattr(dw, "check_payments", fake.check_payments)
+    return fake
+
+
+async def _watch(
+    watcher: dw.DepositWatcher,
+    payment_hash: str,
+    expires_at: float,
+    events: list[str],
+    amount_sats: int = 100,
+) -> None:
+    await add_pending_invoice(payment_hash, USER, f"lnbc-{payment_hash}", amount_sats, int(expires_at))
+
+    async def on_paid(new_balance: int) -> None:
+        events.append(f"paid:{payment_hash}:{new_balance}")
+
+    async def on_expired() -> None:
+        events.append(f"expired:{payment_hash}")
+
+    watcher.watch(
+        payment_hash,
+        f"lnbc-{payment_hash}",
+        amount_sats,
+        USER,
+        on_paid=on_paid,
+        on_expired=on_expired,
+        expires_at=expires_at,
+    )
+
+
+def _watcher(**kwargs: Any) -> dw.DepositWatcher:
+    # 루프는 돌리지 않고 _tick() 을 직접 호출한다.
+    return dw.DepositWatcher(interval=3600, name="test-watcher", **kwargs)
+
+
+def test_failed_check_does_not_expire(run: Callable, blink: FakeBlink) -> None:
+    """만료 시각이 지나도 조회가 실패하면 만료하지 않고, 다음 조회에서 결제를 반영한다."""
+
+    async def main() -> None:
+        watcher = _watcher()
+        events: list[str] = []
+        await _watch(watcher, "h1", time.time() - 1, events)
+
+        blink.fail = True
+        await watcher._tick()
+        assert "h1" in watcher and events == []
+        assert [inv.payment_hash for inv in await load_pending_invoices()] == ["h1"]
+
+        blink.fail = False
+        blink.statuses["lnbc-h1"] = "PAID"
+        await watcher._tick()
+        assert "h1" not in watcher
+        assert events == ["paid:h1:100"]
+        assert await get_balance(USER) == 100
+        await watcher.close()
+
+    run(main())
+
+
+def test_expires_only_after_confirmed_unpaid(run: Callable, blink: FakeBlink) -> None:
+    """Blink 가 EXPIRED 라고 확인해준 인보이스는 바로, PENDING 이면 유예 시간이 지난 뒤 만료한다."""
+
+    async def main() -> None:
+        watcher = _watcher(expire_grace=60)
+        events: list[str] = []
+        now = time.time()
+        await _watch(watcher, "expired", now - 1, events)
+        await _watch(watcher, "pending", now - 1, events)
+        await _watch(watcher, "stale", now - 120, events)
+        await _watch(watcher, "future", now + 600, events)
+        blink.statuses["lnbc-expired"] = "EXPIRED"
+        blink.statuses["lnbc-future"] = "EXPIRED"
+
+        await watcher._tick()
+        assert sorted(events) == ["expired:expired", "expired:stale"]
+        assert "pending" in watcher and "future" in watcher
+        remaining = {inv.payment_hash for inv in await load_pending_invoices()}
+        assert remaining == {"pending", "future"}
+        await watcher.close()
+
+    run(main())
+
+
+def test_per_item_error_does_not_expire(run: Callable, blink: FakeBlink) -> None:
+    """배치 안에서 개별 조회가 실패한(None) 인보이스는 만료하지 않는다."""
+
+    async def main() -> None:
+        watcher = _watcher(expire_grace=0)
+        events: list[str] = []
+        await _watch(watcher, "h1", time.time() - 1, events)
+        blink.statuses["lnbc-h1"] = None
+
+        await watcher._tick()
+        assert "h1" in watcher and events == []
+        await watcher.close()
+
+    run(main())
+
+
+def test_settle_failure_keeps_entry(
+    run: Callable, blink: FakeBlink, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """입금 반영(DB)이 실패하면 감시 목록에 남겨서 다음 조회에서 다시 반영한다."""
+
+    async def main() -> None:
+        watcher = _watcher()
+        events: list[str] = []
+        await _watch(watcher, "h1", time.time() + 600, events)
+        blink.statuses["lnbc-h1"] = "PAID"
+
+        async def broken_settle(payment_hash: str) -> Optional[int]:
+            raise RuntimeError("database is locked")
+
+        with monkeypatch.context() as m:
+            m.setattr(dw, "settle_invoice", broken_settle)
+            await watcher._tick()
+        assert "h1" in watcher and events == []
+
+        await watcher._tick()
+        assert "h1" not in watcher
+        assert events == ["paid:h1:100"]
+        await watcher.close()
+
+    run(main())
+
+
+class FakePush:
+    """BlinkSubscriber 대역: 항상 연결된 상태"""
+
+    connected = True
+
+    def add_reconnect_listener(self, callback: object) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    async def subscribe_my_updates(self, callback: object) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def test_push_mode_checks_expiring_invoices(run: Callable, blink: FakeBlink) -> None:
+    """push 가 연결되어 있으면 만료 시각이 지난 건만 조회하고, 조회가 실패하면 만료하지 않는다."""
+
+    async def main() -> None:
+        watcher = _watcher(expire_grace=0, push=FakePush())
+        events: list[str] = []
+        await _watch(watcher, "old", time.time() - 1, events)
+        await _watch(watcher, "new", time.time() + 600, events)
+
+        blink.fail = True
+        await watcher._tick()
+        assert blink.calls == [["lnbc-old"]]
+        assert "old" in watcher and events == []
+
+        blink.fail = False
+        blink.statuses["lnbc-old"] = "EXPIRED"
+        await watcher._tick()
+        assert blink.calls[-1] == ["lnbc-old"]
+        assert events == ["expired:old"]
+        assert "new" in watcher
+        await watcher.close()
+
+    run(main())
+
+
+def test_push_mode_credits_payment_found_at_expiry(run: Callable, blink: FakeBlink) -> None:
+    """구독 이벤트를 놓쳤어도 만료 직전의 조회에서 결제가 확인되면 입금한다."""
+
+    async def main() -> None:
+        watcher = _watcher(push=FakePush())
+        events: list[str] = []
+        await _watch(watcher, "h1", time.time() - 1, events)
+        blink.statuses["lnbc-h1"] = "PAID"
+
+        await watcher._tick()
+        assert events == ["paid:h1:100"]
+        await watcher.close()
+
+    run(main())
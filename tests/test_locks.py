@@ -0,0 +1,80 @@
+# tests/test_locks.py
+import asyncio
+
+from locks import KeyedLocks
+
+
+def test_hold_acquires_in_sorted_order() -> None:
+    """hold(3, 1, 2) 는 1 → 2 → 3 순서로 잡으므로, 2 를 기다리는 동안 3 은 잡지 않는다."""
+
+    async def main() -> None:
+        locks = KeyedLocks("test")
+        entered = asyncio.Event()
+
+        async def multi() -> None:
+            async with locks.hold(3, 1, 2):
+                entered.set()
+
+        async with locks.hold(2):
+            task = asyncio.create_task(multi())
+            for _ in range(5):
+                await asyncio.sleep(0)
+            assert locks.get(1).locked()
+            assert not locks.get(3).locked()
+            assert not entered.is_set()
+        await asyncio.wait_for(task, 1)
+        assert entered.is_set()
+        assert not locks.get(1).locked() and not locks.get(3).locked()
+
+    asyncio.run(main())
+
+
+def test_overlapping_key_sets_do_not_deadlock() -> None:
+    async def main() -> None:
+        locks = KeyedLocks("test")
+        order: list[str] = []
+
+        async def worker(name: str, *keys: int) -> None:
+            for _ in range(20):
+                async with locks.hold(*keys):
+                    order.append(name)
+                    await asyncio.sleep(0)
+
+        # 인자 순서가 서로 반대여도 정렬해서 잡으므로 교착 상태가 생기지 않는다.
+        await asyncio.wait_for(
+            asyncio.gather(worker("a", 1, 2), worker("b", 2, 1), worker("c", 2, 3, 1)),
+            timeout=2,
+        )
+        assert sorted(order) == ["a"] * 20 + ["b"] * 20 + ["c"] * 20
+        assert locks.stats()["acquired"] == 20 * 2 + 20 * 2 + 20 * 3
+
+    asyncio.run(main())
+
+
+def test_duplicate_keys_are_locked_once() -> None:
+    async def main() -> None:
+        locks = KeyedLocks("test")
+        async with locks.hold(7, 7):
+            assert locks.get(7).locked()
+        assert locks.stats()["acquired"] == 1
+
+    asyncio.run(main())
+
+
+def test_released_keys_are_dropped() -> None:
+    """아무도 잡고 있지 않은 키는 WeakValueDictionary 에서 사라진다."""
+
+    async def main() -> None:
+        locks = KeyedLocks("test")
+        async with locks.hold(1, 2):
+            assert len(locks) == 2
+        assert len(locks) == 0
+
+        # 누군가 락 객체를 들고 있는 동안에는 같은 객체가 유지된다.
+        kept = locks.get(5)
+        assert locks.get(5) is kept and len(locks) == 1
+        del kept
+        assert len(locks) == 0
+        assert locks.stats()["live_keys"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+# tests/test_query_plans.py
+import pytest
+
+from db import check_query_plans, get_db
+from queries import HOT_PATH_QUERIES
+
+
+def test_hot_path_queries_use_indexes(run) -> None:
+    """마이그레이션까지 끝난 새 DB 에서 핫패스 쿼리에 전체 SCAN 이 없어야 한다."""
+
+    async def main() -> None:
+        await check_query_plans(await get_db())
+
+    run(main())
+
+
+def test_check_query_plans_reports_full_scans(run) -> None:
+    async def main() -> None:
+        unindexed = (("users by balance", "SELECT id FROM users WHERE balance > ?"),)
+        with pytest.raises(RuntimeError, match="users by balance"):
+            await check_query_plans(await get_db(), unindexed)
+
+    run(main())
+
+
+def test_hot_path_query_names_are_unique() -> None:
+    names = [name for name, _ in HOT_PATH_QUERIES]
+    assert len(names) == len(set(names))
@@ -0,0 +1,164 @@
+# tests/test_reconciler.py
+from typing import Callable
+
+import pytest
+
+import reconciler as rc
+from blink_client_rr import BlinkTransientError
+from models_reconcile import Liabilities, accept_reconciliation
+from models_user import change_balance
+
+
+class FakeWallet:
+    """get_wallet_balance 대역: balance 를 돌려주고, fail 이 켜져 있으면 BlinkError"""
+
+    def __init__(self, balance: int = 0) -> None:
+        self.balance = balance
+        self.fail = False
+        self.reads = 0
+
+    async def get_wallet_balance(self) -> int:
+        self.reads += 1
+        if self.fail:
+            raise BlinkTransientError("timeout")
+        return self.balance
+
+
+@pytest.fixture
+def wallet(monkeypatch: pytest.MonkeyPatch) -> FakeWallet:
+    fake = FakeWallet()
+    monkeypatch.setattr(rc, "get_wallet_balance", fake.get_wallet_balance)
+    return fake
+
+
+def _reconciler() -> rc.Reconciler:
+    return rc.Reconciler(interval=0, chunk_size=2, tolerance=0, name="test-reconciler")
+
+
+async def _deposit(wallet: FakeWallet, user_id: int, amount: int) -> None:
+    """지갑과 원장이 함께 움직이는 입금"""
+    wallet.balance += amount
+    await change_balance(user_id, amount, reason="deposit", ref=f"hash-{user_id}-{amount}")
+
+
+def test_ok_then_explained_change(run: Callable, wallet: FakeWallet) -> None:
+    """기준점 이후 원장으로 설명되는 drift 변화는 OK"""
+
+    async def main() -> None:
+        job = _reconciler()
+        for uid in range(1, 6):        # chunk_size 2 → 여러 페이지
+            await _deposit(wallet, uid, 100 * uid)
+        wallet.balance += 300           # 원장에 없는 여유분 (수수료 수입 등)
+
+        first = await job.run_once()
+        assert first.status == "OK" and first.baseline is None
+        assert first.liabilities.users == 5
+        assert first.liabilities.total == 1500
+        assert first.drift == 300
+
+        # 지갑 밖에서 부채만 늘어남 (debug 충전) → drift 가 50 줄지만 원장으로 설명됨
+        await change_balance(1, 50, reason="debug")
+        second = await job.run_once()
+        assert second.status == "OK"
+        assert second.baseline is not None and second.baseline.id == first.id
+        assert second.drift == 250
+        assert second.expected_change == -50 and second.unexplained == 0
+        assert [(r.reason, r.entries, r.amount) for r in second.reasons] == [("debug", 1, 50)]
+        assert [item.reason for item in second.items] == ["debug"]
+
+    run(main())
+
+
+def test_drift_shortfall_and_accept(run: Callable, wallet: FakeWallet) -> None:
+    async def main() -> None:
+        job = _reconciler()
+        await _deposit(wallet, 1, 1000)
+        wallet.balance += 300           # 원장에 없는 여유분 (수수료 수입 등)
+        assert (await job.run_once()).status == "OK"
+
+        # 원장 변화 없이 지갑만 줄어듦 → 설명 안 되는 변화
+        wallet.balance -= 200
+        drift = await job.run_once()
+        assert drift.status == "DRIFT"
+        assert drift.drift == 100 and drift.unexplained == -200
+
+        # 관리자가 확인하면 다음 대사의 기준점이 된다.
+        assert await accept_reconciliation(drift.id) is True
+        after_accept = await job.run_once()
+        assert after_accept.status == "OK"
+        assert after_accept.baseline is not None and after_accept.baseline.id == drift.id
+
+        # 지갑이 부채를 감당하지 못함
+        wallet.balance -= 500
+        shortfall = await job.run_once()
+        assert shortfall.status == "SHORTFALL" and shortfall.drift == -400
+
+    run(main())
+
+
+def test_wallet_error(run: Callable, wallet: FakeWallet) -> None:
+    async def main() -> None:
+        job = _reconciler()
+        await _deposit(wallet, 1, 1000)
+        wallet.fail = True
+        report = await job.run_once()
+        assert report.status == "ERROR"
+        assert report.wallet_balance is None and report.drift is None
+        assert report.error is not None and "timeout" in report.error
+        assert report.liabilities.total == 1000
+        # ERROR 는 기준점으로 받아들일 수 없다.
+        assert await accept_reconciliation(report.id) is False
+
+    run(main())
+
+
+def test_rescans_when_wallet_moves_during_scan(
+    run: Callable, wallet: FakeWallet, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """스캔 직후 들어온 입금: 스캔 시점 부채와 스캔 뒤 잔액을 비교하지 않고 다시 스캔한다."""
+    scan = rc.scan_liabilities
+    scans = 0
+
+    async def scan_then_deposit(chunk_size: int) -> Liabilities:
+        nonlocal scans
+        scans += 1
+        liabilities = await scan(chunk_size)
+        if scans == 1:
+            await _deposit(wallet, 2, 250)
+        return liabilities
+
+    async def main() -> None:
+        job = _reconciler()
+        await _deposit(wallet, 1, 1000)
+        assert (await job.run_once()).status == "OK"
+
+        with monkeypatch.context() as m:
+            m.setattr(rc, "scan_liabilities", scan_then_deposit)
+            report = await job.run_once()
+        assert scans == 2
+        assert report.status == "OK"
+        assert report.wallet_balance == 1250 and report.liabilities.total == 1250
+
+    run(main())
+
+
+def test_skips_when_wallet_keeps_moving(
+    run: Callable, wallet: FakeWallet, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    scan = rc.scan_liabilities
+
+    async def scan_then_deposit(chunk_size: int) -> Liabilities:
+        liabilities = await scan(chunk_size)
+        await _deposit(wallet, 1, 10)
+        return liabilities
+
+    async def main() -> None:
+        job = _reconciler()
+        with monkeypatch.context() as m:
+            m.setattr(rc, "scan_liabilities", scan_then_deposit)
+            report = await job.run_once()
+        assert report.status == "ERROR"
+        assert report.wallet_balance is None
+        assert wallet.reads == 2 * rc.RECONCILE_SCAN_ATTEMPTS
+
+    run(main())
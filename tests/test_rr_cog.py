@@ -0,0 +1,217 @@
+# tests/test_rr_cog.py
+import sqlite3
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import pytest
+
+import models_user
+import rr_cog
+from db import read_db
+from models_user import (
+    GameAlreadySettled,
+    GameResult,
+    change_balance,
+    get_balance,
+    settle_game,
+)
+from rr_cog import RussianRoulette
+from rr_session import GameSession
+
+# 채널을 찾지 못하는 봇 (자동 종료 안내는 보내지 않는다)
+_BOT: Any = SimpleNamespace(get_channel=lambda channel_id: None)
+
+
+async def _running_game(cog: RussianRoulette, channel_id: int = 10) -> GameSession:
+    """참가자 2명이 모두 입장해서 시작된 게임 (첫 방아쇠에 총알이 나가도록 실린더 고정)"""
+    for uid in (1, 2):
+        await change_balance(uid, 1000, reason="debug")
+    session = await cog._create_game(channel_id, 1, entry_fee=100)
+    await cog._join(session, 1)
+    await cog._join(session, 2)
+    await cog._start_game(session)
+    session.cylinder = "100000"
+    return session
+
+
+async def _game_status(game_id: int) -> str:
+    async with read_db() as db:
+        cur = await db.execute("SELECT status FROM rr_games WHERE id = ?", (game_id,))
+        row = await cur.fetchone()
+    return str(row[0])
+
+
+def test_pull_leaves_session_untouched_when_settlement_fails(run, monkeypatch) -> None:
+    async def main() -> None:
+        cog = RussianRoulette(_BOT)
+        session = await _running_game(cog)
+        before = (session.status, set(session.alive), session.shot_in_round, session.current_turn)
+        shooter = session.next_user_id()
+        assert shooter is not None
+
+        async def broken_settle(*args: Any, **kwargs: Any) -> dict[int, int]:
+            raise sqlite3.OperationalError("disk I/O error")
+
+        with monkeypatch.context() as m, pytest.raises(sqlite3.OperationalError):
+            m.setattr(rr_cog, "settle_game", broken_settle)
+            await cog._pull_trigger(session, shooter)
+
+        # 메모리와 DB 모두 방아쇠를 당기기 전 상태
+        assert (
+            session.status, set(session.alive), session.shot_in_round, session.current_turn
+        ) == before
+        assert await cog._get_active_game(10) is session
+        assert await _game_status(session.game_id) == "RUNNING"
+
+        # 다시 당기면 정상적으로 끝나고 세션이 정리된다.
+        result = await cog._pull_trigger(session, shooter)
+        assert result.finished and session.status == "FINISHED"
+        assert await cog._get_active_game(10) is None
+        assert await _game_status(session.game_id) == "FINISHED"
+        await cog.cog_unload()
+
+    run(main())
+
+
+def test_expire_retries_when_the_write_fails(run, monkeypatch) -> None:
+    @asynccontextmanager
+    async def broken_transaction() -> AsyncIterator[Any]:
+        raise sqlite3.OperationalError("database is locked")
+        yield
+
+    async def main() -> None:
+        cog = RussianRoulette(_BOT)
+        session = await _running_game(cog)
+        cog._timeouts.cancel(session.channel_id)
+
+        with monkeypatch.context() as m, pytest.raises(sqlite3.OperationalError):
+            m.setattr(rr_cog, "transaction", broken_transaction)
+            await cog._expire_games([session.channel_id])
+        assert session.is_active
+        assert session.channel_id in cog._timeouts     # 다시 시도하도록 재등록
+
+        cog._timeouts.cancel(session.channel_id)
+        await cog._expire_games([session.channel_id])
+        assert session.status == "CANCELLED"
+        assert await cog._get_active_game(session.channel_id) is None
+        assert await _game_status(session.game_id) == "CANCELLED"
+        await cog.cog_unload()
+
+    run(main())
+
+
+def test_rehydrate_restores_running_games(run) -> None:
+    async def main() -> None:
+        cog = RussianRoulette(_BOT)
+        session = await _running_game(cog)
+        session.cylinder = "000001"   # 빈 클릭: 턴만 넘어간다
+        shooter = session.next_user_id()
+        assert shooter is not None
+        await cog._pull_trigger(session, shooter)
+        await cog.cog_unload()
+
+        restarted = RussianRoulette(_BOT)
+        assert await restarted.rehydrate() == 1
+        restored = await restarted._get_active_game(session.channel_id)
+        assert restored is not None and restored is not session
+        for name in GameSession.__slots__:
+            assert getattr(restored, name) == getattr(session, name), name
+        assert session.channel_id in restarted._timeouts
+        await restarted.cog_unload()
+
+    run(main())
+
+
+def test_pull_on_a_game_settled_elsewhere_evicts_the_session(run) -> None:
+    async def main() -> None:
+        cog = RussianRoulette(_BOT)
+        session = await _running_game(cog)
+        shooter = session.next_user_id()
+        assert shooter is not None
+        # 다른 경로(관리자 수동 처리 등)로 DB 에서 먼저 끝난 게임
+        await settle_game(session.game_id, {}, [], status="CANCELLED")
+
+        with pytest.raises(GameAlreadySettled):
+            await cog._pull_trigger(session, shooter)
+        assert await cog._get_active_game(session.channel_id) is None
+        assert session.channel_id not in cog._timeouts
+        await cog.cog_unload()
+
+    run(main())
+
+
+def test_settle_game_remembers_users_it_creates(run) -> None:
+    async def main() -> None:
+        cog = RussianRoulette(_BOT)
+        session = await cog._create_game(20, 7, entry_fee=0)
+        assert 8 not in models_user._known_users
+        await settle_game(session.game_id, {8: 50}, [GameResult(8, won_sats=50, win=True)])
+        assert 8 in models_user._known_users
+        assert await get_balance(8) == 50
+        await cog.cog_unload()
+
+    run(main())
+
+
+async def _wallet_state(user_id: int) -> tuple[int, int, int | None]:
+    """(DB 잔액, ledger 행 수, BalanceCache 값)"""
+    async with read_db() as db:
+        cur = await db.execute("SELECT balance FROM users WHERE discord_user_id = ?", (user_id,))
+        row = await cur.fetchone()
+        cur = await db.execute("SELECT COUNT(*) FROM ledger WHERE discord_user_id = ?", (user_id,))
+        ledger = await cur.fetchone()
+    assert row is not None and ledger is not None
+    return int(row[0]), int(ledger[0]), models_user.balance_cache._data.get(user_id)
+
+
+async def _seats(game_id: int) -> list[int]:
+    async with read_db() as db:
+        cur = await db.execute(
+            "SELECT user_id FROM rr_players WHERE game_id = ? ORDER BY order_index", (game_id,)
+        )
+        return [int(r[0]) for r in await cur.fetchall()]
+
+
+def test_duplicate_join_rolls_back_the_entry_fee(run) -> None:
+    """메모리 판정을 통과해도 DB 에서 중복 좌석이 걸리면 참가비 차감까지 함께 롤백된다."""
+
+    async def main() -> None:
+        cog = RussianRoulette(_BOT)
+        await change_balance(1, 1000, reason="debug")
+        session = await cog._create_game(30, 1, entry_fee=100)
+        stale = session.copy()          # 다른 경로에서 본 예전 상태 (좌석 없음)
+        await cog._join(session, 1)
+        assert await get_balance(1) == 900
+        before = await _wallet_state(1)
+        assert before == (900, 2, 900)
+
+        with pytest.raises(ValueError, match="이미 이 게임에 참가"):
+            await cog._join(stale, 1)
+        assert await _wallet_state(1) == before
+        assert await _seats(session.game_id) == [1]
+        assert stale.seats == []
+        await cog.cog_unload()
+
+    run(main())
+
+
+def test_join_into_full_game_rolls_back_the_entry_fee(run) -> None:
+    async def main() -> None:
+        cog = RussianRoulette(_BOT)
+        for uid in (1, 2, 3):
+            await change_balance(uid, 1000, reason="debug")
+        session = await cog._create_game(31, 1, entry_fee=100, max_players=2)
+        stale = session.copy()
+        await cog._join(session, 1)
+        await cog._join(session, 2)
+        assert await get_balance(3) == 1000
+        before = await _wallet_state(3)
+
+        with pytest.raises(ValueError, match="인원이 가득 찬"):
+            await cog._join(stale, 3)
+        assert await _wallet_state(3) == before
+        assert await _seats(session.game_id) == [1, 2]
+        await cog.cog_unload()
+
+    run(main())
@@ -0,0 +1,151 @@
+# tests/test_withdraw_worker.py
+from typing import Any, Callable, Optional, Union
+
+import pytest
+
+import withdraw_worker as ww
+from blink_client_rr import BlinkNotSent, BlinkPaymentRejected, BlinkUnavailable
+from models_user import change_balance, get_balance
+from models_withdrawal import Withdrawal, create_withdrawal, get_withdrawal
+
+USER_ID = 1
+AMOUNT = 300
+
+
+class FakeBlink:
+    """pay_invoice 대역: 미리 정해 둔 결과(status 문자열 또는 예외)를 차례대로 돌려준다."""
+
+    def __init__(self, *outcomes: Union[str, Exception]) -> None:
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def pay_invoice(self, bolt11: str, memo: str = "") -> dict[str, Any]:
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {"success": outcome == "SUCCESS", "status": outcome}
+
+
+@pytest.fixture
+def blink(monkeypatch: pytest.MonkeyPatch) -> Callable[..., FakeBlink]:
+    def install(*outcomes: Union[str, Exception]) -> FakeBlink:
+        fake = FakeBlink(*outcomes)
+        monkeypatch.setattr(ww, "pay_invoice", fake.pay_invoice)
+        return fake
+
+    return install
+
+
+class Results:
+    """on_result 대역"""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[int, bool, Optional[int]]] = []
+
+    async def __call__(self, withdrawal: Withdrawal, success: bool, refunded: Optional[int]) -> None:
+        self.calls.append((withdrawal.id, success, refunded))
+
+
+async def _setup() -> tuple[ww.WithdrawWorker, Results, int]:
+    await change_balance(USER_ID, 1000, reason="deposit", ref="hash-deposit")
+    withdrawal_id = await create_withdrawal(USER_ID, "hash-withdraw", "lnbc1fake", AMOUNT)
+    worker = ww.WithdrawWorker(workers=1, recheck_delay=3600, max_attempts=3, name="test-withdraw")
+    results = Results()
+    worker.on_result = results
+    return worker, results, withdrawal_id
+
+
+async def _withdrawal(withdrawal_id: int) -> Withdrawal:
+    withdrawal = await get_withdrawal(withdrawal_id)
+    assert withdrawal is not None
+    return withdrawal
+
+
+def test_unsent_attempts_are_not_counted(run: Callable, blink: Callable[..., FakeBlink]) -> None:
+    """
+    서킷 브레이커가 열려 있거나 대기열에서 시간 초과로 요청이 나가지 않은 시도는
+    attempts 를 쓰지 않는다. 그 뒤의 첫 실제 전송에서 받은 ALREADY_PAID 는 우리 결제가 아니다.
+    """
+
+    async def main() -> None:
+        worker, results, withdrawal_id = await _setup()
+        unsent: list[Union[str, Exception]] = [BlinkUnavailable("breaker open")] * 10
+        unsent.append(BlinkNotSent("Blink 요청 대기열에서 제한 시간 초과"))
+        fake = blink(*unsent, "ALREADY_PAID")
+
+        for _ in range(len(unsent)):       # max_attempts(3) 보다 많이 실패해도 계속 다시 시도
+            assert await worker._process(withdrawal_id) is True
+            withdrawal = await _withdrawal(withdrawal_id)
+            assert withdrawal.status == "PENDING" and withdrawal.attempts == 0
+
+        assert await worker._process(withdrawal_id) is False
+        assert fake.calls == len(unsent) + 1
+        withdrawal = await _withdrawal(withdrawal_id)
+        assert withdrawal.status == "FAILED" and withdrawal.attempts == 1
+        assert results.calls == [(withdrawal_id, False, 1000)]
+        assert await get_balance(USER_ID) == 1000
+        await worker.close()
+
+    run(main())
+
+
+def test_unsent_retry_keeps_earlier_send(run: Callable, blink: Callable[..., FakeBlink]) -> None:
+    """한 번 실제로 보낸 뒤 브레이커가 열리면 SENDING 과 attempts 가 그대로 유지된다."""
+
+    async def main() -> None:
+        worker, results, withdrawal_id = await _setup()
+        blink("PENDING", BlinkUnavailable("breaker open"), "ALREADY_PAID")
+
+        assert await worker._process(withdrawal_id) is True
+        assert await worker._process(withdrawal_id) is True
+        withdrawal = await _withdrawal(withdrawal_id)
+        assert withdrawal.status == "SENDING" and withdrawal.attempts == 1
+
+        assert await worker._process(withdrawal_id) is False
+        withdrawal = await _withdrawal(withdrawal_id)
+        assert withdrawal.status == "SUCCESS" and withdrawal.attempts == 2
+        assert results.calls == [(withdrawal_id, True, None)]
+        await worker.close()
+
+    run(main())
+
+
+def test_pending_then_already_paid_succeeds(run: Callable, blink: Callable[..., FakeBlink]) -> None:
+    async def main() -> None:
+        worker, results, withdrawal_id = await _setup()
+        fake = blink("PENDING", "ALREADY_PAID")
+
+        assert await worker._process(withdrawal_id) is True
+        withdrawal = await _withdrawal(withdrawal_id)
+        assert withdrawal.status == "SENDING" and withdrawal.attempts == 1
+
+        assert await worker._process(withdrawal_id) is False
+        assert fake.calls == 2
+        withdrawal = await _withdrawal(withdrawal_id)
+        assert withdrawal.status == "SUCCESS"
+        assert results.calls == [(withdrawal_id, True, None)]
+        assert await get_balance(USER_ID) == 1000 - AMOUNT
+        await worker.close()
+
+    run(main())
+
+
+def test_rejected_payment_is_refunded(run: Callable, blink: Callable[..., FakeBlink]) -> None:
+    async def main() -> None:
+        worker, results, withdrawal_id = await _setup()
+        blink(BlinkPaymentRejected("ROUTE_NOT_FOUND"))
+        assert await get_balance(USER_ID) == 1000 - AMOUNT
+
+        assert await worker._process(withdrawal_id) is False
+        withdrawal = await _withdrawal(withdrawal_id)
+        assert withdrawal.status == "FAILED"
+        assert results.calls == [(withdrawal_id, False, 1000)]
+        assert await get_balance(USER_ID) == 1000
+
+        # 끝난 출금은 다시 처리하지 않는다.
+        assert await worker._process(withdrawal_id) is False
+        assert await get_balance(USER_ID) == 1000
+        await worker.close()
+
+    run(main())
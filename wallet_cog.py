@@ -1,68 +1,47 @@
 # wallet_cog.py
-import asyncio
 import io
+import math
+import time
 from typing import Optional, Union, Any, Dict
 
 import discord
-import qrcode
 from discord import app_commands
 from discord.ext import commands
 
-from blink_client_rr import create_invoice, check_payment, pay_invoice, BlinkError
-from models_user import get_balance, change_balance
+from blink_client_rr import create_invoice, BlinkError, BlinkUnavailable
+from bolt11 import Bolt11Error, decode as decode_bolt11
+from config import DEPOSIT_TIMEOUT_SECONDS
+from deposit_watcher import PaidCallback, deposit_watcher
+from locks import user_locks
+from log import get_logger
+from models_invoice import add_pending_invoice, load_pending_invoices
+from models_reconcile import accept_reconciliation
+from models_user import get_balance
+from models_withdrawal import Withdrawal, create_withdrawal, withdrawal_exists
+from qr_render import qr_renderer
+from reconciler import ReconcileReport, reconciler
+from withdraw_worker import withdraw_worker
+
+logger = get_logger("wallet")
+
+# 입금 인보이스 유효 시간 (Blink 인보이스 만료 시간도 같은 값으로 생성)
+DEPOSIT_EXPIRES_MINUTES = max(1, math.ceil(DEPOSIT_TIMEOUT_SECONDS / 60))
+# 로컬 만료 시각은 Blink 에 실제로 보낸 expiresIn(분 단위로 올림)에 맞춘다.
+DEPOSIT_EXPIRES_SECONDS = DEPOSIT_EXPIRES_MINUTES * 60
 
 
 # ─────────────────────────────────────────────
-# BOLT11 금액(sats)만 파싱하는 간단 디코더
+# BOLT11 금액(sats)만 파싱 (bolt11.decode 래퍼)
 # ─────────────────────────────────────────────
 
 def decode_bolt11_amount_sats(bolt11: str) -> Optional[int]:
     """
     BOLT11 인보이스에서 금액(sats)만 파싱.
-    실패하면 None 반환.
+    실패하거나 금액이 없는 인보이스면 None 반환.
     """
     try:
-        ln = bolt11.lower()
-        if not ln.startswith("ln"):
-            return None
-
-        # hrp / data 분리
-        if "1" not in ln:
-            return None
-        pos = ln.rfind("1")
-        hrp = ln[:pos]
-
-        # hrp 에서 amount 추출 (lnbc, lntb, lntbs 등)
-        # 예) lnbc1500u -> 1500 * 10^(-6) BTC
-        amount_str = hrp[4:]  # 1500u, 20m, 1000n 등 또는 빈 문자열(금액 없음)
-
-        if not amount_str:
-            # 금액이 명시되지 않은 인보이스(수취인이 지정)
-            return None
-
-        # 단위 파싱
-        unit = amount_str[-1]
-        if unit.isdigit():
-            # 단위 없는 경우 (BTC)
-            amount_num_str = amount_str
-            multiplier = 10**8  # BTC -> sats
-        else:
-            amount_num_str = amount_str[:-1]
-            if unit == "m":  # milli-BTC
-                multiplier = 10**5  # 1 mBTC = 0.001 BTC = 10^5 sats
-            elif unit == "u":  # micro-BTC
-                multiplier = 10**2  # 1 μBTC = 10^-6 BTC = 10^2 sats
-            else:
-                # n, p 단위 등은 현재 지원하지 않음
-                return None
-
-        if not amount_num_str:
-            return None
-
-        amount_num = int(amount_num_str)
-        amount_sats = amount_num * multiplier
-        return amount_sats
-    except Exception:
+        return decode_bolt11(bolt11).amount_sats
+    except Bolt11Error:
         return None
 
 
@@ -74,13 +53,12 @@ class DepositView(discord.ui.View):
         amount_sats: int,
         user: Union[discord.User, discord.Member],
     ):
-        super().__init__(timeout=120)
+        super().__init__(timeout=DEPOSIT_EXPIRES_SECONDS)
         self.payment_hash = payment_hash
         self.payment_request = payment_request
         self.amount_sats = amount_sats
         self.user = user
         self.message: Optional[discord.Message | discord.WebhookMessage] = None
-        self.checking = False
 
     @discord.ui.button(label="📋 인보이스 복사", style=discord.ButtonStyle.secondary)
     async def copy_invoice(
@@ -104,67 +82,107 @@ class DepositView(discord.ui.View):
             ephemeral=True,
         )
 
-    async def start_checking(self) -> None:
-        if self.checking:
-            return
-        self.checking = True
-
-        # 최대 2분 동안 2초 간격으로 결제 여부 확인
-        for _ in range(60):
-            await asyncio.sleep(2)
-
+    async def on_paid(self, new_balance: int) -> None:
+        """deposit_watcher 가 결제를 확인하고 잔액을 올린 뒤 호출"""
+        if self.message:
             try:
-                paid = await check_payment(self.payment_request)
-            except Exception as e:
-                # Blink 쪽 에러로 루프 전체가 죽지 않도록 보호
-                print("[DepositView] check_payment 예외:", e)
-                paid = False
-
-            if paid:
-                # 결제 완료 → 내부 잔액 증가
-                await change_balance(self.user.id, self.amount_sats)
-                new_balance = await get_balance(self.user.id)
-
-                if self.message:
-                    try:
-                        await self.message.edit(
-                            content=(
-                                f"✅ **입금 확인 완료!**\n"
-                                f"+{self.amount_sats} sats 충전되었습니다.\n"
-                                f"현재 잔액: **{new_balance} sats**"
-                            ),
-                            view=None,
-                        )
-                    except Exception as e:
-                        print("[DepositView] message.edit 실패:", e)
-
-                try:
-                    await self.user.send(
-                        f"⚡ 입금 완료!\n"
-                        f"+{self.amount_sats} sats (현재 잔액: {new_balance} sats)"
-                    )
-                except Exception as e:
-                    print("[DepositView] DM 전송 실패:", e)
+                await self.message.edit(
+                    content=(
+                        f"✅ **입금 확인 완료!**\n"
+                        f"+{self.amount_sats} sats 충전되었습니다.\n"
+                        f"현재 잔액: **{new_balance} sats**"
+                    ),
+                    view=None,
+                )
+            except Exception:
+                logger.exception("입금 완료 메시지 수정 실패", extra={"user_id": self.user.id})
 
-                return
+        try:
+            await self.user.send(
+                f"⚡ 입금 완료!\n"
+                f"+{self.amount_sats} sats (현재 잔액: {new_balance} sats)"
+            )
+        except Exception:
+            logger.exception("입금 완료 DM 전송 실패", extra={"user_id": self.user.id})
 
-        # 타임아웃
+    async def on_expired(self) -> None:
+        """결제 대기 시간이 지나면 deposit_watcher 가 호출"""
         if self.message:
             try:
                 await self.message.edit(
                     content=(
-                        "⏰ **결제 시간 초과** (2분)\n"
+                        f"⏰ **결제 시간 초과** ({DEPOSIT_EXPIRES_MINUTES}분)\n"
                         "`/deposit` 명령어로 다시 시도해주세요."
                     ),
                     view=None,
                 )
-            except Exception as e:
-                print("[DepositView] 타임아웃 message.edit 실패:", e)
+            except Exception:
+                logger.exception("입금 시간 초과 메시지 수정 실패", extra={"user_id": self.user.id})
 
 
 class WalletCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        withdraw_worker.on_result = self._notify_withdrawal
+
+    async def cog_unload(self) -> None:
+        await deposit_watcher.close()
+        await withdraw_worker.close()
+        await reconciler.close()
+        qr_renderer.shutdown()
+
+    async def resume_withdrawals(self) -> int:
+        """봇 시작 시 1회 호출: 재시작 전에 끝나지 않은 출금을 이어서 처리"""
+        return await withdraw_worker.resume()
+
+    async def _notify_withdrawal(
+        self,
+        withdrawal: Withdrawal,
+        success: bool,
+        refunded_balance: Optional[int],
+    ) -> None:
+        """출금 결과 DM (요청한 interaction 은 이미 끝났거나 재시작으로 사라졌을 수 있음)"""
+        user_id = withdrawal.discord_user_id
+        user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+        if success:
+            await user.send(
+                f"✅ **출금 완료!** (ID: `{withdrawal.id}`)\n"
+                f"-{withdrawal.amount_sats} sats 출금되었습니다."
+            )
+        else:
+            await user.send(
+                f"⚠️ **출금 실패** (ID: `{withdrawal.id}`)\n"
+                f"인보이스가 유효한지 확인해주세요. {withdrawal.amount_sats} sats 는 환불되었습니다."
+                + (f"\n현재 잔액: **{refunded_balance} sats**" if refunded_balance is not None else "")
+            )
+
+    async def resume_deposits(self) -> int:
+        """
+        봇 시작 시 1회 호출: pending_invoices 에 남아있는 인보이스 감시 재개.
+        입금 메시지(DepositView)는 사라졌으므로 결제가 확인되면 DM 으로 알린다.
+        이미 만료 시각이 지난 인보이스도 조회에 성공해서 미결제로 확인된 뒤에만 만료 처리된다.
+        """
+        invoices = await load_pending_invoices()
+        for inv in invoices:
+            deposit_watcher.watch(
+                inv.payment_hash,
+                inv.payment_request,
+                inv.amount_sats,
+                inv.discord_user_id,
+                on_paid=self._dm_paid(inv.discord_user_id, inv.amount_sats),
+                expires_at=inv.expires_at,
+            )
+        return len(invoices)
+
+    def _dm_paid(self, user_id: int, amount_sats: int) -> PaidCallback:
+        async def on_paid(new_balance: int) -> None:
+            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+            await user.send(
+                f"⚡ 입금 완료!\n"
+                f"+{amount_sats} sats (현재 잔액: {new_balance} sats)"
+            )
+
+        return on_paid
 
     @app_commands.command(name="balance", description="현재 잔액을 확인합니다.")
     async def balance(self, interaction: discord.Interaction):
@@ -195,9 +213,14 @@ class WalletCog(commands.Cog):
             # 디스코드 닉네임(서버에서 보이는 이름) 사용
             display_name = interaction.user.display_name
             memo = f"RR Deposit by {display_name}"
-            invoice: Dict[str, Any] = await create_invoice(amount, memo)
-        except BlinkError as e:
-            print("[/deposit] BlinkError:", e)
+            invoice: Dict[str, Any] = await create_invoice(
+                amount, memo, expires_in_minutes=DEPOSIT_EXPIRES_MINUTES
+            )
+        except BlinkUnavailable as e:
+            await interaction.followup.send(e.user_message, ephemeral=True)
+            return
+        except BlinkError:
+            logger.exception("/deposit 인보이스 생성 실패", extra={"user_id": interaction.user.id})
             await interaction.followup.send(
                 "⚠️ 인보이스 생성 중 오류가 발생했습니다. 잠시 후 다시 시도해주세요.",
                 ephemeral=True,
@@ -207,20 +230,22 @@ class WalletCog(commands.Cog):
         payment_hash = invoice["payment_hash"]
         payment_request = invoice["payment_request"]
         amount_sats = invoice["amount"]
+        expires_at = int(time.time()) + DEPOSIT_EXPIRES_SECONDS
 
-        # QR 코드 생성
-        qr_img = qrcode.make(payment_request)
-        buffer = io.BytesIO()
-        qr_img.save(buffer, "PNG")
-        buffer.seek(0)
+        # 재시작 후에도 감시를 이어가고, payment_hash 기준으로 한 번만 입금되도록 먼저 기록
+        await add_pending_invoice(
+            payment_hash, interaction.user.id, payment_request, amount_sats, expires_at
+        )
 
-        file = discord.File(buffer, filename="invoice.png")
+        # QR 코드 생성 (워커 풀에서 렌더링 → 이벤트 루프를 막지 않음)
+        png = await qr_renderer.render(payment_request)
+        file = discord.File(io.BytesIO(png), filename="invoice.png")
 
         embed = discord.Embed(
             title="⚡ 라이트닝 입금 인보이스",
             description=(
                 f"**{amount_sats} sats** 를 아래 QR 또는 인보이스로 결제해주세요.\n"
-                f"2분 안에 결제가 확인되면 자동으로 잔액에 반영됩니다."
+                f"{DEPOSIT_EXPIRES_MINUTES}분 안에 결제가 확인되면 자동으로 잔액에 반영됩니다."
             ),
             color=discord.Color.yellow(),
         )
@@ -239,11 +264,20 @@ class WalletCog(commands.Cog):
             file=file,
             view=view,
             ephemeral=True,
+            wait=True,
         )
         view.message = message
 
-        # 결제 확인 루프 시작
-        self.bot.loop.create_task(view.start_checking())
+        # 결제 확인은 공용 감시 루프에 등록 (모든 대기 인보이스를 한 번에 조회)
+        deposit_watcher.watch(
+            payment_hash,
+            payment_request,
+            amount_sats,
+            interaction.user.id,
+            on_paid=view.on_paid,
+            on_expired=view.on_expired,
+            expires_at=expires_at,
+        )
 
     @app_commands.command(name="withdraw", description="외부 BOLT11 인보이스로 출금합니다.")
     @app_commands.describe(
@@ -253,24 +287,27 @@ class WalletCog(commands.Cog):
         await interaction.response.defer(ephemeral=True)
 
         user_id = interaction.user.id
-        current_balance = await get_balance(user_id)
 
-        if not bolt11.startswith("ln"):
+        # 인보이스 검사는 Blink 호출 / 잔액 잠금 전에 로컬에서 끝낸다.
+        try:
+            invoice = decode_bolt11(bolt11)
+        except Bolt11Error:
             await interaction.followup.send(
                 "유효한 BOLT11 인보이스를 입력해주세요.",
                 ephemeral=True,
             )
             return
 
-        if current_balance <= 0:
+        # Blink 지갑은 메인넷이므로 테스트넷 / regtest 등의 인보이스는 hold 전에 거절
+        if invoice.network != "mainnet":
             await interaction.followup.send(
-                "출금 가능한 잔액이 없습니다.",
+                f"비트코인 메인넷 인보이스만 출금할 수 있습니다. (입력한 인보이스: {invoice.network})",
                 ephemeral=True,
             )
             return
 
-        # BOLT11 에서 금액(sats) 디코딩
-        amount_sats = decode_bolt11_amount_sats(bolt11)
+        # BOLT11 에 포함된 금액(sats)
+        amount_sats = invoice.amount_sats
         if amount_sats is None or amount_sats <= 0:
             await interaction.followup.send(
                 "이 인보이스에서 출금 금액을 확인할 수 없습니다. "
@@ -279,44 +316,125 @@ class WalletCog(commands.Cog):
             )
             return
 
-        if amount_sats > current_balance:
+        if invoice.is_expired():
             await interaction.followup.send(
-                f"요청한 인보이스 금액은 **{amount_sats} sats** 이지만,\n"
-                f"현재 잔액은 **{current_balance} sats** 입니다.\n"
-                f"잔액 이하의 금액으로 인보이스를 생성해주세요.",
+                "만료된 인보이스입니다. 지갑에서 새 인보이스를 생성해주세요.",
                 ephemeral=True,
             )
             return
 
-        try:
-            # 출금 메모에도 디스코드 닉네임 사용
-            display_name = interaction.user.display_name
-            result = await pay_invoice(bolt11, memo=f"RR Withdraw by {display_name}")
-        except BlinkError as e:
-            print("[/withdraw] BlinkError:", e)
+        payment_hash = invoice.payment_hash
+        if await withdrawal_exists(payment_hash):
             await interaction.followup.send(
-                "⚠️ 출금 처리 중 Blink 오류가 발생했습니다. 잠시 후 다시 시도해주세요.",
+                "이미 출금에 사용된 인보이스입니다.",
                 ephemeral=True,
             )
             return
 
-        if not result.get("success"):
-            await interaction.followup.send(
-                "⚠️ 출금 결제가 실패했습니다. 인보이스가 유효한지 확인해주세요.",
-                ephemeral=True,
-            )
-            return
+        # 같은 유저의 출금 / 입금 / 참가비 차감이 동시에 잔액을 검사하지 못하도록 직렬화
+        async with user_locks.hold(user_id):
+            current_balance = await get_balance(user_id)
+
+            if current_balance <= 0:
+                await interaction.followup.send(
+                    "출금 가능한 잔액이 없습니다.",
+                    ephemeral=True,
+                )
+                return
+
+            if amount_sats > current_balance:
+                await interaction.followup.send(
+                    f"요청한 인보이스 금액은 **{amount_sats} sats** 이지만,\n"
+                    f"현재 잔액은 **{current_balance} sats** 입니다.\n"
+                    f"잔액 이하의 금액으로 인보이스를 생성해주세요.",
+                    ephemeral=True,
+                )
+                return
 
-        # BOLT11 인보이스에 포함된 금액만큼만 잔액 차감
-        await change_balance(user_id, -amount_sats)
+            # 잔액 선차감(hold) + 출금 요청 등록 (결제는 워커가 처리)
+            try:
+                # 출금 메모에도 디스코드 닉네임 사용
+                display_name = interaction.user.display_name
+                withdrawal_id = await create_withdrawal(
+                    user_id,
+                    payment_hash,
+                    bolt11,
+                    amount_sats,
+                    memo=f"RR Withdraw by {display_name}",
+                )
+            except ValueError as e:
+                await interaction.followup.send(str(e), ephemeral=True)
+                return
 
+        withdraw_worker.submit(withdrawal_id)
         await interaction.followup.send(
-            f"✅ **출금 완료!**\n"
-            f"-{amount_sats} sats 출금되었습니다.\n"
-            f"남은 잔액은 추후 `/balance` 명령어로 확인할 수 있습니다.",
+            f"⏳ **출금 요청 접수** (ID: `{withdrawal_id}`)\n"
+            f"-{amount_sats} sats 가 출금 대기 금액으로 잡혔습니다.\n"
+            f"결제가 끝나면 DM 으로 알려드립니다. (실패하면 자동 환불)",
             ephemeral=True,
         )
 
+    # /reconcile : 내부 부채와 Blink 지갑 잔액 대사 (관리자용)
+    @app_commands.command(
+        name="reconcile",
+        description="(관리자) 내부 잔액 합계와 Blink 지갑 잔액을 대사합니다.",
+    )
+    @app_commands.describe(
+        accept="확인을 마친 DRIFT / SHORTFALL 대사 ID (다음 대사의 기준점으로 사용)",
+    )
+    @app_commands.default_permissions(administrator=True)
+    async def reconcile(self, interaction: discord.Interaction, accept: Optional[int] = None):
+        await interaction.response.defer(ephemeral=True)
+
+        if accept is not None:
+            if await accept_reconciliation(accept):
+                message = f"✅ 대사 `#{accept}` 를 기준점(OK)으로 지정했습니다."
+            else:
+                message = f"대사 `#{accept}` 는 DRIFT / SHORTFALL 상태가 아니거나 존재하지 않습니다."
+            await interaction.followup.send(message, ephemeral=True)
+            return
+
+        report = await reconciler.run_once()
+        await interaction.followup.send(_format_reconcile_report(report), ephemeral=True)
+
+
+def _format_reconcile_report(report: ReconcileReport) -> str:
+    icon = {"OK": "✅", "DRIFT": "⚠️", "SHORTFALL": "🚨"}.get(report.status, "❌")
+    liab = report.liabilities
+    lines = [
+        f"{icon} **지갑 대사 `#{report.id}`: {report.status}**",
+        f"- 내부 부채: **{liab.total} sats** (잔액 {liab.user_balances} / "
+        f"게임 참가비 {liab.locked_in_games} ({liab.active_games}게임) / "
+        f"출금 대기 {liab.withdrawal_holds}, 그중 전송 중 {liab.in_flight})",
+        f"- 유저 {liab.users}명 스캔 (음수 잔액 {liab.negative_users}명), "
+        f"{report.duration_ms:.0f}ms",
+    ]
+    if report.wallet_balance is None:
+        lines.append(f"- Blink 지갑 잔액을 확정하지 못했습니다: {report.error}")
+        return "\n".join(lines)
+
+    lines.append(f"- Blink 지갑: **{report.wallet_balance} sats** / drift **{report.drift:+d} sats**")
+    if report.baseline is None or report.drift is None:
+        lines.append("- 기준점(OK 대사)이 없어 첫 대사로 기록했습니다.")
+        return "\n".join(lines)
+
+    lines.append(
+        f"- 기준점 `#{report.baseline.id}` 이후 drift 변화 "
+        f"{report.drift - report.baseline.drift:+d} = 원장으로 설명 {report.expected_change:+d} "
+        f"+ 설명 안 됨 **{report.unexplained:+d}** sats"
+    )
+    if report.reasons:
+        lines.append(
+            "- 원장 (사유별): "
+            + ", ".join(f"{r.reason} {r.entries}건 {r.amount:+d}" for r in report.reasons)
+        )
+    for item in report.items:
+        lines.append(
+            f"  · `#{item.id}` <@{item.discord_user_id}> {item.reason} {item.amount:+d} "
+            f"(ref {item.ref or '-'}, {item.created_at})"
+        )
+    return "\n".join(lines)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(WalletCog(bot))
@@ -0,0 +1,207 @@
+# withdraw_worker.py
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from blink_client_rr import (
+    BlinkError,
+    BlinkNotSent,
+    BlinkPaymentRejected,
+    BlinkUnavailable,
+    pay_invoice,
+)
+from config import WITHDRAW_MAX_ATTEMPTS, WITHDRAW_RECHECK_SEC, WITHDRAW_WORKERS
+from deadlines import DeadlineScheduler
+from log import get_logger
+from models_withdrawal import (
+    Withdrawal,
+    finish_withdrawal,
+    get_withdrawal,
+    load_unfinished_withdrawals,
+    mark_sending,
+    record_attempt,
+    revert_sending,
+)
+
+logger = get_logger("withdraw")
+
+# 출금이 끝났을 때 호출: (출금, 성공 여부, 환불 후 잔액 또는 None)
+ResultCallback = Callable[[Withdrawal, bool, Optional[int]], Awaitable[None]]
+
+
+class WithdrawWorker:
+    """
+    출금 큐 + 크기가 제한된 워커 풀.
+    - /withdraw 는 잔액을 먼저 차감(hold)하고 출금 ID 를 submit() 한 뒤 바로 응답한다.
+    - 워커가 Blink 로 결제하고 결과에 따라 SUCCESS 확정 / FAILED 환불 처리한다.
+    - 결과가 확정되지 않은 경우(Blink PENDING, 통신 오류)는 잠시 뒤 다시 보낸다.
+      같은 인보이스는 두 번 결제되지 않으므로(ALREADY_PAID) 재전송해도 안전하다.
+    - attempts 는 Blink 로 실제로 요청이 나간 시도만 센다. 서킷 브레이커 / 대기열 시간 초과로
+      보내지 못한 시도는 되돌리고 다시 시도하므로, Blink 장애가 길어져도 시도 횟수를 다 쓰지 않는다.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = WITHDRAW_WORKERS,
+        recheck_delay: float = WITHDRAW_RECHECK_SEC,
+        max_attempts: int = WITHDRAW_MAX_ATTEMPTS,
+        name: str = "withdraw-worker",
+    ) -> None:
+        self._workers = max(1, workers)
+        self._recheck_delay = recheck_delay
+        self._max_attempts = max_attempts
+        self._name = name
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._queued: set[int] = set()      # 큐에 있거나 처리 중인 출금 ID (중복 처리 방지)
+        self._tasks: list[asyncio.Task[Any]] = []
+        self._rechecks = DeadlineScheduler(self._requeue, name=f"{name}-recheck")
+        self.on_result: Optional[ResultCallback] = None
+        self._succeeded = 0
+        self._failed = 0
+        self._retried = 0
+
+    def submit(self, withdrawal_id: int) -> None:
+        """출금 ID 를 큐에 넣는다 (이미 들어있으면 무시)"""
+        if withdrawal_id in self._queued:
+            return
+        self._queued.add(withdrawal_id)
+        self._queue.put_nowait(withdrawal_id)
+        self._ensure_running()
+
+    async def resume(self) -> int:
+        """봇 시작 시 1회 호출: 끝나지 않은 출금(PENDING / SENDING)을 다시 큐에 넣는다."""
+        ids = await load_unfinished_withdrawals()
+        for withdrawal_id in ids:
+            self.submit(withdrawal_id)
+        return len(ids)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "in_progress": len(self._queued) - self._queue.qsize(),
+            "rechecks": len(self._rechecks),
+            "succeeded": self._succeeded,
+            "failed": self._failed,
+            "retried": self._retried,
+        }
+
+    async def close(self) -> None:
+        await self._rechecks.close()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks.clear()
+
+    # ---------------- 내부 ----------------
+
+    def _ensure_running(self) -> None:
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self._workers:
+            self._tasks.append(
+                asyncio.create_task(self._run(), name=f"{self._name}-{len(self._tasks)}")
+            )
+
+    async def _requeue(self, withdrawal_ids: list[Any]) -> None:
+        for withdrawal_id in withdrawal_ids:
+            self._queued.discard(withdrawal_id)
+            self.submit(withdrawal_id)
+
+    async def _run(self) -> None:
+        while True:
+            withdrawal_id = await self._queue.get()
+            retry = False
+            try:
+                retry = await self._process(withdrawal_id)
+            except Exception:
+                # 한 건의 오류로 워커가 죽지 않도록 보호 (상태는 DB 에 남아 있으므로 잠시 뒤 다시 처리)
+                logger.exception("출금 처리 예외", extra={"withdrawal_id": withdrawal_id})
+                retry = True
+            finally:
+                self._queue.task_done()
+
+            if retry:
+                self._retried += 1
+                self._rechecks.schedule(withdrawal_id, self._recheck_delay)
+            else:
+                self._queued.discard(withdrawal_id)
+
+    async def _process(self, withdrawal_id: int) -> bool:
+        """출금 1건 처리. 결과가 아직 확정되지 않아 잠시 뒤 다시 보내야 하면 True."""
+        withdrawal = await get_withdrawal(withdrawal_id)
+        if withdrawal is None or withdrawal.status not in ("PENDING", "SENDING"):
+            return False
+
+        if withdrawal.attempts >= self._max_attempts:
+            # 결과를 끝내 확정하지 못한 건은 hold 를 유지한 채 수동 확인으로 넘긴다.
+            logger.error(
+                "출금 최대 시도 횟수 초과 - 수동 확인 필요",
+                extra={"withdrawal_id": withdrawal_id, "attempts": withdrawal.attempts},
+            )
+            return False
+
+        # 이미 한 번 이상 보낸 적이 있으면 ALREADY_PAID 는 우리 결제가 완료된 것
+        sent_before = withdrawal.attempts > 0
+        await mark_sending(withdrawal_id)
+
+        try:
+            result = await pay_invoice(withdrawal.payment_request, memo=withdrawal.memo)
+        except (BlinkUnavailable, BlinkNotSent) as e:
+            # 요청이 나가지 않았음이 확실 → 시도 횟수를 쓰지 않고 잠시 뒤 다시 시도
+            await revert_sending(withdrawal_id, str(e))
+            return True
+        except BlinkPaymentRejected as e:
+            # Blink 가 결제 자체를 거절 → 확실히 보내지 않았으므로 환불
+            await self._finish(withdrawal, False, None, str(e))
+            return False
+        except BlinkError as e:
+            # 통신 오류 / 시간 초과: 결제됐는지 알 수 없으므로 잠시 뒤 재전송으로 확인
+            await record_attempt(withdrawal_id, None, str(e))
+            return True
+
+        status = result.get("status")
+        if result.get("success") or (status == "ALREADY_PAID" and sent_before):
+            await self._finish(withdrawal, True, status, None)
+            return False
+        if status == "PENDING":
+            await record_attempt(withdrawal_id, status, None)
+            return True
+        # FAILURE, 또는 처음 보냈는데 이미 다른 곳에서 결제된 인보이스(ALREADY_PAID)
+        await self._finish(withdrawal, False, status, None)
+        return False
+
+    async def _finish(
+        self,
+        withdrawal: Withdrawal,
+        success: bool,
+        blink_status: Optional[str],
+        error: Optional[str],
+    ) -> None:
+        refunded_balance = await finish_withdrawal(withdrawal.id, success, blink_status, error)
+        logger.info(
+            "출금 완료" if success else "출금 실패 (환불)",
+            extra={
+                "withdrawal_id": withdrawal.id,
+                "user_id": withdrawal.discord_user_id,
+                "amount_sats": withdrawal.amount_sats,
+                "blink_status": blink_status,
+                "error": error,
+            },
+        )
+        if success:
+            self._succeeded += 1
+        else:
+            self._failed += 1
+
+        if self.on_result is not None:
+            try:
+                await self.on_result(withdrawal, success, refunded_balance)
+            except Exception:
+                logger.exception("on_result 예외", extra={"withdrawal_id": withdrawal.id})
+
+
+# 여러 Cog 에서 같은 큐를 공유하도록 모듈 단위 싱글톤으로 둔다.
+withdraw_worker = WithdrawWorker()